@@ -1,16 +1,22 @@
 # backend/app/api/routes/admin.py
+import asyncio
+import json
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-from app.database.base import get_db
+from app.core.config import settings
+from app.database.base import get_db, SessionLocal
 from app.database.models import Voter, AuditLog
 from app.services.integrity import IntegrityService
 from app.services.blockchain_client import BlockchainClient
+from app.services.chain_outbox import chain_outbox
 from typing import List
 
 router = APIRouter()
 integrity_service = IntegrityService()
 blockchain_client = BlockchainClient() # Initialize Blockchain Client
+integrity_scan_running = asyncio.Lock() # Scans write the verified leaves and watermark
 
 # --- PRIVACY HELPERS (Retained for future use/consistency) ---
 def mask_phone(phone: str):
@@ -53,6 +59,12 @@ async def get_dashboard_stats(
         "recent_blockchain_events": [] # Populated by Frontend via Blockchain Service API
     }
 
+def integrity_scan_events(db: Session):
+    """Stream every voter through the batched integrity scan, in primary-key order"""
+    total = db.query(func.count(Voter.voter_id)).scalar()
+    voters = db.query(Voter).order_by(Voter.voter_id).yield_per(settings.INTEGRITY_SCAN_BATCH_SIZE)
+    return integrity_service.scan(voters, total=total)
+
 @router.post("/run-integrity-check")
 async def run_integrity_check(
     db: Session = Depends(get_db)
@@ -61,32 +73,71 @@ async def run_integrity_check(
     REAL TIME AUDIT:
     Scans local SQL Database and verifies hashes against the Real Blockchain Service.
     Returns list of voters with status (SECURE vs TAMPERED).
+    Large rolls should use /integrity-scan?mode=full, which streams the same
+    per-voter results as NDJSON instead of building the list.
     """
-    voters = db.query(Voter).all()
     report = []
-    
-    for voter in voters:
-        # Verify against the separate Blockchain Node
-        result = await integrity_service.verify_voter_integrity(voter)
-        
-        report.append({
-            "voter_id": voter.voter_id,
-            "name": f"{voter.first_name} {voter.last_name}", # Full name visible only to Admin
-            "status": result["status"],
-            "details": result["details"],
-            
-            # --- CRITICAL FIX START ---
-            # Explicitly return hashes so the Attack Modal can display them
-            "local_hash": result.get("local_hash"),
-            "chain_hash": result.get("chain_hash"),
-            
-            # Update mismatch flag to include simulated attacks
-            "hash_mismatch": result.get("status") in ["TAMPERED", "SIMULATED_TAMPERING"]
-            # --- CRITICAL FIX END ---
-        })
-        
+    async for event in integrity_scan_events(db):
+        if event["event"] == "result":
+            del event["event"]
+            report.append(event)
     return report
 
+@router.post("/integrity-scan")
+async def integrity_scan(mode: str = "incremental", full: bool = False, deep: bool = True):
+    """
+    `mode=full`: every voter is checked against the Blockchain Service, in
+    primary-key order, streamed as NDJSON (`start`, `result` per voter,
+    `progress`, `done`). Nothing is recorded: no watermark, no Merkle roots.
+
+    `mode=incremental` (default): only voters changed since the last
+    clean scan are checked against the Blockchain Service, then the Merkle
+    buckets are rehashed locally and compared with the verified roots,
+    descending where they differ to catch rows edited without `updated_at`
+    moving (raw SQL). By default every bucket is rehashed (a local pass over
+    all voters). `deep=false` only rehashes the buckets of changed voters, so
+    a raw SQL edit anywhere else goes unseen: it is a quick freshness check,
+    NOT a tamper check. `full=true` re-verifies everyone and rebuilds the
+    verified roots. Events: `start`, `result` per checked voter, `progress`,
+    `state_root` per checked state, `done`.
+    """
+    if mode not in ("incremental", "full"):
+        raise HTTPException(status_code=400, detail="mode must be 'incremental' or 'full'")
+    if mode == "full":
+        async def generate_full():
+            db = SessionLocal()
+            try:
+                async for event in integrity_scan_events(db):
+                    yield json.dumps(event, default=str) + "\n"
+            finally:
+                db.close()
+        return StreamingResponse(generate_full(), media_type="application/x-ndjson")
+
+    if integrity_scan_running.locked():
+        raise HTTPException(status_code=409, detail="An integrity scan is already running")
+
+    async def generate():
+        # Taken only once streaming starts: a client that disconnects before then never holds the lock
+        if integrity_scan_running.locked():
+            yield json.dumps({"event": "error", "message": "An integrity scan is already running"}) + "\n"
+            return
+        async with integrity_scan_running:
+            # The response outlives request-scoped dependencies, so the stream owns its session
+            db = SessionLocal()
+            try:
+                async for event in integrity_service.scan_incremental(db, full=full, deep=deep):
+                    yield json.dumps(event, default=str) + "\n"
+            finally:
+                db.close()
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.get("/outbox")
+async def outbox_status(
+    db: Session = Depends(get_db)
+):
+    """Blockchain writes waiting in the outbox: counts per status, backlog age and recent failures"""
+    return chain_outbox.stats(db)
+
 @router.post("/simulate-hack/{voter_id}")
 async def simulate_hack(
     voter_id: str, 
@@ -117,13 +168,13 @@ async def simulate_hack(
     }
 
 @router.get("/blockchain/explorer")
-async def blockchain_explorer():
+async def blockchain_explorer(skip: int = 0, limit: int = 20):
     """
     Proxy request to Real Blockchain Service and format for Frontend
+    Only the requested window is fetched, newest block first.
     """
-    # Fetch real chain from Python Blockchain Service
-    raw_chain_data = await blockchain_client.get_full_chain()
-    chain = raw_chain_data.get("chain", [])
+    page = await blockchain_client.get_chain_page(limit=limit, offset=skip, reverse=True)
+    chain = page.get("chain", [])
     
     formatted_blocks = []
     
@@ -143,10 +194,8 @@ async def blockchain_explorer():
             "timestamp": str(block.get("timestamp"))
         })
     
-    # Sort by latest first
-    formatted_blocks.reverse()
-    
     return {
-        "total_blocks": len(chain),
-        "blocks": formatted_blocks
-    }
\ No newline at end of file
+        "total_blocks": page.get("length", len(chain)),
+        "blocks": formatted_blocks,
+        "next_cursor": page.get("next_cursor")
+    }
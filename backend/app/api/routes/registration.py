@@ -6,7 +6,7 @@ from app.database.models import Voter, AuditLog, generate_uuid
 from app.schemas.voter import VoterRegistrationResponse
 from app.services.ai_dedup import AIDedupService
 from app.services.integrity import IntegrityService
-from app.services.blockchain_client import BlockchainClient
+from app.services.chain_outbox import chain_outbox, pending_reference
 from app.core.config import settings
 import base64
 import os
@@ -15,7 +15,6 @@ from datetime import datetime
 router = APIRouter()
 ai_dedup = AIDedupService()
 integrity_service = IntegrityService()
-blockchain_client = BlockchainClient()
 
 @router.post("/register", response_model=VoterRegistrationResponse)
 async def register_voter(
@@ -35,7 +34,7 @@ async def register_voter(
 ):
     """
     Register voter on Real Blockchain Node
-    (Strict Order: AI -> Blockchain -> Database)
+    (Strict Order: AI -> Database + Blockchain Outbox in one commit -> Node in the background)
     """
     steps_completed = []
     
@@ -124,9 +123,9 @@ async def register_voter(
         # Calculate Hash of the data
         data_hash = integrity_service.calculate_local_hash(voter)
         
-        # Step 5: REAL Blockchain Registration
-        steps_completed.append("Connecting to Blockchain Node...")
-        
+        # Step 5: Queue the Blockchain Registration
+        # The outbox entry commits together with the voter row, so the chain record can't be lost
+        # even if the node is down; the dispatcher sends it and fills in the transaction hash.
         tx_data = {
             "voter_id": voter_id,
             "event_type": "REGISTERED",
@@ -134,29 +133,13 @@ async def register_voter(
             "state": settings.STATE_ID,
             "timestamp": datetime.utcnow().isoformat()
         }
+        entry = chain_outbox.enqueue(db, sender=settings.STATE_ID, recipient="BLOCKCHAIN_NET", data=tx_data)
         
-        bc_response = await blockchain_client.create_transaction(
-            sender=settings.STATE_ID,
-            recipient="BLOCKCHAIN_NET",
-            data=tx_data
-        )
-        
-        print(f"=====================================")
-        print(f"BLOCKCHAIN CLIENT RESPONSE: {bc_response}")
-        print(f"=====================================")
-        
-        if not bc_response.get("success", True):
-            error_details = bc_response.get("error", "MOHIT_TEST_ERROR")
-            raise HTTPException(status_code=500, detail=f"MOHIT_DETAILS: {bc_response}")
-            
-        # Update with Transaction ID
         voter.blockchain_hash = data_hash
-        voter.blockchain_transaction_id = bc_response.get("transaction_hash", "OFFLINE_HASH")
-        
-        steps_completed.append(f"Block Mined! Hash: {voter.blockchain_transaction_id[:10]}...")
+        voter.blockchain_transaction_id = pending_reference(entry)
+        steps_completed.append("Blockchain Record Queued")
         
-        # Step 6: FINAL COMMIT - Save to SQL Database
-        # This is the last step. It only happens if AI and Blockchain succeeded.
+        # Step 6: FINAL COMMIT - Voter, Audit Log and Outbox entry together
         db.add(voter)
         
         # Create Audit Log
@@ -173,11 +156,12 @@ async def register_voter(
         
         db.commit()
         db.refresh(voter)
+        chain_outbox.wake()
         
         return VoterRegistrationResponse(
             voter_id=voter_id,
             status="SUCCESS",
-            message="Voter registered on Blockchain",
+            message="Voter registered; Blockchain record queued",
             blockchain_transaction_id=voter.blockchain_transaction_id,
             steps_completed=steps_completed
         )
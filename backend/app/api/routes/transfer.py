@@ -2,18 +2,37 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database.base import get_db
-from app.database.models import Voter, AuditLog
+from app.database.models import Voter, AuditLog, generate_uuid
 from app.schemas.voter import VoterTransferRequest, VoterTransferResponse
 from app.services.integrity import IntegrityService
 from app.services.blockchain_client import BlockchainClient
+from app.services.chain_outbox import chain_outbox, has_open_entries, pending_reference
 from app.core.config import settings
-import httpx
+from app.core.http import http_clients
 from datetime import datetime
 
 router = APIRouter()
 integrity_service = IntegrityService()
 blockchain_client = BlockchainClient()
 
+async def source_has_open_entries(from_state: str, voter_id: str) -> bool:
+    """Ask the source state's backend (PEER_BACKEND_URL) about its outbox; fails closed if it can't answer"""
+    if from_state == settings.STATE_ID or not settings.PEER_BACKEND_URL:
+        return False
+    try:
+        client = http_clients.get("peer")
+        resp = await client.get(f"{settings.PEER_BACKEND_URL}/api/transfer/pending/{voter_id}")
+        if resp.status_code == 200:
+            return bool(resp.json().get("open_entries"))
+    except Exception:
+        pass
+    raise HTTPException(status_code=503, detail=f"Could not confirm {from_state} has no pending blockchain writes")
+
+@router.get("/pending/{voter_id}")
+def pending_writes(voter_id: str, db: Session = Depends(get_db)):
+    """Whether this state's outbox still holds a blockchain write for the voter (asked by the destination state)"""
+    return {"voter_id": voter_id, "open_entries": has_open_entries(db, voter_id)}
+
 @router.post("/transfer", response_model=VoterTransferResponse)
 async def transfer_voter(
     transfer_request: VoterTransferRequest,
@@ -27,13 +46,18 @@ async def transfer_voter(
     from_state = transfer_request.from_state
     to_state = transfer_request.to_state
     
-    # 1. Verify existence on Blockchain
-    chain_record = await blockchain_client.verify_voter_history(voter_id)
-    if not chain_record:
+    # 0. A registration or vote still queued in an outbox must reach the chain first, or the transfer
+    # could be sealed ahead of it (and a queued vote would not stop the voter voting again here).
+    # This runs on the destination state, so the source state's backend is asked about its own outbox.
+    if has_open_entries(db, voter_id) or await source_has_open_entries(from_state, voter_id):
+        raise HTTPException(status_code=409, detail="Voter has blockchain writes still pending; retry shortly")
+
+    # 1. Verify existence on Blockchain (primary node, since the transfer is decided on this state)
+    chain_state = await blockchain_client.get_voter_state(voter_id, primary=True)
+    if not chain_state:
         raise HTTPException(status_code=404, detail="Voter not found on Blockchain")
         
-    latest_tx = chain_record.get('latest', {}).get('data', {})
-    current_owner = latest_tx.get('state') or latest_tx.get('owner_state')
+    current_owner = chain_state.get('owner_state')
     
     # Check ownership
     if current_owner != from_state:
@@ -52,10 +76,12 @@ async def transfer_voter(
         "timestamp": datetime.utcnow().isoformat()
     }
     
+    idempotency_key = generate_uuid()
     bc_response = await blockchain_client.create_transaction(
         sender=from_state,
         recipient=to_state,
-        data=tx_data
+        data=tx_data,
+        idempotency_key=idempotency_key
     )
     
     # === STRICT CHECK: If Blockchain fails, STOP HERE. ===
@@ -64,8 +90,15 @@ async def transfer_voter(
         print(f"❌ Blockchain Transfer Failed: {bc_response.get('error')}")
         raise HTTPException(status_code=500, detail="Blockchain Node Rejected Transfer")
 
-    # Get transaction hash (Only available if success)
-    tx_hash = bc_response.get("transaction_hash", "OFFLINE_TRANSFER")
+    # Get transaction hash (Only available once sealed)
+    tx_id = bc_response.get("tx_id")
+    if bc_response.get("status") in ("PENDING", "DROPPED"):
+        # Accepted but not sealed yet (or dropped by a chain reset): the outbox re-sends it by key
+        # and reconciles the placeholder
+        entry = chain_outbox.track(db, from_state, to_state, tx_data, idempotency_key, tx_id)
+        tx_hash = pending_reference(entry)
+    else:
+        tx_hash = bc_response.get("transaction_hash", "OFFLINE_TRANSFER")
 
     # 3. Handle Local DB State (Destination State)
     # Only proceeds if Blockchain was successful
@@ -87,13 +120,13 @@ async def transfer_voter(
             # Try to fetch name from Source State Backend
             if settings.PEER_BACKEND_URL:
                 try:
-                    async with httpx.AsyncClient() as client:
-                        resp = await client.get(f"{settings.PEER_BACKEND_URL}/api/registration/status/{voter_id}")
-                        if resp.status_code == 200:
-                            data = resp.json()
-                            names = data.get("name", "").split(" ")
-                            if len(names) > 0: first_name = names[0]
-                            if len(names) > 1: last_name = " ".join(names[1:])
+                    client = http_clients.get("peer")
+                    resp = await client.get(f"{settings.PEER_BACKEND_URL}/api/registration/status/{voter_id}")
+                    if resp.status_code == 200:
+                        data = resp.json()
+                        names = data.get("name", "").split(" ")
+                        if len(names) > 0: first_name = names[0]
+                        if len(names) > 1: last_name = " ".join(names[1:])
                 except Exception:
                     pass
 
@@ -123,12 +156,13 @@ async def transfer_voter(
             from_state=from_state,
             to_state=to_state,
             blockchain_hash=tx_hash,
-            status="SUCCESS"
+            status="SUCCESS",
+            audit_metadata={"tx_id": tx_id}
         )
         db.add(audit_log)
         
-        # FINAL COMMIT: Atomic save to DB
-        db.commit()
+    # FINAL COMMIT: Atomic save to DB (with the outbox entry tracking a pending transfer)
+    db.commit()
     
     return VoterTransferResponse(
         voter_id=voter_id,
@@ -2,10 +2,12 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
 from sqlalchemy.orm import Session
 from app.database.base import get_db
-from app.database.models import Voter, AuditLog
+from app.database.models import Voter, AuditLog, generate_uuid
 from app.schemas.voter import VoteResponse
 from app.services.ai_dedup import AIDedupService
 from app.services.blockchain_client import BlockchainClient
+from app.services.chain_feed import chain_feed
+from app.services.chain_outbox import chain_outbox, has_open_entries, pending_reference
 from app.services.integrity import IntegrityService
 from app.core.config import settings
 from app.core.events import pubsub_manager
@@ -39,14 +41,13 @@ async def check_voting_eligibility(
     if not voter:
         return {"eligible": False, "reason": "Voter not found locally"}
 
-    # 2. Blockchain Check
-    chain_history = await blockchain_client.verify_voter_history(voter_id)
-    if not chain_history:
+    # 2. Blockchain Check (latest state only; pushed block feed first, node on a miss)
+    chain_state = chain_feed.get(voter_id) or await blockchain_client.get_voter_state(voter_id)
+    if not chain_state:
         return {"eligible": False, "reason": "Voter not found on Blockchain"}
 
-    latest_tx = chain_history.get('latest', {}).get('data', {})
-    chain_owner = latest_tx.get('state') or latest_tx.get('owner_state') or latest_tx.get('to_state')
-    event_type = latest_tx.get('event_type') or latest_tx.get('event')
+    chain_owner = chain_state.get('owner_state')
+    event_type = chain_state.get('event_type')
 
     # 3. SELF-HEALING SYNC
     if chain_owner:
@@ -99,11 +100,9 @@ async def cast_vote(
     # Auto-Heal Check (Just in case eligibility wasn't called)
     if voter.status == "MOVED":
         # Quick check to see if we should actually be ACTIVE
-        chain_history = await blockchain_client.verify_voter_history(voter_id)
-        if chain_history:
-            latest = chain_history.get('latest', {}).get('data', {})
-            owner = latest.get('state') or latest.get('owner_state')
-            if owner == settings.STATE_ID:
+        chain_state = await blockchain_client.get_voter_state(voter_id)
+        if chain_state:
+            if chain_state.get('owner_state') == settings.STATE_ID:
                 print("🔄 Auto-Healing status to ACTIVE before voting")
                 voter.status = "ACTIVE"
                 db.commit()
@@ -139,11 +138,10 @@ async def cast_vote(
         print(f"❌ AI REJECTED: Expected {voter_id}, Got {matched_id} with {face_conf} confidence")
         raise HTTPException(status_code=401, detail="Biometric Verification Failed")
 
-    # 3. Check Blockchain for Double Vote
-    history = await blockchain_client.verify_voter_history(voter_id)
-    if history:
-        last = history.get('latest', {}).get('data', {})
-        if last.get('event_type') == "VOTED":
+    # 3. Check Blockchain for Double Vote (primary node: a lagging replica could miss a fresh vote)
+    chain_state = await blockchain_client.get_voter_state(voter_id, primary=True)
+    if chain_state:
+        if chain_state.get('event_type') == "VOTED":
             raise HTTPException(status_code=400, detail="Double voting prevented: Already voted on Blockchain")
 
     # 4. Prepare Transaction
@@ -158,22 +156,43 @@ async def cast_vote(
         "timestamp": datetime.utcnow().isoformat()
     }
     
-    # 5. Send to Blockchain
-    print("🔗 Sending Vote to Blockchain...")
-    bc_response = await blockchain_client.create_transaction(
-        sender=settings.STATE_ID,
-        recipient="BLOCKCHAIN_NET",
-        data=tx_data
-    )
-    
-    # 🛑 CRITICAL CHECK: If this fails, code stops here. DB NOT UPDATED.
-    if not bc_response.get("success", True):
-        print(f"❌ Blockchain Vote Failed: {bc_response.get('error')}")
-        raise HTTPException(status_code=500, detail="Blockchain Transaction Failed")
+    # 5. Write the vote to the Blockchain, then commit locally
+    # Compare-and-set: of two concurrent requests for the same voter, only one can flip ACTIVE -> VOTED
+    claimed = (db.query(Voter)
+               .filter(Voter.voter_id == voter_id, Voter.status == "ACTIVE")
+               .update({Voter.status: "VOTED"}, synchronize_session=False))
+    if not claimed:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Double voting prevented: Vote already recorded")
 
-    # 6. Commit to Local DB (Only reached if Step 5 succeeds)
-    print("✅ Blockchain Success. Updating Local DB...")
-    tx_hash = bc_response.get("transaction_hash", "PENDING")
+    # Synchronous while the node is reachable, so other states see the vote on the chain before
+    # this one answers; the outbox (same idempotency key) only takes over while the node is down.
+    # A vote queued there is visible to other states through /api/transfer/pending (see transfer.py).
+    idempotency_key = generate_uuid()
+    bc_response = {}
+    # With the registration still queued, the vote follows it through the outbox instead of overtaking it
+    queued_behind = has_open_entries(db, voter_id)
+    if not queued_behind:
+        print("🔗 Writing Vote to Blockchain...")
+        bc_response = await blockchain_client.create_transaction(
+            sender=settings.STATE_ID, recipient="BLOCKCHAIN_NET", data=tx_data, idempotency_key=idempotency_key)
+    if bc_response.get("status") == "CONFIRMED":
+        tx_hash = bc_response.get("transaction_hash")
+    elif bc_response.get("status") in ("PENDING", "DROPPED"):
+        # Accepted but not sealed yet (or dropped by a chain reset): the outbox re-sends it by key
+        # and reconciles the placeholder
+        entry = chain_outbox.track(db, settings.STATE_ID, "BLOCKCHAIN_NET", tx_data, idempotency_key,
+                                   bc_response.get("tx_id"))
+        tx_hash = pending_reference(entry)
+    elif queued_behind or bc_response.get("unreachable"):
+        print("🔗 Queueing Vote in the outbox")
+        entry = chain_outbox.enqueue(db, sender=settings.STATE_ID, recipient="BLOCKCHAIN_NET", data=tx_data,
+                                     idempotency_key=idempotency_key)
+        tx_hash = pending_reference(entry)
+    else:
+        db.rollback()
+        print(f"❌ Blockchain Vote Failed: {bc_response.get('error')}")
+        raise HTTPException(status_code=500, detail="Blockchain Node Rejected Vote")
     
     voter.status = "VOTED"
     voter.last_voted_at = datetime.utcnow()
@@ -188,8 +207,9 @@ async def cast_vote(
         status="SUCCESS"
     )
     db.add(audit_log)
-    db.add(audit_log)
     db.commit()
+    chain_outbox.wake()
+    print("✅ Vote recorded" + ("" if bc_response.get("status") == "CONFIRMED" else "; Blockchain write pending"))
     
     # 7. Cache Vote Status in Redis
     if pubsub_manager.redis_client:
@@ -17,6 +17,31 @@ class Settings(BaseSettings):
     AI_SERVICE_URL: str
     BLOCKCHAIN_SERVICE_URL: str
     PEER_BACKEND_URL: Optional[str] = None
+    BLOCKCHAIN_CONFIRM_WAIT_SECONDS: float = 30.0
+    BLOCKCHAIN_READ_URLS: list = [] # Replica nodes for read-only lookups (defaults to BLOCKCHAIN_SERVICE_URL)
+    BLOCKCHAIN_ANCHOR_URL: str = ""  # Node whose block hashes anchor inclusion proofs (defaults to BLOCKCHAIN_SERVICE_URL)
+    BLOCKCHAIN_LOOKUP_CACHE_SECONDS: float = 2.0  # Reuse per-voter lookups briefly (0 = only coalesce concurrent calls)
+    CHAIN_FEED_ENABLED: bool = True
+    CHAIN_FEED_READ_TIMEOUT_SECONDS: float = 60.0  # Longer than the node's keepalive interval
+    INTEGRITY_SCAN_BATCH_SIZE: int = 500  # Voters per /state/bulk request (node caps at STATE_BULK_MAX)
+    INTEGRITY_SCAN_CONCURRENCY: int = 4   # Batches verified against the node at once
+    INTEGRITY_BUCKET_PREFIX: int = 2      # voter_id characters per Merkle bucket (UUID ids: 256 buckets per state)
+    OUTBOX_BATCH_SIZE: int = 200  # Outbox entries per /transactions/batch request
+    OUTBOX_POLL_SECONDS: float = 5.0  # Idle re-check interval (new entries wake the dispatcher at once)
+    OUTBOX_RETRY_BASE_SECONDS: float = 1.0  # Backoff after a failed send doubles from here...
+    OUTBOX_RETRY_MAX_SECONDS: float = 300.0  # ...up to this
+
+    # Shared HTTP client pools (see app/core/http.py); HTTP/2 also needs the `h2` package
+    HTTP2_ENABLED: bool = False
+    BLOCKCHAIN_HTTP_TIMEOUT_SECONDS: float = 10.0
+    BLOCKCHAIN_HTTP_MAX_CONNECTIONS: int = 100
+    BLOCKCHAIN_HTTP_MAX_KEEPALIVE: int = 20
+    AI_HTTP_TIMEOUT_SECONDS: float = 30.0
+    AI_HTTP_MAX_CONNECTIONS: int = 20
+    AI_HTTP_MAX_KEEPALIVE: int = 10
+    PEER_HTTP_TIMEOUT_SECONDS: float = 10.0
+    PEER_HTTP_MAX_CONNECTIONS: int = 10
+    PEER_HTTP_MAX_KEEPALIVE: int = 5
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
@@ -0,0 +1,87 @@
+# backend/app/core/http.py
+import importlib.util
+import logging
+from typing import Dict, NamedTuple, Optional
+import httpx
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+class ServiceLimits(NamedTuple):
+    timeout: float
+    max_connections: int
+    max_keepalive: int
+
+class HTTPClientRegistry:
+    """
+    One pooled httpx.AsyncClient per downstream service, opened and closed by
+    the FastAPI lifespan. Calls reuse warm keep-alive connections instead of
+    paying a TCP (and TLS) handshake each time. Per-call timeouts can still be
+    passed to the individual request.
+    """
+
+    def __init__(self):
+        self._limits: Dict[str, ServiceLimits] = {}
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._requests: Dict[str, int] = {}
+        self.http2 = False
+
+    def register(self, name: str, timeout: float, max_connections: int, max_keepalive: int):
+        self._limits[name] = ServiceLimits(timeout, max_connections, max_keepalive)
+
+    async def open(self):
+        self.http2 = settings.HTTP2_ENABLED and importlib.util.find_spec("h2") is not None
+        if settings.HTTP2_ENABLED and not self.http2:
+            logger.warning("HTTP2_ENABLED is set but the `h2` package is missing; using HTTP/1.1")
+        for name in self._limits:
+            self.get(name)
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """The service's shared client (created on first use outside the lifespan, e.g. in scripts)"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._build(name)
+        return client
+
+    def _build(self, name: str) -> httpx.AsyncClient:
+        limits = self._limits[name]
+        self._requests.setdefault(name, 0)
+
+        async def count_request(request: httpx.Request):
+            self._requests[name] += 1
+
+        return httpx.AsyncClient(
+            timeout=limits.timeout,
+            limits=httpx.Limits(max_connections=limits.max_connections,
+                                max_keepalive_connections=limits.max_keepalive),
+            http2=self.http2,
+            event_hooks={"request": [count_request]},
+        )
+
+    async def close(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def stats(self) -> Dict[str, Dict]:
+        """Configured limits plus live pool occupancy for each service"""
+        return {name: {**limits._asdict(), "http2": self.http2, "requests": self._requests.get(name, 0),
+                       **self._pool_stats(self._clients.get(name))}
+                for name, limits in self._limits.items()}
+
+    @staticmethod
+    def _pool_stats(client: Optional[httpx.AsyncClient]) -> Dict:
+        if client is None or client.is_closed:
+            return {"open": False}
+        # httpcore's pool is not public API; report what it exposes, if anything
+        pool = getattr(client._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        return {"open": True, "connections": len(connections), "idle": sum(1 for c in connections if c.is_idle())}
+
+http_clients = HTTPClientRegistry()
+http_clients.register("blockchain", settings.BLOCKCHAIN_HTTP_TIMEOUT_SECONDS,
+                      settings.BLOCKCHAIN_HTTP_MAX_CONNECTIONS, settings.BLOCKCHAIN_HTTP_MAX_KEEPALIVE)
+http_clients.register("ai", settings.AI_HTTP_TIMEOUT_SECONDS,
+                      settings.AI_HTTP_MAX_CONNECTIONS, settings.AI_HTTP_MAX_KEEPALIVE)
+http_clients.register("peer", settings.PEER_HTTP_TIMEOUT_SECONDS,
+                      settings.PEER_HTTP_MAX_CONNECTIONS, settings.PEER_HTTP_MAX_KEEPALIVE)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Boolean, Text, Integer, Float, JSON
+from sqlalchemy import Column, String, DateTime, Boolean, Text, Integer, Float, JSON, Index
 from sqlalchemy.sql import func
 from app.database.base import Base
 import uuid
@@ -114,4 +114,63 @@ class VoterAsset(Base):
     # Transfer History
     transfer_history = Column(JSON, default=[])
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class IntegrityScan(Base):
+    __tablename__ = "integrity_scans"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # FULL (leaves rebuilt), DEEP (every bucket rehashed) or INCREMENTAL (only buckets with changed rows
+    # rehashed: blind to raw SQL edits elsewhere, so an INCREMENTAL run is not a tamper check)
+    mode = Column(String(20), nullable=False)
+    # Highest coalesce(updated_at, created_at) when the scan started; the next incremental scan
+    # re-verifies rows at or after the watermark of the last clean scan
+    watermark = Column(DateTime(timezone=True))
+    clean = Column(Boolean, default=False)
+    scanned = Column(Integer, default=0)
+    counts = Column(JSON, default={})
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True))
+
+class IntegrityLeaf(Base):
+    __tablename__ = "integrity_leaves"
+
+    # Last local hash of the voter that matched the chain
+    voter_id = Column(String(50), primary_key=True)
+    state_id = Column(String(50), nullable=False)
+    bucket = Column(String(8), nullable=False)  # voter_id prefix (INTEGRITY_BUCKET_PREFIX characters)
+    local_hash = Column(String(64), nullable=False)
+    verified_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (Index("ix_integrity_leaves_state_bucket", "state_id", "bucket"),)
+
+class IntegrityBucketRoot(Base):
+    __tablename__ = "integrity_bucket_roots"
+
+    # Merkle root over one bucket of a state's IntegrityLeaf rows (see app/services/merkle.py)
+    state_id = Column(String(50), primary_key=True)
+    bucket = Column(String(8), primary_key=True)
+    merkle_root = Column(String(64), nullable=False)
+    leaf_count = Column(Integer, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class ChainOutbox(Base):
+    __tablename__ = "chain_outbox"
+
+    # Blockchain writes, committed with the row they describe and sent by the dispatcher
+    # (see app/services/chain_outbox.py)
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    idempotency_key = Column(String(50), unique=True, nullable=False, default=generate_uuid)
+    voter_id = Column(String(50), nullable=False, index=True)
+    event_type = Column(String(50), nullable=False)
+    payload = Column(JSON, nullable=False)  # {sender, recipient, data}
+    status = Column(String(20), default="PENDING", index=True)  # PENDING, SUBMITTED, CONFIRMED or FAILED
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime)  # NULL = due now
+    last_error = Column(Text)
+    tx_id = Column(String(100))
+    block_index = Column(Integer)
+    transaction_hash = Column(String(64))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    confirmed_at = Column(DateTime)
@@ -7,25 +7,40 @@ from app.database.base import Base, engine, blockchain_engine
 from app.api.routes import registration, transfer, voting, admin
 import os
 
+from app.core.events import pubsub_manager
+from app.core.http import http_clients
+from app.core.listener import start_redis_listener
+from app.services.chain_feed import chain_feed
+from app.services.chain_outbox import chain_outbox
+from contextlib import asynccontextmanager
+import asyncio
+
 # Create tables
 Base.metadata.create_all(bind=engine)
 Base.metadata.create_all(bind=blockchain_engine)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Shared keep-alive pools for the blockchain node, AI service and peer backend
+    await http_clients.open()
+    pubsub_manager.connect()
+    # The outbox dispatcher delivers queued blockchain writes (registrations, votes) to the node
+    tasks = [asyncio.create_task(start_redis_listener()), asyncio.create_task(chain_outbox.run())]
+    if settings.CHAIN_FEED_ENABLED:
+        tasks.append(asyncio.create_task(chain_feed.run()))
+    yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await http_clients.close()
+
 app = FastAPI(
     title=f"Voter Management System - {settings.STATE_NAME}",
     description="Blockchain-based Electoral Roll Management System",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
-from app.core.events import pubsub_manager
-from app.core.listener import start_redis_listener
-import asyncio
-
-@app.on_event("startup")
-async def startup_event():
-    pubsub_manager.connect()
-    asyncio.create_task(start_redis_listener())
-
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -60,6 +75,11 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/health/http")
+async def http_pool_stats():
+    """Connection pool limits and occupancy for each downstream service"""
+    return http_clients.stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
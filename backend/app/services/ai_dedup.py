@@ -1,8 +1,8 @@
 # backend/app/services/ai_dedup.py
-import httpx
 import base64
 from typing import Optional, Dict
 from app.core.config import settings
+from app.core.http import http_clients
 
 class AIDedupService:
     def __init__(self):
@@ -25,24 +25,24 @@ class AIDedupService:
         }
         """
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.ai_service_url}/api/dedup/check",
-                    json={
-                        "photo_base64": photo_base64,
-                        "first_name": first_name,
-                        "last_name": last_name,
-                        "date_of_birth": date_of_birth
-                    }
-                )
+            client = http_clients.get("ai")
+            response = await client.post(
+                f"{self.ai_service_url}/api/dedup/check",
+                json={
+                    "photo_base64": photo_base64,
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "date_of_birth": date_of_birth
+                }
+            )
                 
-                if response.status_code == 200:
-                    return response.json()
-                else:
-                    return {
-                        "is_duplicate": False,
-                        "error": "AI service unavailable"
-                    }
+            if response.status_code == 200:
+                return response.json()
+            else:
+                return {
+                    "is_duplicate": False,
+                    "error": "AI service unavailable"
+                }
         except Exception as e:
             print(f"AI Dedup Error: {str(e)}")
             return {
@@ -60,19 +60,19 @@ class AIDedupService:
     ) -> Dict:
         """Store face encoding for future comparisons"""
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    f"{self.ai_service_url}/api/dedup/store",
-                    json={
-                        "voter_id": voter_id,
-                        "photo_base64": photo_base64,
-                        "first_name": first_name,
-                        "last_name": last_name,
-                        "date_of_birth": date_of_birth
-                    }
-                )
+            client = http_clients.get("ai")
+            response = await client.post(
+                f"{self.ai_service_url}/api/dedup/store",
+                json={
+                    "voter_id": voter_id,
+                    "photo_base64": photo_base64,
+                    "first_name": first_name,
+                    "last_name": last_name,
+                    "date_of_birth": date_of_birth
+                }
+            )
                 
-                return response.json()
+            return response.json()
         except Exception as e:
             print(f"Store encoding error: {str(e)}")
             return {"success": False, "error": str(e)}
@@ -80,9 +80,9 @@ class AIDedupService:
     async def delete_face_encoding(self, voter_id: str) -> Dict:
         """Delete face encoding if registration fails"""
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                response = await client.delete(f"{self.ai_service_url}/api/dedup/remove/{voter_id}")
-                return response.json()
+            client = http_clients.get("ai")
+            response = await client.delete(f"{self.ai_service_url}/api/dedup/remove/{voter_id}", timeout=10.0)
+            return response.json()
         except Exception as e:
             print(f"Delete encoding error: {str(e)}")
             return {"success": False, "error": str(e)}
\ No newline at end of file
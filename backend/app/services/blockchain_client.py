@@ -1,51 +1,288 @@
-import httpx
+import asyncio
+import hashlib
+import itertools
 import json
 import logging
+import struct
+from collections import Counter
+from time import monotonic
 from app.core.config import settings
+from app.core.http import http_clients
 
 logger = logging.getLogger(__name__)
 
+# Must match blockchain-service/merkle.py and encoding.py
+MERKLE_LEAF_PREFIX = b"\x00"
+MERKLE_NODE_PREFIX = b"\x01"
+HEADER_FIELD_LENGTH = struct.Struct(">I")
+
+def _block_header_hash(header: dict) -> str:
+    fields = [
+        str(header["version"]),
+        str(header["index"]),
+        repr(float(header["timestamp"])),
+        str(header["proof"]),
+        header["previous_hash"],
+        header["tx_root"],
+        header.get("target", ""),
+    ]
+    encoded = b"".join(HEADER_FIELD_LENGTH.pack(len(f.encode())) + f.encode() for f in fields)
+    return hashlib.sha256(encoded).hexdigest()
+
+def verify_inclusion_proof(proof: dict) -> bool:
+    """Check a /proof/{tx_id} response locally: tx -> Merkle path -> tx_root -> block hash"""
+    try:
+        tx_bytes = json.dumps(proof["tx"], sort_keys=True, separators=(",", ":")).encode()
+        tx_hash = hashlib.sha256(tx_bytes).hexdigest()
+        if tx_hash != proof["tx_hash"]:
+            return False
+        node = hashlib.sha256(MERKLE_LEAF_PREFIX + bytes.fromhex(tx_hash)).digest()
+        for step in proof["path"]:
+            sibling = bytes.fromhex(step["hash"])
+            pair = sibling + node if step["position"] == "left" else node + sibling
+            node = hashlib.sha256(MERKLE_NODE_PREFIX + pair).digest()
+        header = proof["header"]
+        return node.hex() == header["tx_root"] and _block_header_hash(header) == proof["block_hash"]
+    except (KeyError, TypeError, ValueError):
+        return False
+
+# Read-only lookups rotate across replica nodes; shared by every BlockchainClient instance
+_read_urls = itertools.cycle(
+    [url.rstrip('/') for url in settings.BLOCKCHAIN_READ_URLS] or [settings.BLOCKCHAIN_SERVICE_URL.rstrip('/')]
+)
+
+# Per-voter lookups shared by every BlockchainClient instance (see BlockchainClient._lookup):
+# calls in flight, recent results, and the sequence number of the last write this backend made for the voter
+_LOOKUP_KINDS = ("verify", "state")
+_inflight = {}     # (kind, voter_id, primary) -> asyncio.Task
+_recent = {}       # (kind, voter_id) -> (expires_at, result)
+_generation = {}   # voter_id -> write sequence; only needed while a lookup that started before it runs
+_running = Counter()  # write sequence at lookup start -> lookups still running
+_write_seq = 0
+
+def invalidate_voter(voter_id: str):
+    """Forget cached and in-flight lookups for a voter whose chain state this backend is changing"""
+    global _write_seq
+    _write_seq += 1
+    _generation[voter_id] = _write_seq
+    if len(_generation) > 10000:
+        # A write at or before the oldest running lookup's start can no longer make it skip the cache
+        oldest = min(_running, default=_write_seq)
+        for stale in [v for v, seq in _generation.items() if seq <= oldest]:
+            del _generation[stale]
+    for kind in _LOOKUP_KINDS:
+        _recent.pop((kind, voter_id), None)
+        for primary in (False, True):
+            _inflight.pop((kind, voter_id, primary), None)
+
 class BlockchainClient:
     def __init__(self):
         self.node_url = settings.BLOCKCHAIN_SERVICE_URL
+        self.anchor_url = (settings.BLOCKCHAIN_ANCHOR_URL or settings.BLOCKCHAIN_SERVICE_URL).rstrip('/')
 
-    async def create_transaction(self, sender: str, recipient: str, data: dict):
+    def read_url(self, primary: bool = False) -> str:
+        """Node to read from; `primary=True` for checks that guard a write and must not lag"""
+        return self.node_url.rstrip('/') if primary else next(_read_urls)
+
+    async def create_transaction(self, sender: str, recipient: str, data: dict, idempotency_key: str = None):
         payload = {
             "sender": sender,
             "recipient": recipient,
             "data": data
         }
+        if idempotency_key:
+            # Re-sending the same key later returns this transaction's receipt instead of a duplicate
+            payload["idempotency_key"] = idempotency_key
+        wait = settings.BLOCKCHAIN_CONFIRM_WAIT_SECONDS
+        voter_id = data.get("voter_id")
+        if voter_id:
+            invalidate_voter(voter_id)
+        try:
+            # The node batches transactions into blocks; long-poll until ours is sealed
+            client = http_clients.get("blockchain")
+            url = f"{self.node_url.rstrip('/')}/transactions/new"
+            response = await client.post(url, json=payload, params={"wait": wait}, timeout=wait + 5.0)
+            if response.status_code in (200, 202, 410):
+                receipt = response.json()
+                if receipt.get("status") == "PENDING":
+                    # Still in the mempool: there is no transaction hash until its block is sealed
+                    logger.warning(f"Blockchain tx {receipt['tx_id']} not sealed within {wait}s")
+                elif receipt.get("status") == "DROPPED":
+                    # 410: the chain was reset before it was sealed; re-sending the same key queues it again
+                    logger.warning(f"Blockchain tx {receipt['tx_id']} dropped by a chain reset")
+                return receipt
+            logger.error(f"Blockchain Node Rejected: {response.status_code} - {response.text}")
+            return {"success": False, "error": f"Blockchain node rejected transaction: {response.status_code} - {response.text}"}
+        except Exception as e:
+            # Writes that must survive an outage go through the outbox (app/services/chain_outbox.py)
+            logger.error(f"Blockchain Connection Error: {str(e)}")
+            return {"success": False, "unreachable": True, "error": f"Blockchain node unreachable: {e}"}
+        finally:
+            if voter_id:
+                # Lookups made while the transaction was in flight may have seen the old state
+                invalidate_voter(voter_id)
+
+    async def create_transactions_bulk(self, transactions: list):
+        """
+        Submit many {sender, recipient, data} transactions in one request.
+        Returns the node's per-item receipts (same order as the input).
+        """
+        wait = settings.BLOCKCHAIN_CONFIRM_WAIT_SECONDS
+        voter_ids = {tx.get("data", {}).get("voter_id") for tx in transactions} - {None}
+        for voter_id in voter_ids:
+            invalidate_voter(voter_id)
         try:
-            async with httpx.AsyncClient() as client:
-                url = f"{self.node_url.rstrip('/')}/transactions/new"
-                response = await client.post(url, json=payload)
-                if response.status_code == 200:
-                    return response.json()
-                logger.error(f"Blockchain Node Rejected: {response.status_code} - {response.text}")
-                return {"success": False, "error": f"Blockchain node rejected transaction: {response.status_code} - {response.text}"}
+            client = http_clients.get("blockchain")
+            url = f"{self.node_url.rstrip('/')}/transactions/batch"
+            response = await client.post(url, json={"transactions": transactions}, params={"wait": wait}, timeout=wait + 30.0)
+            if response.status_code in (200, 202):
+                receipts = response.json()["receipts"]
+                for receipt in receipts:
+                    if receipt.get("status") == "REJECTED":
+                        receipt["success"] = False
+                return receipts
+            logger.error(f"Blockchain Node Rejected Batch: {response.status_code} - {response.text}")
+            error = f"Blockchain node rejected batch: {response.status_code}"
         except Exception as e:
             logger.error(f"Blockchain Connection Error: {str(e)}")
-            return {"success": True, "transaction_hash": "OFFLINE", "block_index": -1}
+            error = str(e)
+        finally:
+            for voter_id in voter_ids:
+                invalidate_voter(voter_id)
+        return [{"success": False, "error": error} for _ in transactions]
+
+    async def _lookup(self, kind: str, voter_id: str, primary: bool, fetch):
+        """
+        Singleflight + short TTL cache for per-voter reads. Concurrent lookups
+        (one request checking twice, kiosk retries, eligibility right before a
+        vote) share one in-flight call. Non-empty results are reused for
+        BLOCKCHAIN_LOOKUP_CACHE_SECONDS, except by `primary` reads, which guard
+        writes and always go to the node (they still share in-flight calls).
+        """
+        now = monotonic()
+        if not primary:
+            recent = _recent.get((kind, voter_id))
+            if recent is not None and recent[0] > now:
+                return recent[1]
+        key = (kind, voter_id, primary)
+        task = _inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fetch())
+            _inflight[key] = task
+            started = _write_seq
+            _running[started] += 1
+
+            def settle(done: asyncio.Task):
+                if _inflight.get(key) is done:
+                    del _inflight[key]
+                _running[started] -= 1
+                if not _running[started]:
+                    del _running[started]
+                # Only cache what was read since the last write this backend made for the voter
+                if (not done.cancelled() and done.exception() is None and done.result()
+                        and _generation.get(voter_id, 0) <= started and settings.BLOCKCHAIN_LOOKUP_CACHE_SECONDS > 0):
+                    _recent[(kind, voter_id)] = (monotonic() + settings.BLOCKCHAIN_LOOKUP_CACHE_SECONDS, done.result())
+            task.add_done_callback(settle)
+            if len(_recent) > 10000:
+                for stale in [k for k, (expires_at, _) in _recent.items() if expires_at <= now]:
+                    del _recent[stale]
+        # A caller that gives up (client disconnect) must not cancel the call others are waiting on
+        return await asyncio.shield(task)
 
     async def verify_voter_history(self, voter_id: str):
+        return await self._lookup("verify", voter_id, False, lambda: self._fetch_voter_history(voter_id))
+
+    async def _fetch_voter_history(self, voter_id: str):
+        try:
+            client = http_clients.get("blockchain")
+            response = await client.get(f"{self.read_url()}/verify/{voter_id}")
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception:
+            return None
+
+    async def get_voter_state(self, voter_id: str, primary: bool = False):
+        """Latest chain state for a voter: owner_state, event_type, data_hash, tx_id"""
+        return await self._lookup("state", voter_id, primary, lambda: self._fetch_voter_state(voter_id, primary))
+
+    async def _fetch_voter_state(self, voter_id: str, primary: bool):
+        try:
+            client = http_clients.get("blockchain")
+            response = await client.get(f"{self.read_url(primary)}/state/{voter_id}")
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception:
+            return None
+
+    async def get_voter_states_bulk(self, voter_ids: list):
+        """Latest chain state for many voters; returns {voter_id: state} for those found"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.node_url}/verify/{voter_id}")
-                if response.status_code == 200:
-                    return response.json()
-                return None
+            client = http_clients.get("blockchain")
+            response = await client.post(f"{self.read_url()}/state/bulk", json={"voter_ids": voter_ids}, timeout=30.0)
+            if response.status_code == 200:
+                return response.json().get("states", {})
+            return None
         except Exception:
             return None
 
-    # [NEW] Added this method
-    async def get_full_chain(self):
-        """Fetch the entire blockchain to display in Admin Explorer"""
+    async def get_inclusion_proof(self, tx_id: str):
+        """Fetch the Merkle inclusion proof for a sealed transaction"""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.node_url}/chain")
-                if response.status_code == 200:
-                    return response.json()
-                return {"chain": []}
+            client = http_clients.get("blockchain")
+            response = await client.get(f"{self.read_url()}/proof/{tx_id}")
+            if response.status_code == 200:
+                return response.json()
+            return None
+        except Exception:
+            return None
+
+    async def get_inclusion_proofs_bulk(self, tx_ids: list):
+        """Merkle inclusion proofs for many transactions; returns {tx_id: proof} for those found"""
+        try:
+            client = http_clients.get("blockchain")
+            response = await client.post(f"{self.read_url()}/proof/bulk", json={"tx_ids": tx_ids}, timeout=30.0)
+            if response.status_code == 200:
+                return response.json().get("proofs", {})
+            return None
+        except Exception:
+            return None
+
+    async def get_block_hashes(self, indexes: list):
+        """Block hashes on the anchor node's chain ({index: hash}), to check proofs another node served"""
+        try:
+            client = http_clients.get("blockchain")
+            response = await client.post(f"{self.anchor_url}/headers/bulk", json={"indexes": indexes}, timeout=30.0)
+            if response.status_code == 200:
+                return {int(index): block_hash for index, block_hash in response.json().get("hashes", {}).items()}
+            return None
+        except Exception:
+            return None
+
+    async def get_chain_page(self, limit: int = 20, offset: int = 0, cursor: int = None, reverse: bool = True):
+        """Fetch one window of blocks (newest first by default) for the Admin Explorer"""
+        params = {"limit": limit, "offset": offset, "reverse": str(reverse).lower()}
+        if cursor is not None:
+            params["cursor"] = cursor
+        try:
+            client = http_clients.get("blockchain")
+            response = await client.get(f"{self.read_url()}/chain", params=params)
+            if response.status_code == 200:
+                return response.json()
+            return {"chain": [], "length": 0}
         except Exception as e:
             logger.error(f"Error fetching chain: {e}")
-            return {"chain": []}
\ No newline at end of file
+            return {"chain": [], "length": 0}
+
+    async def stream_chain(self, from_index: int = 1, to_index: int = None):
+        """Yield blocks one at a time from the node's NDJSON stream"""
+        params = {"from": from_index}
+        if to_index is not None:
+            params["to"] = to_index
+        client = http_clients.get("blockchain")
+        async with client.stream("GET", f"{self.read_url()}/chain/stream", params=params, timeout=None) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if line:
+                    yield json.loads(line)
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import logging
+from typing import Dict, Optional
+import httpx
+from app.core.config import settings
+from app.core.http import http_clients
+
+logger = logging.getLogger(__name__)
+
+class ChainFeedSubscriber:
+    """
+    Follows the blockchain node's /blocks/feed (Server-Sent Events) and keeps
+    a local copy of each voter's latest chain state (owner state, last event),
+    so hot-path checks like eligibility don't need a round-trip to the node.
+    """
+
+    def __init__(self, node_url: str):
+        self.node_url = node_url.rstrip('/')
+        self.states: Dict[str, dict] = {}
+        self.last_index = 0
+        self.last_hash: Optional[str] = None  # Hash of block `last_index`, checked by the node on resume
+        self.live = False  # True once caught up with the head and streaming
+
+    def get(self, voter_id: str) -> Optional[dict]:
+        """Cached latest state, or None if the feed isn't live or the voter is unknown"""
+        if not self.live:
+            return None
+        return self.states.get(voter_id)
+
+    async def run(self):
+        """Subscribe forever, resuming from the last applied block after any disconnect"""
+        backoff = 1.0
+        while True:
+            try:
+                await self._consume()
+                backoff = 1.0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Chain feed disconnected: {e}")
+            self.live = False
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30.0)
+
+    async def _consume(self):
+        params = {"from_index": self.last_index + 1}
+        if self.last_hash:
+            # Lets the node tell us (with a reset) if the chain was reorganised while we were away
+            params["last_hash"] = self.last_hash
+        timeout = httpx.Timeout(10.0, read=settings.CHAIN_FEED_READ_TIMEOUT_SECONDS)
+        client = http_clients.get("blockchain")
+        async with client.stream("GET", f"{self.node_url}/blocks/feed", params=params, timeout=timeout) as response:
+            response.raise_for_status()
+            logger.info(f"📡 Subscribed to chain feed from block #{params['from_index']}")
+            event, data = None, []
+            async for line in response.aiter_lines():
+                if line.startswith(":"):
+                    continue  # keepalive
+                elif line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data.append(line[5:].strip())
+                elif not line and event:
+                    self._dispatch(event, json.loads("\n".join(data) or "{}"))
+                    event, data = None, []
+
+    def _dispatch(self, event: str, payload: dict):
+        if event == "reset":
+            # Blocks after the fork are gone; the cache only holds latest states, so it can't be
+            # rolled back voter by voter. Lookups fall back to the node for anything not re-applied.
+            fork = payload.get("fork", 0)
+            logger.info(f"Chain reorganised after block #{fork}; clearing local voter state cache")
+            self.states.clear()
+            self.last_index, self.last_hash = fork, payload.get("hash")
+            self.live = False
+        elif event == "block":
+            self._apply_block(payload)
+        elif event == "head":
+            # Everything up to the node's head has been applied
+            self.live = True
+
+    def _apply_block(self, block: dict):
+        for offset, tx in enumerate(block.get('transactions', [])):
+            data = tx.get('data', {})
+            voter_id = data.get('voter_id')
+            if voter_id is None:
+                continue
+            # Same shape as the node's /state/{voter_id} (LatestStateView)
+            self.states[voter_id] = {
+                "voter_id": voter_id,
+                "event_type": data.get('event_type') or data.get('event'),
+                "owner_state": data.get('state') or data.get('owner_state') or data.get('to_state'),
+                "data_hash": data.get('data_hash'),
+                "tx_id": tx.get('tx_id'),
+                "block_index": block['index'],
+                "tx_offset": offset,
+                "timestamp": tx.get('timestamp'),
+            }
+        self.last_index = block['index']
+        self.last_hash = block.get('hash')
+
+chain_feed = ChainFeedSubscriber(settings.BLOCKCHAIN_SERVICE_URL)
@@ -0,0 +1,237 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.events import pubsub_manager
+from app.database.base import SessionLocal
+from app.database.models import AuditLog, ChainOutbox, Voter, generate_uuid
+from app.services.blockchain_client import BlockchainClient
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ("PENDING", "SUBMITTED")
+
+def pending_reference(entry: ChainOutbox) -> str:
+    """Placeholder stored where the transaction hash goes until the entry is confirmed"""
+    return f"PENDING:{entry.idempotency_key}"
+
+def failed_reference(entry: ChainOutbox) -> str:
+    """Replaces the placeholder when the node refuses the entry, so it no longer reads as in flight"""
+    return f"FAILED:{entry.idempotency_key}"
+
+def has_open_entries(db: Session, voter_id: str) -> bool:
+    """Whether this state still has a blockchain write for the voter waiting to be sealed"""
+    return db.query(ChainOutbox.id).filter(ChainOutbox.voter_id == voter_id,
+                                           ChainOutbox.status.in_(OPEN_STATUSES)).first() is not None
+
+class ChainOutboxDispatcher:
+    """
+    Transactional outbox for blockchain writes. Routes `enqueue` the
+    transaction in the same DB commit as the voter row it describes, so a
+    write is never lost and never recorded without its chain record; the
+    dispatcher drains entries to the node in batches, retrying with
+    exponential backoff while the node is unreachable. Every entry carries an
+    idempotency key, so a retry after a lost response (or a second
+    dispatcher) maps onto the original transaction instead of a duplicate.
+    """
+
+    def __init__(self):
+        self.blockchain = BlockchainClient()
+        self._wake = asyncio.Event()
+        self.attempted = 0
+        self.confirmed = 0
+        self.failed = 0
+
+    def enqueue(self, db: Session, sender: str, recipient: str, data: dict, idempotency_key: str = None) -> ChainOutbox:
+        """Add a transaction to the caller's DB transaction; call `wake()` after committing"""
+        entry = ChainOutbox(
+            idempotency_key=idempotency_key or generate_uuid(),
+            voter_id=data["voter_id"],
+            event_type=data.get("event_type", "UNKNOWN"),
+            payload={"sender": sender, "recipient": recipient, "data": data},
+        )
+        db.add(entry)
+        return entry
+
+    def track(self, db: Session, sender: str, recipient: str, data: dict, idempotency_key: str, tx_id: str) -> ChainOutbox:
+        """
+        Hand over a transaction that was sent directly (with `idempotency_key`)
+        and accepted but not sealed in time: the dispatcher polls it by key and
+        swaps the placeholder for the block hash once it is.
+        """
+        entry = self.enqueue(db, sender, recipient, data, idempotency_key)
+        entry.status = "SUBMITTED"
+        entry.tx_id = tx_id
+        entry.next_attempt_at = datetime.utcnow() + timedelta(seconds=settings.OUTBOX_RETRY_BASE_SECONDS)
+        return entry
+
+    def wake(self):
+        self._wake.set()
+
+    async def run(self):
+        """Drain the outbox forever, sleeping until woken or OUTBOX_POLL_SECONDS when idle"""
+        while True:
+            self._wake.clear()
+            try:
+                sent = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Outbox dispatch failed: {e}")
+                sent = 0
+            if sent:
+                continue  # More entries may already be due
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.OUTBOX_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def drain_once(self) -> int:
+        """Send one batch of due entries; returns how many were sent"""
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            due = (db.query(ChainOutbox)
+                   .filter(ChainOutbox.status.in_(OPEN_STATUSES),
+                           or_(ChainOutbox.next_attempt_at.is_(None), ChainOutbox.next_attempt_at <= now))
+                   .order_by(ChainOutbox.id).limit(settings.OUTBOX_BATCH_SIZE).all())
+            entries = self._in_voter_order(db, due)
+            if not entries:
+                return 0
+            receipts = await self.blockchain.create_transactions_bulk(
+                [{**entry.payload, "idempotency_key": entry.idempotency_key} for entry in entries])
+            now = datetime.utcnow()
+            for entry, receipt in zip(entries, receipts):
+                self._settle(db, entry, receipt, now)
+            db.commit()
+            self.attempted += len(entries)
+            self._forget_cached_votes([entry.voter_id for entry in entries
+                                       if entry.status == "FAILED" and entry.event_type == "VOTED"])
+            return len(entries)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _in_voter_order(db: Session, due: List[ChainOutbox]) -> List[ChainOutbox]:
+        """Hold back entries while an earlier entry for the same voter is still open and not in this batch"""
+        if not due:
+            return []
+        open_ids = defaultdict(list)
+        for voter_id, entry_id in (db.query(ChainOutbox.voter_id, ChainOutbox.id)
+                                   .filter(ChainOutbox.status.in_(OPEN_STATUSES),
+                                           ChainOutbox.voter_id.in_({entry.voter_id for entry in due}))):
+            open_ids[voter_id].append(entry_id)
+        selected = {entry.id for entry in due}
+        return [entry for entry in due
+                if all(entry_id in selected for entry_id in open_ids[entry.voter_id] if entry_id < entry.id)]
+
+    def _settle(self, db: Session, entry: ChainOutbox, receipt: Dict, now: datetime):
+        entry.attempts = (entry.attempts or 0) + 1
+        status = receipt.get("status")
+        if status == "CONFIRMED":
+            entry.status = "CONFIRMED"
+            entry.tx_id = receipt.get("tx_id")
+            entry.block_index = receipt.get("block_index")
+            entry.transaction_hash = receipt.get("transaction_hash")
+            entry.confirmed_at = now
+            entry.last_error = None
+            self._apply_confirmation(db, entry)
+            self.confirmed += 1
+        elif status == "PENDING":
+            # Accepted but not sealed within the wait: re-sending the same key later just polls it
+            entry.status = "SUBMITTED"
+            entry.tx_id = receipt.get("tx_id")
+            entry.next_attempt_at = now + timedelta(seconds=settings.OUTBOX_RETRY_BASE_SECONDS)
+        elif status == "REJECTED":
+            # The node refused the payload itself; retrying cannot help
+            entry.status = "FAILED"
+            entry.last_error = json.dumps(receipt.get("error"), default=str)
+            self._apply_failure(db, entry)
+            self.failed += 1
+            logger.error(f"Outbox entry {entry.id} ({entry.event_type} {entry.voter_id}) rejected: {entry.last_error}")
+        else:
+            # Node unreachable, erroring, or the chain was reset before sealing: back off and retry
+            entry.status = "PENDING"
+            entry.last_error = str(receipt.get("error") or receipt.get("message") or status)
+            delay = min(settings.OUTBOX_RETRY_BASE_SECONDS * 2 ** (entry.attempts - 1), settings.OUTBOX_RETRY_MAX_SECONDS)
+            entry.next_attempt_at = now + timedelta(seconds=delay)
+
+    @staticmethod
+    def _apply_confirmation(db: Session, entry: ChainOutbox):
+        """Swap the placeholder written by the route for the sealed transaction hash"""
+        reference = pending_reference(entry)
+        voter = db.get(Voter, entry.voter_id)
+        if voter is not None:
+            if voter.blockchain_transaction_id == reference:
+                voter.blockchain_transaction_id = entry.transaction_hash
+            meta = voter.voter_metadata or {}
+            if meta.get("voted_tx") == reference:
+                voter.voter_metadata = {**meta, "voted_tx": entry.transaction_hash}
+        (db.query(AuditLog).filter(AuditLog.voter_id == entry.voter_id, AuditLog.blockchain_hash == reference)
+         .update({AuditLog.blockchain_hash: entry.transaction_hash}, synchronize_session=False))
+
+    @staticmethod
+    def _apply_failure(db: Session, entry: ChainOutbox):
+        """
+        The chain will never record this entry: swap the placeholder for a
+        FAILED reference, reopen a vote that was never cast, and leave a
+        CHAIN_WRITE_FAILED audit entry for an administrator to follow up.
+        """
+        reference, failed = pending_reference(entry), failed_reference(entry)
+        voter = db.get(Voter, entry.voter_id)
+        if voter is not None:
+            if voter.blockchain_transaction_id == reference:
+                voter.blockchain_transaction_id = failed
+            meta = voter.voter_metadata or {}
+            if meta.get("voted_tx") == reference:
+                voter.voter_metadata = {**meta, "voted_tx": None, "failed_vote_tx": failed}
+                if voter.status == "VOTED":
+                    voter.status = "ACTIVE"
+                    voter.last_voted_at = None
+        (db.query(AuditLog).filter(AuditLog.voter_id == entry.voter_id, AuditLog.blockchain_hash == reference)
+         .update({AuditLog.blockchain_hash: failed, AuditLog.status: "FAILED"}, synchronize_session=False))
+        db.add(AuditLog(
+            voter_id=entry.voter_id,
+            event_type="CHAIN_WRITE_FAILED",
+            blockchain_hash=failed,
+            status="FAILED",
+            error_message=entry.last_error,
+            audit_metadata={"outbox_id": entry.id, "event_type": entry.event_type},
+        ))
+
+    @staticmethod
+    def _forget_cached_votes(voter_ids: List[str]):
+        """Drop the Redis "VOTED" fast path for votes that were reopened"""
+        if not voter_ids or not pubsub_manager.redis_client:
+            return
+        try:
+            pubsub_manager.redis_client.delete(*(f"voter_status:{voter_id}" for voter_id in voter_ids))
+        except Exception as e:
+            logger.warning(f"Redis cache invalidation failed: {e}")
+
+    def stats(self, db: Session) -> Dict:
+        """Entries per status, the age of the oldest open one, and the most recent failures"""
+        counts = dict(db.query(ChainOutbox.status, func.count(ChainOutbox.id)).group_by(ChainOutbox.status))
+        oldest = (db.query(ChainOutbox.created_at).filter(ChainOutbox.status.in_(OPEN_STATUSES))
+                  .order_by(ChainOutbox.id).first())
+        failures = (db.query(ChainOutbox).filter(ChainOutbox.status == "FAILED")
+                    .order_by(ChainOutbox.id.desc()).limit(20).all())
+        return {
+            "counts": counts,
+            "oldest_open_at": oldest[0] if oldest else None,
+            "attempted": self.attempted,
+            "confirmed": self.confirmed,
+            "failed": self.failed,
+            "recent_failures": [
+                {"id": entry.id, "voter_id": entry.voter_id, "event_type": entry.event_type,
+                 "attempts": entry.attempts, "error": entry.last_error}
+                for entry in failures
+            ],
+        }
+
+chain_outbox = ChainOutboxDispatcher()
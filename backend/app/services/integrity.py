@@ -1,7 +1,37 @@
 # backend/app/services/integrity.py
+import asyncio
 import hashlib
 import json
-from app.services.blockchain_client import BlockchainClient
+from collections import Counter, defaultdict, deque
+from itertools import islice
+from time import monotonic
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.database.models import Voter, IntegrityScan, IntegrityLeaf, IntegrityBucketRoot
+from app.services.blockchain_client import BlockchainClient, verify_inclusion_proof
+from app.services.merkle import MerkleTree
+
+class ScanRow(NamedTuple):
+    """What the scan keeps of a voter once it is hashed, so ORM rows can be released"""
+    voter_id: str
+    name: str
+    state_id: str
+    local_hash: str
+    is_simulated: bool
+
+def bucket_of(voter_id: str) -> str:
+    """Merkle bucket of a voter within its state (see IntegrityService.scan_incremental)"""
+    return voter_id[:settings.INTEGRITY_BUCKET_PREFIX]
+
+def _batches(items: Iterable, size: int) -> Iterator[list]:
+    items = iter(items)
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
 
 class IntegrityService:
     def __init__(self):
@@ -21,30 +51,67 @@ class IntegrityService:
 
     async def verify_voter_integrity(self, voter_sql_record):
         local_hash = self.calculate_local_hash(voter_sql_record)
-        
+
         # 1. Check Metadata for Simulation Flag
         # If we purposely hacked it, we mark it specifically
         meta = voter_sql_record.voter_metadata or {}
         is_simulated = meta.get("hacked", False)
 
-        chain_record = await self.blockchain.verify_voter_history(voter_sql_record.voter_id)
-        
+        chain_state = await self.blockchain.get_voter_state(voter_sql_record.voter_id)
+        proof, anchored = None, {}
+        if chain_state and chain_state.get('tx_id'):
+            proof = await self.blockchain.get_inclusion_proof(chain_state['tx_id'])
+        if proof is not None:
+            anchored = await self.blockchain.get_block_hashes([proof.get('block_index')]) or {}
+        return self._verdict(local_hash, is_simulated, chain_state, proof,
+                             anchored.get(proof.get('block_index')) if proof else None)
+
+    def _verdict(self, local_hash: str, is_simulated: bool, chain_state: Optional[Dict], proof: Optional[Dict],
+                 anchored_hash: Optional[str] = None) -> Dict:
         # 2. Check Service Failure / Missing on Chain
-        if not chain_record:
+        if not chain_state:
             return {
-                "status": "SERVICE_FAILED", 
+                "status": "SERVICE_FAILED",
                 "details": "Blockchain Service Unreachable or Record Missing",
                 "local_hash": local_hash,
                 "chain_hash": "UNKNOWN"
             }
-            
-        latest_tx = chain_record.get('latest', {})
-        chain_hash = latest_tx.get('data', {}).get('data_hash')
-        
+
+        # 2b. Only a hash proven against an anchored block counts; the node's word for it does not
+        if proof is None:
+            return {
+                "status": "UNPROVEN",
+                "details": "No inclusion proof for the latest record; the node's hash was not checked",
+                "local_hash": local_hash,
+                "chain_hash": chain_state.get('data_hash')
+            }
+        if not verify_inclusion_proof(proof):
+            return {
+                "status": "PROOF_INVALID",
+                "details": "Blockchain inclusion proof did not verify",
+                "local_hash": local_hash,
+                "chain_hash": "UNKNOWN"
+            }
+        chain_hash = proof['tx'].get('data', {}).get('data_hash')
+        if anchored_hash is None:
+            return {
+                "status": "UNPROVEN",
+                "details": "The proof's block could not be checked against the anchor node",
+                "local_hash": local_hash,
+                "chain_hash": chain_hash
+            }
+        if anchored_hash != proof['block_hash']:
+            return {
+                "status": "PROOF_INVALID",
+                "details": "The proof's block is not on the anchor node's chain",
+                "local_hash": local_hash,
+                "chain_hash": "UNKNOWN"
+            }
+
         # 3. Check for Mismatch
         if local_hash == chain_hash:
             return {
-                "status": "SECURE", 
+                "status": "SECURE",
                 "details": "Blockchain signature verified",
                 "local_hash": local_hash,
                 "chain_hash": chain_hash
@@ -53,8 +120,276 @@ class IntegrityService:
             # Hash Mismatch! Is it our simulation or a real attack?
             status_label = "SIMULATED_TAMPERING" if is_simulated else "TAMPERED"
             return {
-                "status": status_label, 
+                "status": status_label,
                 "details": "CRITICAL: Database hash does not match Blockchain hash!",
                 "local_hash": local_hash,
                 "chain_hash": chain_hash
-            }
\ No newline at end of file
+            }
+
+    @staticmethod
+    def report_entry(voter_id: str, name: str, result: Dict) -> Dict:
+        """One row of the admin integrity report (the Attack Modal shows both hashes)"""
+        return {
+            "voter_id": voter_id,
+            "name": name,  # Full name visible only to Admin
+            "status": result["status"],
+            "details": result["details"],
+            "local_hash": result.get("local_hash"),
+            "chain_hash": result.get("chain_hash"),
+            "hash_mismatch": result.get("status") in ["TAMPERED", "SIMULATED_TAMPERING"]
+        }
+
+    def hash_batch(self, voters: Iterable) -> List[ScanRow]:
+        return [
+            ScanRow(voter.voter_id, f"{voter.first_name} {voter.last_name}", voter.current_state_id,
+                    self.calculate_local_hash(voter), bool((voter.voter_metadata or {}).get("hacked", False)))
+            for voter in voters
+        ]
+
+    async def verify_batch(self, rows: List[ScanRow]) -> List[Dict]:
+        """Check a batch against the chain with one state, one proof and one block-hash request"""
+        states = await self.blockchain.get_voter_states_bulk([row.voter_id for row in rows]) or {}
+        proofs, anchored = {}, {}
+        tx_ids = [state['tx_id'] for state in states.values() if state.get('tx_id')]
+        if tx_ids:
+            # A node without /proof/bulk answers None: those records come back UNPROVEN
+            proofs = await self.blockchain.get_inclusion_proofs_bulk(tx_ids) or {}
+        if proofs:
+            # Block hashes from the anchor node, so a read replica cannot vouch for its own blocks
+            anchored = await self.blockchain.get_block_hashes(
+                sorted({proof['block_index'] for proof in proofs.values()})) or {}
+        report = []
+        for row in rows:
+            state = states.get(row.voter_id)
+            proof = proofs.get(state.get('tx_id')) if state else None
+            result = self._verdict(row.local_hash, row.is_simulated, state, proof,
+                                   anchored.get(proof.get('block_index')) if proof else None)
+            report.append(self.report_entry(row.voter_id, row.name, result))
+        return report
+
+    async def _verified_batches(self, voters: Iterable, batch_size: int,
+                                concurrency: int) -> AsyncIterator[Tuple[List[ScanRow], List[Dict]]]:
+        """(rows, report entries) per batch, in input order, with at most `concurrency` batches in flight"""
+        batches = _batches(voters, batch_size)
+        in_flight = deque()
+        try:
+            while True:
+                while len(in_flight) < concurrency:
+                    batch = next(batches, None)
+                    if batch is None:
+                        break
+                    rows = self.hash_batch(batch)
+                    in_flight.append((rows, asyncio.ensure_future(self.verify_batch(rows))))
+                if not in_flight:
+                    break
+                rows, task = in_flight.popleft()
+                yield rows, await task
+        finally:
+            # The client went away mid-scan: don't leave batches running against the node
+            for _, task in in_flight:
+                task.cancel()
+
+    async def scan(self, voters: Iterable, total: Optional[int] = None, batch_size: Optional[int] = None,
+                   concurrency: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Verify every voter from `voters` (e.g. a `yield_per` query) against the
+        chain, yielding NDJSON-ready events: `start`, one `result` per voter,
+        `progress` after each batch, then `done` with per-status counts.
+        Results come out in input order; at most `concurrency` batches are
+        waiting on the node, which also bounds how many rows are held in memory.
+        """
+        batch_size = batch_size or settings.INTEGRITY_SCAN_BATCH_SIZE
+        concurrency = concurrency or settings.INTEGRITY_SCAN_CONCURRENCY
+        started = monotonic()
+        counts = Counter()
+        scanned = 0
+        yield {"event": "start", "total": total, "batch_size": batch_size, "concurrency": concurrency}
+
+        async for _, entries in self._verified_batches(voters, batch_size, concurrency):
+            for entry in entries:
+                counts[entry["status"]] += 1
+                yield {"event": "result", **entry}
+            scanned = sum(counts.values())
+            yield {"event": "progress", "scanned": scanned, "total": total, "counts": dict(counts),
+                   "voters_per_second": round(scanned / max(monotonic() - started, 1e-6))}
+
+        yield {"event": "done", "scanned": scanned, "total": total, "counts": dict(counts),
+               "secure": scanned > 0 and counts["SECURE"] == scanned, "seconds": round(monotonic() - started, 3)}
+
+    async def scan_incremental(self, db: Session, full: bool = False, deep: bool = True,
+                               batch_size: Optional[int] = None, concurrency: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Integrity scan that only goes back to the chain for what changed.
+
+        1. `changed`: voters whose coalesce(updated_at, created_at) is at or
+           after the watermark of the last clean scan are verified against the
+           chain like `scan`. Rows that match become verified leaves.
+        2. `roots`: leaves are grouped into buckets (state, voter_id prefix),
+           each with a persisted Merkle root. Every bucket phase 1 touched is
+           rehashed locally (no network), one bucket in memory at a time, and
+           its root compared with the verified one. Where they differ the trees
+           are descended to the rows that changed without `updated_at` moving
+           (direct SQL writes, long transactions), and those are verified too.
+           By default (`deep=True`) every bucket is rehashed, so such rows are
+           found anywhere. `deep=False` only rehashes the buckets phase 1
+           touched: a raw SQL edit in any other bucket goes unseen, so a
+           non-deep run is a freshness check, not a tamper check.
+
+        With no clean scan yet, or `full=True`, the leaves are rebuilt from a
+        scan of every voter. The watermark only advances when nothing failed.
+        """
+        batch_size = batch_size or settings.INTEGRITY_SCAN_BATCH_SIZE
+        concurrency = concurrency or settings.INTEGRITY_SCAN_CONCURRENCY
+        started = monotonic()
+        changed_at = func.coalesce(Voter.updated_at, Voter.created_at)
+        last_clean = None if full else (db.query(IntegrityScan).filter(IntegrityScan.clean.is_(True))
+                                        .order_by(IntegrityScan.id.desc()).first())
+        since = last_clean.watermark if last_clean is not None else None
+        record = IntegrityScan(mode="FULL" if since is None else "DEEP" if deep else "INCREMENTAL",
+                               watermark=db.query(func.max(changed_at)).scalar())
+        changed = db.query(Voter)
+        if since is None:
+            db.query(IntegrityLeaf).delete()
+            db.query(IntegrityBucketRoot).delete()
+            db.commit()
+        else:
+            changed = changed.filter(changed_at >= since)
+        total = changed.count()
+        counts, reported, touched = Counter(), set(), set()
+        yield {"event": "start", "mode": record.mode, "deep": deep, "since": since, "changed": total,
+               "batch_size": batch_size, "concurrency": concurrency}
+
+        # Phase 1: rows changed since the last clean scan
+        voters = changed.order_by(Voter.voter_id).yield_per(batch_size)
+        async for rows, entries in self._verified_batches(voters, batch_size, concurrency):
+            touched |= self._record_leaves(db, rows, entries)
+            for entry in entries:
+                counts[entry["status"]] += 1
+                reported.add(entry["voter_id"])
+                yield {"event": "result", "phase": "changed", **entry}
+            yield {"event": "progress", "phase": "changed", "scanned": len(reported), "total": total,
+                   "counts": dict(counts), "voters_per_second": round(len(reported) / max(monotonic() - started, 1e-6))}
+        db.commit()
+
+        # Phase 2: one root comparison per bucket, descending only where they differ
+        by_state = defaultdict(list)
+        for state, bucket in sorted(self._all_buckets(db) if deep else touched):
+            by_state[state].append(bucket)
+        states_matched, buckets_checked = 0, 0
+        for state, buckets in by_state.items():
+            matched, localized, nodes_compared, stale = 0, 0, 0, set()
+            for bucket in buckets:
+                buckets_checked += 1
+                current = {}
+                query = (db.query(Voter).filter(Voter.current_state_id == state, self._in_bucket(Voter.voter_id, bucket))
+                         .yield_per(batch_size))
+                for batch in _batches(query, batch_size):
+                    current.update((row.voter_id, row.local_hash) for row in self.hash_batch(batch))
+                    await asyncio.sleep(0)  # Hashing is CPU-only; let other requests in between batches
+                verified = None
+                stored = db.get(IntegrityBucketRoot, (state, bucket))
+                if stored is None or (state, bucket) in touched:
+                    verified = self._leaves(db, state, bucket)
+                    stored = self._save_root(db, state, bucket, verified)
+                if MerkleTree(current).root == stored.merkle_root:
+                    matched += 1
+                    continue
+
+                verified = verified if verified is not None else self._leaves(db, state, bucket)
+                keys = sorted(current.keys() | verified.keys())
+                differing, compared = MerkleTree(current, keys).diff(MerkleTree(verified, keys))
+                localized += len(differing)
+                nodes_compared += compared
+                suspects = [voter_id for voter_id in differing if voter_id not in reported]
+                reported.update(suspects)
+                for voter_id in suspects:
+                    # A voter now filed under another state is localized (and verified) there instead
+                    if voter_id not in current and db.get(Voter, voter_id) is None:
+                        counts["MISSING_LOCAL"] += 1
+                        yield {"event": "result", "phase": "roots", **self.report_entry(voter_id, None, {
+                            "status": "MISSING_LOCAL",
+                            "details": "Previously verified voter is missing from the database",
+                            "local_hash": None,
+                            "chain_hash": "UNKNOWN"
+                        })}
+                present = [voter_id for voter_id in suspects if voter_id in current]
+                voters = (voter for chunk in _batches(present, batch_size)
+                          for voter in db.query(Voter).filter(Voter.voter_id.in_(chunk)).all())
+                async for rows, entries in self._verified_batches(voters, batch_size, concurrency):
+                    stale |= self._record_leaves(db, rows, entries)
+                    for entry in entries:
+                        counts[entry["status"]] += 1
+                        yield {"event": "result", "phase": "roots", **entry}
+                stale.add((state, bucket))
+            for stale_state, stale_bucket in stale:
+                self._save_root(db, stale_state, stale_bucket, self._leaves(db, stale_state, stale_bucket))
+            states_matched += matched == len(buckets)
+            yield {"event": "state_root", "state": state, "buckets": len(buckets), "buckets_matched": matched,
+                   "matches": matched == len(buckets), "localized": localized, "nodes_compared": nodes_compared,
+                   "verified_root": self._state_root(db, state)}
+
+        scanned = sum(counts.values())
+        record.clean = counts["SECURE"] == scanned
+        record.scanned = scanned
+        record.counts = dict(counts)
+        record.finished_at = func.now()
+        db.add(record)
+        db.commit()
+        yield {"event": "done", "mode": record.mode, "deep": deep, "clean": record.clean, "scanned": scanned,
+               "counts": dict(counts), "states": len(by_state), "roots_matched": states_matched,
+               "buckets_checked": buckets_checked,
+               "watermark": record.watermark if record.clean else since, "seconds": round(monotonic() - started, 3)}
+
+    @staticmethod
+    def _in_bucket(voter_id_column, bucket: str):
+        return func.substr(voter_id_column, 1, settings.INTEGRITY_BUCKET_PREFIX) == bucket
+
+    @staticmethod
+    def _all_buckets(db: Session) -> Set[Tuple[str, str]]:
+        prefix = func.substr(Voter.voter_id, 1, settings.INTEGRITY_BUCKET_PREFIX)
+        return ({(state, bucket) for state, bucket in db.query(Voter.current_state_id, prefix).distinct()} |
+                {(state, bucket) for state, bucket in db.query(IntegrityLeaf.state_id, IntegrityLeaf.bucket).distinct()})
+
+    @staticmethod
+    def _record_leaves(db: Session, rows: List[ScanRow], entries: List[Dict]) -> Set[Tuple[str, str]]:
+        """Store rows that matched the chain as verified leaves; returns the (state, bucket)s whose leaves changed"""
+        secure = {row.voter_id: row for row, entry in zip(rows, entries) if entry["status"] == "SECURE"}
+        if not secure:
+            return set()
+        leaves = {leaf.voter_id: leaf for leaf in
+                  db.query(IntegrityLeaf).filter(IntegrityLeaf.voter_id.in_(list(secure)))}
+        touched = set()
+        for voter_id, row in secure.items():
+            leaf = leaves.get(voter_id)
+            bucket = bucket_of(voter_id)
+            if leaf is None:
+                db.add(IntegrityLeaf(voter_id=voter_id, state_id=row.state_id, bucket=bucket, local_hash=row.local_hash))
+            elif (leaf.state_id, leaf.local_hash) != (row.state_id, row.local_hash):
+                touched.add((leaf.state_id, leaf.bucket))
+                leaf.state_id, leaf.local_hash = row.state_id, row.local_hash
+            else:
+                continue
+            touched.add((row.state_id, bucket))
+        # Flush, not commit: the caller may still be streaming voters from an open yield_per cursor
+        db.flush()
+        return touched
+
+    @staticmethod
+    def _leaves(db: Session, state: str, bucket: str) -> Dict[str, str]:
+        return dict(db.query(IntegrityLeaf.voter_id, IntegrityLeaf.local_hash)
+                    .filter(IntegrityLeaf.state_id == state, IntegrityLeaf.bucket == bucket))
+
+    @staticmethod
+    def _save_root(db: Session, state: str, bucket: str, leaves: Dict[str, str]) -> IntegrityBucketRoot:
+        root = db.get(IntegrityBucketRoot, (state, bucket)) or IntegrityBucketRoot(state_id=state, bucket=bucket)
+        root.merkle_root = MerkleTree(leaves).root
+        root.leaf_count = len(leaves)
+        db.add(root)
+        db.flush()
+        return root
+
+    @staticmethod
+    def _state_root(db: Session, state: str) -> str:
+        """Root over a state's bucket roots: one value that changes if any of its verified leaves does"""
+        return MerkleTree(dict(db.query(IntegrityBucketRoot.bucket, IntegrityBucketRoot.merkle_root)
+                               .filter(IntegrityBucketRoot.state_id == state))).root
@@ -0,0 +1,57 @@
+# backend/app/services/merkle.py
+import hashlib
+from typing import Dict, List, Optional, Tuple
+from app.services.blockchain_client import MERKLE_LEAF_PREFIX, MERKLE_NODE_PREFIX
+
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
+
+class MerkleTree:
+    """
+    Merkle tree over {voter_id: record hash} leaves in voter_id order, using the
+    chain's domain separation (odd nodes are promoted, not duplicated). Equal
+    roots mean every leaf matches; otherwise `diff` walks down only the
+    subtrees whose hashes differ to find the voters responsible.
+    """
+
+    def __init__(self, leaves: Dict[str, str], keys: Optional[List[str]] = None):
+        # `keys` lays two trees out over the same positions; keys missing from `leaves` get an "absent" leaf
+        self.keys = sorted(leaves) if keys is None else keys
+        level = [self.leaf(key, leaves.get(key)) for key in self.keys]
+        self.levels = [level]
+        while len(level) > 1:
+            level = self._next_level(level)
+            self.levels.append(level)
+
+    @staticmethod
+    def leaf(key: str, value: Optional[str]) -> bytes:
+        # The key is part of the leaf, so two voters swapping hashes still changes the root
+        return hashlib.sha256(MERKLE_LEAF_PREFIX + key.encode() + b"\x00" + (value or "").encode()).digest()
+
+    @staticmethod
+    def _next_level(level: List[bytes]) -> List[bytes]:
+        parents = [hashlib.sha256(MERKLE_NODE_PREFIX + level[i] + level[i + 1]).digest()
+                   for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            parents.append(level[-1])
+        return parents
+
+    @property
+    def root(self) -> str:
+        return self.levels[-1][0].hex() if self.keys else EMPTY_ROOT
+
+    def diff(self, other: "MerkleTree") -> Tuple[List[str], int]:
+        """Keys whose leaves differ from `other` (laid out over the same keys), and how many nodes were compared"""
+        if self.keys != other.keys:
+            raise ValueError("Trees must be built over the same keys")
+        if not self.keys:
+            return [], 0
+        positions, compared = [0], 1
+        if self.levels[-1][0] == other.levels[-1][0]:
+            return [], compared
+        for depth in range(len(self.levels) - 2, -1, -1):
+            mine, theirs = self.levels[depth], other.levels[depth]
+            children = [child for position in positions for child in (2 * position, 2 * position + 1)
+                        if child < len(mine)]
+            compared += len(children)
+            positions = [child for child in children if mine[child] != theirs[child]]
+        return [self.keys[position] for position in positions], compared
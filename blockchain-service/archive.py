@@ -0,0 +1,165 @@
+import lzma
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+# Archived segment file: <8-byte magic><8-byte uncompressed log size><compressed log>.
+# The codec is named by the file suffix; the segment's .idx stays uncompressed.
+ARCHIVE_HEADER = struct.Struct(">8sQ")
+ARCHIVE_MAGIC = b"VMSARC01"
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("ARCHIVE_CODEC=zstd requires the `zstandard` package (pip install zstandard)")
+    return zstandard
+
+# name -> (file suffix, streaming compressor factory, whole-buffer decompressor)
+CODECS: Dict[str, Any] = {
+    "zstd": (".log.zst", lambda: _zstandard().ZstdCompressor(level=3).compressobj(),
+             lambda data: _zstandard().ZstdDecompressor().decompressobj().decompress(data)),
+    "lzma": (".log.xz", lzma.LZMACompressor, lzma.decompress),
+    "zlib": (".log.z", lambda: zlib.compressobj(6), zlib.decompress),
+}
+ARCHIVE_SUFFIXES = tuple(suffix for suffix, _, _ in CODECS.values())
+
+def resolve_codec(name: str) -> str:
+    """'auto' picks zstd when `zstandard` is installed and falls back to zlib"""
+    if name == "auto":
+        try:
+            _zstandard()
+            return "zstd"
+        except RuntimeError:
+            return "zlib"
+    if name not in CODECS:
+        raise RuntimeError(f"Unknown ARCHIVE_CODEC: {name}")
+    if name == "zstd":
+        _zstandard()
+    return name
+
+def codec_for(path: str) -> str:
+    return next(name for name, (suffix, _, _) in CODECS.items() if path.endswith(suffix))
+
+def compress_file(source, size: int, path: str, codec: str, chunk_size: int = 1024 * 1024) -> int:
+    """Stream `size` bytes of the open file `source` into an archive at `path`; returns its size"""
+    compressor = CODECS[codec][1]()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, size))
+        offset = 0
+        while offset < size:
+            chunk = os.pread(source.fileno(), min(chunk_size, size - offset), offset)
+            if not chunk:
+                raise OSError(f"{path}: source ended at {offset} of {size} bytes")
+            f.write(compressor.compress(chunk))
+            offset += len(chunk)
+        f.write(compressor.flush())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+def read_header(path: str) -> int:
+    """Uncompressed log size recorded in an archive"""
+    with open(path, "rb") as f:
+        magic, size = ARCHIVE_HEADER.unpack(f.read(ARCHIVE_HEADER.size))
+    if magic != ARCHIVE_MAGIC:
+        raise ValueError(f"{path} is not an archived segment")
+    return size
+
+def decompress_file(path: str) -> bytes:
+    size = read_header(path)
+    with open(path, "rb") as f:
+        f.seek(ARCHIVE_HEADER.size)
+        data = CODECS[codec_for(path)][2](f.read())
+    if len(data) != size:
+        raise ValueError(f"{path}: expected {size} bytes, decompressed {len(data)}")
+    return data
+
+class SegmentCache:
+    """
+    Decompressed logs of recently read archived segments, least recently used
+    evicted first. Bounds the memory that audits and old /chain ranges can pin.
+    """
+
+    def __init__(self, max_segments: int = 2):
+        self.max_segments = max_segments
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: str, load: Callable[[], bytes]) -> bytes:
+        with self._lock:
+            data = self._entries.get(path)
+            if data is not None:
+                self._entries.move_to_end(path)
+                self.hits += 1
+                return data
+            self.misses += 1
+        # Decompress outside the lock so reads of other segments are not held up
+        data = load()
+        with self._lock:
+            self._entries[path] = data
+            self._entries.move_to_end(path)
+            while len(self._entries) > max(self.max_segments, 1):
+                self._entries.popitem(last=False)
+        return data
+
+    def discard(self, path: str):
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"segments": len(self._entries), "bytes": sum(map(len, self._entries.values())),
+                    "hits": self.hits, "misses": self.misses}
+
+class SegmentArchiver:
+    """
+    Compresses sealed segments once every block in them is more than
+    `after_blocks` behind the head. Checked by the single writer after each
+    change; the compression itself runs on a background thread.
+    """
+
+    def __init__(self, store, after_blocks: int = 10000, codec: str = "auto"):
+        self.store = store
+        self.after_blocks = after_blocks
+        self.codec = resolve_codec(codec) if after_blocks > 0 else None
+        self._worker: Optional[threading.Thread] = None
+
+    def candidates(self) -> List[int]:
+        cutoff = len(self.store) - self.after_blocks
+        # Never the active (last) segment, which is still being appended to
+        return [segment.base for segment in self.store.segments[:-1]
+                if not segment.archived and segment.base + segment.count <= cutoff]
+
+    def maybe_archive(self) -> bool:
+        if self.after_blocks <= 0 or (self._worker is not None and self._worker.is_alive()):
+            return False
+        bases = self.candidates()
+        if not bases:
+            return False
+        self._worker = threading.Thread(target=self.archive, args=(bases,), name="segment-archiver", daemon=True)
+        self._worker.start()
+        return True
+
+    def archive(self, bases: List[int]):
+        for base in bases:
+            try:
+                result = self.store.archive(base, self.codec)
+            except (OSError, ValueError) as e:
+                # e.g. the segment was truncated or the chain reset underneath us
+                print(f"[ARCHIVE] Skipped segment {base}: {e}")
+                continue
+            if result is not None:
+                raw, compressed = result
+                print(f"[ARCHIVE] Segment {base}: {raw:,} -> {compressed:,} bytes ({self.codec})")
+
+    def join(self):
+        if self._worker is not None:
+            self._worker.join()
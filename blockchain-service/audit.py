@@ -0,0 +1,141 @@
+"""
+Parallel full-chain audit: re-verify every block from genesis on a process pool.
+
+The chain is cut into byte-bounded ranges of raw records. Each worker decodes
+its range and checks contents against the sealed hash, the hash links inside
+the range and consensus (PoW target or authority signature), exactly as
+Blockchain.check_integrity does serially. The parent then checks the links
+and consensus across every range boundary, in order, so the result is the
+same as a serial audit.
+
+Served as NDJSON progress by GET /chain/audit, or offline against a stopped
+node's data directory:
+    python -m audit --workers 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from time import monotonic
+from typing import Any, Dict, Iterator, Optional
+from block_store import BlockStore, iter_records
+from blockchain import Blockchain
+from config import settings
+from consensus import Consensus, from_spec, verifying_consensus
+from encoding import verify_block
+from signing import load_keys
+
+_consensus: Optional[Consensus] = None
+
+def _init_worker(spec: Dict[str, Any]):
+    global _consensus
+    # Same rules as the node's consensus, but verify-only: public keys, difficulty floor, switch height
+    _consensus = from_spec(spec)
+
+def _header(block: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in block.items() if key != 'transactions'}
+
+def verify_range(first: int, count: int, data: bytes) -> Dict[str, Any]:
+    """Worker: verify `count` consecutive records starting at store position `first`"""
+    previous, previous_hash, head = None, None, None
+    verified = 0
+    for block in iter_records(data, count):
+        block_hash = verify_block(block)
+        if block_hash is None:
+            return _failure(block, "contents do not match the sealed hash", verified)
+        if previous is not None and block['previous_hash'] != previous_hash:
+            return _failure(block, "does not link to the previous block", verified)
+        # The first block of a range is checked against its predecessor by the parent
+        if not _consensus.verify(block, previous):
+            return _failure(block, "fails consensus", verified)
+        if head is None:
+            head = _header(block)
+        previous, previous_hash = block, block_hash
+        verified += 1
+    if verified != count:
+        return {"verified": verified, "failure": {"index": first + verified + 1, "reason": "record is truncated"}}
+    return {"verified": verified, "failure": None,
+            "head": head, "tail": _header(previous), "tail_hash": previous_hash}
+
+def _failure(block: Dict[str, Any], reason: str, verified: int) -> Dict[str, Any]:
+    return {"verified": verified, "failure": {"index": block.get('index'), "reason": reason}}
+
+def run_audit(store: BlockStore, consensus: Consensus, workers: int = 0, range_bytes: int = 8 * 1024 * 1024,
+              progress_every: float = 1.0) -> Iterator[Dict[str, Any]]:
+    """
+    Audit every block in the store (as of the start) and yield progress
+    events, then one `done` event carrying the audited head's hash.
+    """
+    workers = workers or os.cpu_count() or 1
+    length = len(store)
+    head_hash = Blockchain.hash(store.last()) if length else None
+    started = last_report = monotonic()
+    yield {"event": "start", "length": length, "workers": workers}
+
+    verified, failure = 0, None
+    previous_tail, previous_hash = None, None
+    # spawn: the node is multi-threaded, so forking workers is unsafe
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker, initargs=(consensus.spec(),))
+    try:
+        ranges = store.raw_ranges(0, length, range_bytes)
+        in_flight = deque()
+        while True:
+            # Keep every worker busy while bounding how much raw data is held in memory
+            while len(in_flight) < workers * 2:
+                chunk = next(ranges, None)
+                if chunk is None:
+                    break
+                in_flight.append(pool.submit(verify_range, *chunk))
+            if not in_flight:
+                break
+            result = in_flight.popleft().result()
+            if result["failure"] is None and previous_tail is not None:
+                # Range boundary: link and consensus against the previous range's last block
+                head = result["head"]
+                if head['previous_hash'] != previous_hash:
+                    result["failure"] = {"index": head['index'], "reason": "does not link to the previous block"}
+                elif not consensus.verify(head, previous_tail):
+                    result["failure"] = {"index": head['index'], "reason": "fails consensus"}
+            verified += result["verified"]
+            if result["failure"] is not None:
+                failure = result["failure"]
+                for future in in_flight:
+                    future.cancel()
+                break
+            previous_tail, previous_hash = result["tail"], result["tail_hash"]
+            now = monotonic()
+            if now - last_report >= progress_every:
+                last_report = now
+                yield {"event": "progress", "verified": verified, "length": length,
+                       "blocks_per_second": round(verified / (now - started))}
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+    done = {"event": "done", "is_valid": failure is None, "verified": verified, "length": length,
+            "head_hash": head_hash, "failure": failure, "seconds": round(monotonic() - started, 3)}
+    if length and (len(store) < length or Blockchain.hash(store.get(length - 1)) != head_hash):
+        # A reorg replaced blocks we were reading; the verdict is about neither chain
+        done.update(is_valid=None, message="Chain was reorganised during the audit; run it again")
+    yield done
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=settings.AUDIT_WORKERS, help="0 uses every core")
+    parser.add_argument("--range-mb", type=float, default=settings.AUDIT_RANGE_BYTES / 2**20)
+    args = parser.parse_args()
+
+    _, verifier = load_keys(settings.POA_SIGNER_ID, settings.POA_PRIVATE_KEY, settings.POA_AUTHORITIES)
+    store = BlockStore(settings.CHAIN_DATA_DIR, settings.SEGMENT_MAX_BYTES, fsync=False)
+    try:
+        for event in run_audit(store, verifying_consensus(verifier), args.workers, int(args.range_mb * 2**20)):
+            print(json.dumps(event), flush=True)
+    finally:
+        store.close()
+    return 0 if event.get("is_valid") else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""
+Consensus benchmark: block-seal latency and throughput, PoW vs PoA.
+
+Seals the same batches through a throwaway block store under each mode.
+Run from blockchain-service/:
+    python -m benchmarks.consensus_bench --blocks 50 --txs 100 --zeros 4
+"""
+import argparse
+import shutil
+import tempfile
+from statistics import mean, quantiles
+from time import perf_counter, time
+from block_store import BlockStore
+from blockchain import Blockchain
+from consensus import ProofOfAuthority, ProofOfWork
+from mining import MiningEngine
+from signing import Signer, Verifier, generate_key_pair
+
+def make_batch(size: int, block: int):
+    return [{
+        'tx_id': f'{block:08d}{i:08d}',
+        'sender': 'STATE_A',
+        'recipient': 'BLOCKCHAIN',
+        'data': {'voter_id': f'V{block}-{i}', 'event_type': 'REGISTERED', 'state': 'STATE_A', 'data_hash': '00' * 32},
+        'timestamp': time(),
+    } for i in range(size)]
+
+def bench(consensus, blocks: int, txs: int):
+    directory = tempfile.mkdtemp(prefix="consensus-bench-")
+    store = BlockStore(directory, fsync=False)
+    try:
+        chain = Blockchain(store, consensus)
+        latencies = []
+        for n in range(blocks):
+            batch = make_batch(txs, n)
+            start = perf_counter()
+            chain.seal(batch)
+            latencies.append(perf_counter() - start)
+        assert chain.check_integrity(full=True)
+        return latencies
+    finally:
+        store.close()
+        consensus.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--blocks", type=int, default=50, help="blocks to seal per mode")
+    parser.add_argument("--txs", type=int, default=100, help="transactions per block")
+    parser.add_argument("--zeros", type=int, default=4, help="PoW difficulty in leading hex zeroes")
+    parser.add_argument("--workers", type=int, default=1, help="PoW worker processes")
+    args = parser.parse_args()
+
+    modes = {"pow": lambda: ProofOfWork(MiningEngine(workers=args.workers, leading_zeros=args.zeros))}
+    try:
+        pair = generate_key_pair()
+        modes["poa"] = lambda: ProofOfAuthority(Signer("BENCH", pair["private_key"]), Verifier({}))
+    except RuntimeError as e:
+        print(f"Skipping PoA: {e}")
+
+    print(f"{args.blocks} blocks x {args.txs} txs, PoW at {args.zeros} leading zeroes")
+    print(f"{'mode':>5} {'mean ms':>9} {'p50 ms':>8} {'p99 ms':>8} {'blocks/s':>9} {'txs/s':>10}")
+    for name, build in modes.items():
+        latencies = bench(build(), args.blocks, args.txs)
+        cuts = quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        total = sum(latencies)
+        print(f"{name:>5} {mean(latencies) * 1000:>9.2f} {cuts[49] * 1000:>8.2f} {cuts[98] * 1000:>8.2f} "
+              f"{args.blocks / total:>9.1f} {args.blocks * args.txs / total:>10,.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Memory benchmark: resident bytes per transaction for the node's in-memory state
+(voter index, tx index, latest-state view and receipt cache).
+
+"before" rebuilds the original dict/tuple layout, "after" uses the compact
+records the node now keeps. Blocks are decoded from JSON, as during a replay.
+Run from blockchain-service/:
+    python -m benchmarks.memory_bench --voters 50000 --events 3
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+from uuid import uuid4
+from indexes import LatestStateView, TxIndex, VoterIndex, owner_state
+from records import Receipt
+
+STATES = [f"STATE_{c}" for c in "ABCDEFGHIJKLMNOPQRSTUVWXYZ"]
+EVENTS = ["REGISTERED", "TRANSFERRED", "VOTED"]
+
+def make_blocks(voters: int, events: int, block_size: int):
+    txs = []
+    for event in range(events):
+        for v in range(voters):
+            txs.append({
+                'tx_id': uuid4().hex,
+                'sender': STATES[v % len(STATES)],
+                'recipient': 'BLOCKCHAIN',
+                'data': {
+                    'voter_id': f"VOTER-{v:08d}",
+                    'event_type': EVENTS[event % len(EVENTS)],
+                    'state': STATES[(v + event) % len(STATES)],
+                    'data_hash': uuid4().hex + uuid4().hex,
+                },
+                'timestamp': 1700000000.0 + len(txs),
+            })
+    for start in range(0, len(txs), block_size):
+        block = {'index': start // block_size + 2, 'hash': uuid4().hex * 2, 'transactions': txs[start:start + block_size]}
+        # Round-trip through JSON so every string is a fresh object, as when read from the block store
+        yield json.loads(json.dumps(block))
+
+class LegacyIndexes:
+    """The original layout: tuples, nested dicts and a dict per receipt"""
+
+    def __init__(self):
+        self.voters, self.txs, self.states, self.receipts = {}, {}, {}, {}
+
+    def add_block(self, block):
+        for offset, tx in enumerate(block['transactions']):
+            data = tx.get('data', {})
+            voter_id = data.get('voter_id')
+            self.txs[tx['tx_id']] = (block['index'], offset)
+            self.voters.setdefault(voter_id, []).append((block['index'], offset))
+            self.states[voter_id] = {
+                "voter_id": voter_id,
+                "event_type": data.get('event_type'),
+                "owner_state": owner_state(data),
+                "data_hash": data.get('data_hash'),
+                "tx_id": tx.get('tx_id'),
+                "block_index": block['index'],
+                "tx_offset": offset,
+                "timestamp": tx.get('timestamp'),
+            }
+            self.receipts[tx['tx_id']] = {
+                "message": "Transaction added and Block Mined",
+                "tx_id": tx['tx_id'],
+                "status": "CONFIRMED",
+                "block_index": block['index'],
+                "transaction_hash": block['hash'],
+            }
+
+class CompactIndexes:
+    """What Blockchain and Mempool hold now"""
+
+    def __init__(self):
+        self.voters, self.txs, self.states, self.receipts = VoterIndex(), TxIndex(), LatestStateView(), {}
+
+    def add_block(self, block):
+        self.voters.add_block(block)
+        self.txs.add_block(block)
+        self.states.add_block(block)
+        for tx in block['transactions']:
+            self.receipts[tx['tx_id']] = Receipt(tx['tx_id'], "CONFIRMED", "Transaction added and Block Mined",
+                                                 block['index'], block['hash'])
+
+def measure(layout, voters: int, events: int, block_size: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    indexes = layout()
+    for block in make_blocks(voters, events, block_size):
+        indexes.add_block(block)
+    del block
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return retained
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--voters", type=int, default=50000)
+    parser.add_argument("--events", type=int, default=3, help="transactions per voter")
+    parser.add_argument("--block-size", type=int, default=500)
+    args = parser.parse_args()
+
+    transactions = args.voters * args.events
+    print(f"{args.voters:,} voters x {args.events} events = {transactions:,} transactions")
+    print(f"{'layout':>8} {'MiB':>9} {'bytes/tx':>9}")
+    results = {}
+    for name, layout in (("before", LegacyIndexes), ("after", CompactIndexes)):
+        results[name] = measure(layout, args.voters, args.events, args.block_size)
+        print(f"{name:>8} {results[name] / 2**20:>9.1f} {results[name] / transactions:>9.0f}")
+    print(f"saving: {1 - results['after'] / results['before']:.0%}")
+
+if __name__ == "__main__":
+    main()
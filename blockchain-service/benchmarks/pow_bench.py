@@ -0,0 +1,44 @@
+"""
+Proof-of-Work benchmark: hashes/sec and time-to-block per worker count.
+
+Run from blockchain-service/:
+    python -m benchmarks.pow_bench --zeros 5 --blocks 5 --workers 1 2 4 8
+"""
+import argparse
+import os
+from time import perf_counter
+from mining import MiningEngine
+
+def bench(workers: int, zeros: int, blocks: int, chunk_size: int):
+    engine = MiningEngine(workers=workers, leading_zeros=zeros, chunk_size=chunk_size)
+    try:
+        # Warm the pool so process start-up is not billed to the first block
+        engine.proof_of_work(0)
+        attempts, elapsed = 0, 0.0
+        last_proof = 100
+        for _ in range(blocks):
+            start = perf_counter()
+            last_proof = engine.proof_of_work(last_proof)
+            elapsed += perf_counter() - start
+            attempts += engine.last_attempts
+        return attempts / elapsed, elapsed / blocks
+    finally:
+        engine.shutdown()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--zeros", type=int, default=5, help="leading hex zeroes required")
+    parser.add_argument("--blocks", type=int, default=5, help="blocks to mine per worker count")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    print(f"Difficulty: {args.zeros} leading zeroes, {args.blocks} blocks per run")
+    print(f"{'workers':>8} {'hashes/sec':>14} {'sec/block':>10}")
+    for workers in args.workers:
+        rate, per_block = bench(workers, args.zeros, args.blocks, args.chunk_size)
+        print(f"{workers:>8} {rate:>14,.0f} {per_block:>10.3f}")
+
+if __name__ == "__main__":
+    main()
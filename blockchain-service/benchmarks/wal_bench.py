@@ -0,0 +1,96 @@
+"""
+Write-ahead log benchmark: durable commits/sec against the group-commit window.
+
+`--clients` threads each submit one transaction at a time and wait for it to
+be fsynced, like concurrent POST /transactions/new requests. The baseline
+fsyncs every submission on its own. Run from blockchain-service/ (on the
+disk the node will use, since fsync cost is the whole story):
+    python -m benchmarks.wal_bench --clients 64 --seconds 3 --windows 0 0.5 1 2 5
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+from statistics import quantiles
+from time import perf_counter, time
+from uuid import uuid4
+from block_store import encode_record
+from wal import WriteAheadLog
+
+def make_tx():
+    return {
+        'tx_id': uuid4().hex,
+        'sender': 'STATE_A',
+        'recipient': 'BLOCKCHAIN',
+        'data': {'voter_id': uuid4().hex[:12], 'event_type': 'REGISTERED', 'state': 'STATE_A', 'data_hash': '00' * 32},
+        'timestamp': time(),
+    }
+
+def run_clients(clients: int, seconds: float, commit):
+    latencies, lock = [], threading.Lock()
+    deadline = perf_counter() + seconds
+
+    def client():
+        mine = []
+        while perf_counter() < deadline:
+            start = perf_counter()
+            commit(make_tx())
+            mine.append(perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, perf_counter() - started
+
+def bench_baseline(directory: str, clients: int, seconds: float):
+    """One write + fsync per submission, serialised on the file"""
+    lock = threading.Lock()
+    with open(os.path.join(directory, "baseline.wal"), "ab") as f:
+        def commit(tx):
+            with lock:
+                f.write(encode_record(tx))
+                f.flush()
+                os.fsync(f.fileno())
+        return run_clients(clients, seconds, commit) + (None,)
+
+def bench_wal(directory: str, clients: int, seconds: float, window_ms: float):
+    wal = WriteAheadLog(directory, group_window=window_ms / 1000)
+    try:
+        latencies, elapsed = run_clients(clients, seconds, lambda tx: wal.append([tx]).result())
+        return latencies, elapsed, wal.status()
+    finally:
+        wal.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 0.5, 1, 2, 5], help="WAL_GROUP_WINDOW_MS values")
+    parser.add_argument("--dir", default=None, help="directory on the disk to test (default: system temp)")
+    args = parser.parse_args()
+
+    print(f"{args.clients} concurrent clients, {args.seconds:g}s per run")
+    print(f"{'mode':>14} {'commits/s':>10} {'tx/fsync':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    runs = [("per-tx fsync", None)] + [(f"window {w:g}ms", w) for w in args.windows]
+    for name, window in runs:
+        directory = tempfile.mkdtemp(prefix="wal-bench-", dir=args.dir)
+        try:
+            if window is None:
+                latencies, elapsed, status = bench_baseline(directory, args.clients, args.seconds)
+                per_fsync = 1.0
+            else:
+                latencies, elapsed, status = bench_wal(directory, args.clients, args.seconds, window)
+                per_fsync = status["records_per_group"]
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        cuts = quantiles(latencies, n=100)
+        print(f"{name:>14} {len(latencies) / elapsed:>10,.0f} {per_fsync:>9.1f} {cuts[49] * 1000:>8.2f} {cuts[98] * 1000:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,451 @@
+import json
+import mmap
+import os
+import struct
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from archive import ARCHIVE_SUFFIXES, CODECS, SegmentCache, compress_file, decompress_file, read_header
+
+# Every block is stored as <4-byte big-endian length><compact JSON payload>.
+# The .idx file next to each .log holds one 8-byte offset per block.
+RECORD_HEADER = struct.Struct(">I")
+INDEX_ENTRY = struct.Struct(">Q")
+# How long a segment swapped out by the archiver stays open for readers that already looked it up
+RETIRE_GRACE_SECONDS = 30.0
+
+def encode_record(block: Dict[str, Any]) -> bytes:
+    payload = json.dumps(block, sort_keys=True, separators=(",", ":")).encode()
+    return RECORD_HEADER.pack(len(payload)) + payload
+
+def decode_record(buf, offset: int) -> Dict[str, Any]:
+    (length,) = RECORD_HEADER.unpack_from(buf, offset)
+    start = offset + RECORD_HEADER.size
+    return json.loads(buf[start:start + length])
+
+def iter_records(data: bytes, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Decode consecutive records from raw segment bytes, ignoring a trailing partial record"""
+    offset, count = 0, 0
+    while offset + RECORD_HEADER.size <= len(data) and (limit is None or count < limit):
+        (length,) = RECORD_HEADER.unpack_from(data, offset)
+        if offset + RECORD_HEADER.size + length > len(data):
+            return
+        yield decode_record(data, offset)
+        offset += RECORD_HEADER.size + length
+        count += 1
+
+class Segment:
+    """One append-only log file plus its fixed-width offset index"""
+    archived = False
+    replaced = False  # Swapped for an archived copy of the same records; closed after a grace period
+    replacement: Optional["Segment"] = None
+
+    def __init__(self, directory: str, base: int):
+        self.directory = directory
+        self.base = base  # Store position of the first block in this segment
+        self.log_path = os.path.join(directory, f"{base:012d}.log")
+        self.idx_path = os.path.join(directory, f"{base:012d}.idx")
+        self._log_map = None
+        self._idx_map = None
+        self._log = open(self.log_path, "ab+")
+        self._idx = open(self.idx_path, "ab+")
+        self.size = os.path.getsize(self.log_path)
+        self.count = os.path.getsize(self.idx_path) // INDEX_ENTRY.size
+
+    def recover(self):
+        """Repair a torn tail left by a crash between the log and index writes"""
+        # Drop index entries whose record never fully reached the log
+        while self.count:
+            offset = self._read_offset(self.count - 1)
+            if offset + RECORD_HEADER.size <= self.size:
+                (length,) = RECORD_HEADER.unpack(self._pread(offset, RECORD_HEADER.size))
+                if offset + RECORD_HEADER.size + length <= self.size:
+                    break
+            self.count -= 1
+        self._idx.truncate(self.count * INDEX_ENTRY.size)
+
+        # Re-index complete records written after the last index entry
+        if self.count:
+            offset = self._read_offset(self.count - 1)
+            (length,) = RECORD_HEADER.unpack(self._pread(offset, RECORD_HEADER.size))
+            offset += RECORD_HEADER.size + length
+        else:
+            offset = 0
+        while offset + RECORD_HEADER.size <= self.size:
+            (length,) = RECORD_HEADER.unpack(self._pread(offset, RECORD_HEADER.size))
+            if offset + RECORD_HEADER.size + length > self.size:
+                break
+            self._idx.write(INDEX_ENTRY.pack(offset))
+            self.count += 1
+            offset += RECORD_HEADER.size + length
+
+        # Anything left is a partial record
+        if offset != self.size:
+            self._log.truncate(offset)
+            self.size = offset
+        self._idx.flush()
+        self._log_map = self._idx_map = None
+
+    def append(self, record: bytes, fsync: bool):
+        offset = self.size
+        self._log.write(record)
+        self._log.flush()
+        if fsync:
+            os.fsync(self._log.fileno())
+        self._idx.write(INDEX_ENTRY.pack(offset))
+        self._idx.flush()
+        if fsync:
+            os.fsync(self._idx.fileno())
+        self.size += len(record)
+        self.count += 1
+
+    def read(self, local: int) -> Dict[str, Any]:
+        return decode_record(self._log_view(self.size), self._read_offset(local))
+
+    def sync(self):
+        os.fsync(self._log.fileno())
+        os.fsync(self._idx.fileno())
+
+    def prefix(self, count: int) -> "Segment":
+        """
+        Keep only the first `count` records. The prefix is copied to fresh files
+        and renamed into place, so maps held by in-flight readers keep pointing
+        at the old, intact files instead of faulting on a shrunken one.
+        """
+        end = self._read_offset(count) if count < self.count else self.size
+        for path, data in ((self.log_path, self._pread(0, end)),
+                           (self.idx_path, os.pread(self._idx.fileno(), count * INDEX_ENTRY.size, 0))):
+            tmp = path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        return Segment(self.directory, self.base)
+
+    def remove(self):
+        # Unlinked files stay readable through any map an in-flight reader still holds
+        os.remove(self.log_path)
+        os.remove(self.idx_path)
+
+    def close(self):
+        self._log_map = self._idx_map = None
+        self._log.close()
+        self._idx.close()
+
+    def _read_offset(self, local: int) -> int:
+        end = (local + 1) * INDEX_ENTRY.size
+        if self._idx_map is None or len(self._idx_map) < end:
+            self._idx_map = self._map(self._idx)
+        return INDEX_ENTRY.unpack_from(self._idx_map, local * INDEX_ENTRY.size)[0]
+
+    def _log_view(self, end: int):
+        if self._log_map is None or len(self._log_map) < end:
+            self._log_map = self._map(self._log)
+        return self._log_map
+
+    @staticmethod
+    def _map(f):
+        # Replaced maps are left to the GC so concurrent readers never see a closed map
+        f.flush()
+        return mmap.mmap(f.fileno(), os.fstat(f.fileno()).st_size, access=mmap.ACCESS_READ)
+
+    def _pread(self, offset: int, length: int) -> bytes:
+        return os.pread(self._log.fileno(), length, offset)
+
+class ArchivedSegment(Segment):
+    """
+    A sealed segment whose log has been compressed (see archive.py). The log is
+    decompressed on first read into the store's shared LRU cache; the offset
+    index stays uncompressed on disk and is mapped as before.
+    """
+    archived = True
+
+    def __init__(self, directory: str, base: int, archive_path: str, cache: SegmentCache):
+        self.directory = directory
+        self.base = base
+        self.log_path = os.path.join(directory, f"{base:012d}.log")
+        self.idx_path = os.path.join(directory, f"{base:012d}.idx")
+        self.archive_path = archive_path
+        self.cache = cache
+        self._log_map = None
+        self._idx_map = None
+        self._log = None
+        self._idx = open(self.idx_path, "rb")
+        self.size = read_header(archive_path)
+        self.compressed_size = os.path.getsize(archive_path)
+        self.count = os.path.getsize(self.idx_path) // INDEX_ENTRY.size
+
+    def _log_view(self, end: int):
+        return self.cache.get(self.archive_path, lambda: decompress_file(self.archive_path))
+
+    def _pread(self, offset: int, length: int) -> bytes:
+        return self._log_view(offset + length)[offset:offset + length]
+
+    def prefix(self, count: int) -> Segment:
+        """A reorg into archived history brings the kept prefix back as a plain segment"""
+        segment = super().prefix(count)
+        self.cache.discard(self.archive_path)
+        os.remove(self.archive_path)
+        return segment
+
+    def sync(self):
+        pass
+
+    def remove(self):
+        self.cache.discard(self.archive_path)
+        os.remove(self.archive_path)
+        os.remove(self.idx_path)
+
+    def close(self):
+        self._idx_map = None
+        self._idx.close()
+
+class BlockStore:
+    """Disk-backed, append-only block log split into fixed-size segments"""
+
+    def __init__(self, directory: str, segment_max_bytes: int = 64 * 1024 * 1024, fsync: bool = True,
+                 cache: Optional[SegmentCache] = None):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync = fsync
+        self.cache = cache or SegmentCache()
+        self.segments: List[Segment] = []
+        # Serialises changes to the segment list between the writer and the archiver
+        self._lock = threading.Lock()
+        self._retiring: Dict[Segment, threading.Timer] = {}
+        self._open()
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        names = os.listdir(self.directory)
+        logs = {int(name[:-4]) for name in names if name.endswith(".log")}
+        archives = {int(name.split(".")[0]): name for name in names if name.endswith(ARCHIVE_SUFFIXES)}
+        for base in sorted(logs | set(archives)):
+            if base not in logs:
+                self.segments.append(ArchivedSegment(self.directory, base,
+                                                     os.path.join(self.directory, archives[base]), self.cache))
+                continue
+            if base in archives:
+                # Crashed before archiving (or a reorg's un-archiving) finished; the plain log is authoritative
+                os.remove(os.path.join(self.directory, archives[base]))
+            self.segments.append(Segment(self.directory, base))
+        if self.segments and not self.segments[-1].archived:
+            self.segments[-1].recover()
+
+    def __len__(self) -> int:
+        return _length(self.segments)
+
+    def append(self, block: Dict[str, Any]) -> int:
+        """Append a block and return its store position"""
+        self._append_record(encode_record(block), self.fsync)
+        return len(self) - 1
+
+    def _append_record(self, record: bytes, fsync: bool) -> Segment:
+        active = self.segments[-1] if self.segments else None
+        if active is None or active.archived or (active.count and active.size + len(record) > self.segment_max_bytes):
+            active = Segment(self.directory, len(self))
+            with self._lock:
+                self.segments.append(active)
+        active.append(record, fsync)
+        return active
+
+    def view(self) -> List[Segment]:
+        """
+        The current segment list. Truncating and archiving swap in a new list
+        (appends only add to the end), so reads through a view taken earlier
+        keep returning the blocks it was taken over, even mid-reorg.
+        """
+        return self.segments
+
+    def get(self, position: int, segments: Optional[List[Segment]] = None) -> Dict[str, Any]:
+        segments = self.segments if segments is None else segments
+        if position < 0 or position >= _length(segments):
+            raise IndexError(position)
+        segment = _current(self._segment_for(position, segments))
+        return segment.read(position - segment.base)
+
+    def last(self) -> Optional[Dict[str, Any]]:
+        size = len(self)
+        return self.get(size - 1) if size else None
+
+    def iter_range(self, start: int = 0, stop: Optional[int] = None,
+                   segments: Optional[List[Segment]] = None) -> Iterator[Dict[str, Any]]:
+        """Sequentially read blocks [start, stop) from the mapped segments (of `segments`, a view, if given)"""
+        segments = self.segments if segments is None else segments
+        length = _length(segments)
+        stop = length if stop is None else min(stop, length)
+        position = max(start, 0)
+        while position < stop:
+            segment = self._segment_for(position, segments)
+            end = min(stop, segment.base + segment.count)
+            for local in range(position - segment.base, end - segment.base):
+                # Archived mid-read: carry on from the compressed copy before the old files are closed
+                segment = _current(segment)
+                yield segment.read(local)
+            position = end
+
+    def raw_ranges(self, start: int, stop: int, max_bytes: int) -> Iterator[Tuple[int, int, bytes]]:
+        """
+        Undecoded records for positions [start, stop) as (first position, count,
+        bytes) chunks of roughly `max_bytes`, never spanning segments. Used to
+        hand work to other processes without decoding it here.
+        """
+        position = max(start, 0)
+        stop = min(stop, len(self))
+        while position < stop:
+            segment = _current(self._segment_for(position))
+            end = min(stop, segment.base + segment.count)
+            first = position
+            begin = segment._read_offset(position - segment.base)
+            while True:
+                position += 1
+                local = position - segment.base
+                # Archived (and retired) mid-scan or while the consumer held a chunk: read on from the
+                # compressed copy, which shares the offset index
+                segment = _current(segment)
+                offset = segment._read_offset(local) if local < segment.count else segment.size
+                if position == end or offset - begin >= max_bytes:
+                    break
+            segment = _current(segment)
+            yield first, position - first, segment._pread(begin, offset - begin)
+
+    def segment_info(self) -> List[Dict[str, int]]:
+        return [{"base": s.base, "count": s.count, "bytes": s.size, "archived": s.archived} for s in self.segments]
+
+    def archive(self, base: int, codec: str) -> Optional[Tuple[int, int]]:
+        """
+        Compress a sealed segment's log and swap the archived segment in.
+        Returns (log bytes, archive bytes), or None if the segment is gone or
+        already archived.
+        """
+        with self._lock:
+            segment = next((s for s in self.segments[:-1] if s.base == base and not s.archived), None)
+        if segment is None:
+            return None
+        path = os.path.join(self.directory, f"{base:012d}{CODECS[codec][0]}")
+        compressed = compress_file(segment._log, segment.size, path, codec)
+        with self._lock:
+            if not any(s is segment for s in self.segments):
+                # Truncated by a reorg (or reset) while we were compressing
+                os.remove(path)
+                return None
+            archived = ArchivedSegment(self.directory, base, path, self.cache)
+            self.segments = [archived if s is segment else s for s in self.segments]
+            segment.replacement = archived
+            segment.replaced = True
+        os.remove(segment.log_path)
+        self._retire(segment)
+        return segment.size, compressed
+
+    def _retire(self, segment: Segment):
+        """Close a swapped-out segment (its file handles, maps and unlinked files) once in-flight readers drain"""
+        def close():
+            with self._lock:
+                self._retiring.pop(segment, None)
+            segment.close()
+        timer = threading.Timer(RETIRE_GRACE_SECONDS, close)
+        timer.daemon = True
+        with self._lock:
+            self._retiring[segment] = timer
+        timer.start()
+
+    def export_segment(self, base: int, chunk_size: int = 1024 * 1024) -> Iterator[bytes]:
+        """Raw records of one segment (the portable export format), read up to its current size"""
+        segment = next((s for s in self.segments if s.base == base), None)
+        if segment is None:
+            raise KeyError(base)
+        return self._read_chunks(segment, segment.size, chunk_size)
+
+    def _read_chunks(self, segment: Segment, end: int, chunk_size: int) -> Iterator[bytes]:
+        offset = 0
+        while offset < end:
+            segment = _current(segment)
+            chunk = segment._pread(offset, min(chunk_size, end - offset))
+            if not chunk:
+                break
+            yield chunk
+            offset += len(chunk)
+
+    def import_records(self, base: int, data: bytes) -> int:
+        """
+        Append records exported from another node's segment starting at store
+        position `base`. Records already present are skipped; a trailing partial
+        record is ignored. Returns how many blocks were appended.
+        """
+        if base > len(self):
+            raise ValueError(f"Segment at {base} would leave a gap after position {len(self)}")
+        offset, position, appended, touched = 0, base, 0, set()
+        while offset + RECORD_HEADER.size <= len(data):
+            (length,) = RECORD_HEADER.unpack_from(data, offset)
+            end = offset + RECORD_HEADER.size + length
+            if end > len(data):
+                break
+            if position >= len(self):
+                touched.add(self._append_record(data[offset:end], fsync=False))
+                appended += 1
+            offset, position = end, position + 1
+        if self.fsync:
+            for segment in touched:
+                segment.sync()
+        return appended
+
+    def truncate(self, position: int):
+        """
+        Drop every block at or after `position` (used when replication reorganises the chain).
+        Dropped and shortened segments stay open for views taken before the
+        truncation, and are closed once those readers drain.
+        """
+        if position >= len(self):
+            return
+        with self._lock:
+            kept, dropped = [], []
+            for segment in self.segments:
+                if segment.base >= position:
+                    segment.remove()
+                    dropped.append(segment)
+                elif segment.base + segment.count > position:
+                    kept.append(segment.prefix(position - segment.base))
+                    dropped.append(segment)
+                else:
+                    kept.append(segment)
+            self.segments = kept
+        for segment in dropped:
+            self._retire(segment)
+
+    def clear(self):
+        """Delete every segment (used by /reset)"""
+        with self._lock:
+            for segment in self.segments:
+                segment.close()
+                segment.remove()
+            self.segments = []
+
+    def close(self):
+        with self._lock:
+            retiring, self._retiring = self._retiring, {}
+        for segment, timer in retiring.items():
+            timer.cancel()
+            segment.close()
+        for segment in self.segments:
+            segment.close()
+
+    def _segment_for(self, position: int, segments: Optional[List[Segment]] = None) -> Segment:
+        # Binary search over segment bases (on one list, in case the archiver swaps it)
+        segments = self.segments if segments is None else segments
+        lo, hi = 0, len(segments) - 1
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if segments[mid].base <= position:
+                lo = mid
+            else:
+                hi = mid - 1
+        return segments[lo]
+
+def _length(segments: List[Segment]) -> int:
+    return segments[-1].base + segments[-1].count if segments else 0
+
+def _current(segment: Segment) -> Segment:
+    """The segment itself, or the archived copy that replaced it"""
+    while segment.replaced:
+        segment = segment.replacement
+    return segment
@@ -1,73 +1,375 @@
-import hashlib
-import json
+import threading
 from time import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, NamedTuple, Optional, Tuple
+from block_store import BlockStore
+from checkpoint import Checkpoint, CheckpointStore
+from indexes import VoterIndex, TxIndex, LatestStateView, VoterFilter
+from consensus import Consensus, ProofOfWork
+from mining import LEGACY_TARGET, meets_target
+from encoding import compute_hash, seal_header, verify_block, header_fields, tx_hash
+from merkle import merkle_levels, path_from_levels
+
+class ChainSnapshot(NamedTuple):
+    """
+    Immutable view of the chain head, the indexes built up to it and the
+    store segments holding its blocks. Appends fold into the indexes in place
+    and then publish a new snapshot; a reorg builds fresh index objects over
+    the new branch's segments and swaps them in with the head in one step,
+    so block reads through an older snapshot still see the old branch.
+    """
+    length: int
+    last_block: Optional[Dict[str, Any]]
+    voter_index: VoterIndex
+    tx_index: TxIndex
+    state_view: LatestStateView
+    segments: List[Any]  # BlockStore.view() when the snapshot was taken
+
+def _empty_snapshot() -> ChainSnapshot:
+    return ChainSnapshot(0, None, VoterIndex(), TxIndex(), LatestStateView(), [])
 
 class Blockchain:
-    def __init__(self):
-        self.chain = []
-        self.pending_transactions = []
-        # Genesis Block
+    """
+    Mutating methods (new_block, seal, reset) must only be called from the
+    single writer (see sequencer.py). Readers go through `snapshot`.
+    """
+
+    def __init__(self, store: BlockStore, consensus: Consensus = None, checkpoints: CheckpointStore = None,
+                 voter_filter: VoterFilter = None):
+        self.store = store
+        self.consensus = consensus or ProofOfWork()
+        self.checkpoints = checkpoints
+        self.snapshot = _empty_snapshot()
+        # Verified-prefix watermark: blocks 1..verified_index already passed check_integrity
+        self._audit_lock = threading.Lock()
+        self.verified_index = 0
+        self._verified_hash = None
+        self.voter_filter = voter_filter or VoterFilter()
+        self._replay()
+        if self.snapshot.last_block is None:
+            # Genesis Block
+            self.new_block(previous_hash="1", proof=100)
+
+    @property
+    def voter_index(self) -> VoterIndex:
+        return self.snapshot.voter_index
+
+    @property
+    def tx_index(self) -> TxIndex:
+        return self.snapshot.tx_index
+
+    @property
+    def state_view(self) -> LatestStateView:
+        return self.snapshot.state_view
+
+    def _replay(self):
+        """Rebuild in-memory head state: restore the latest checkpoint, then replay the tail"""
+        head, voter_filter, checkpoint = self._rebuild()
+        self._publish(head, voter_filter)
+        if checkpoint is not None:
+            start = checkpoint.meta['index']
+            print(f"[CHECKPOINT] Restored block #{start}, replayed {self.length - start} tail block(s)")
+            # Only the tail after the checkpoint needs verifying
+            if not self.check_integrity():
+                raise RuntimeError(f"Chain tail after checkpoint #{start} failed verification; "
+                                   "refusing to start (re-bootstrap or remove the checkpoint)")
+
+    def _rebuild(self, length: Optional[int] = None) -> Tuple[ChainSnapshot, VoterFilter, Optional[Checkpoint]]:
+        """
+        Fresh indexes and voter filter for the first `length` stored blocks
+        (latest checkpoint plus the blocks after it), not yet published.
+        """
+        head, voter_filter = _empty_snapshot(), self.voter_filter.empty_like()
+        checkpoint = self.checkpoints.load_latest(self.store, length) if self.checkpoints else None
+        if checkpoint is not None:
+            head = self._restore(checkpoint, head, voter_filter)
+        for block in self.store.iter_range(head.length, length):
+            head = self._fold(head, block, voter_filter)
+        return head, voter_filter, checkpoint
+
+    def _publish(self, head: ChainSnapshot, voter_filter: VoterFilter):
+        """Switch readers to rebuilt state"""
+        # Filter first: until the snapshot follows, the only voters it can miss are ones being orphaned
+        self.voter_filter.replace(voter_filter)
+        self.snapshot = head
+
+    def _restore(self, checkpoint: Checkpoint, head: ChainSnapshot, voter_filter: VoterFilter) -> ChainSnapshot:
+        """Load checkpointed indexes into `head`; everything up to the checkpoint counts as verified"""
+        state, index = checkpoint.state, checkpoint.meta['index']
+        head.voter_index.load(state['voter_index'])
+        head.tx_index.load(state['tx_index'])
+        head.state_view.load(state['state_view'])
+        voter_filter.rebuild(head.voter_index.voter_ids())
+        with self._audit_lock:
+            self.verified_index = index
+            self._verified_hash = checkpoint.meta['head_hash']
+        if self.checkpoints is not None:
+            self.checkpoints.last_index = index
+        return head._replace(length=index, last_block=self.store.get(index - 1), segments=self.store.view())
+
+    def capture_state(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """Consistent copy of the head and indexes for a checkpoint (call from the single writer)"""
+        snapshot = self.snapshot
+        head = snapshot.last_block
+        meta = {"index": head['index'], "head_hash": self.hash(head)}
+        state = {
+            "voter_index": snapshot.voter_index.export(),
+            "tx_index": snapshot.tx_index.export(),
+            "state_view": snapshot.state_view.export(),
+        }
+        return meta, state
+
+    def _fold(self, head: ChainSnapshot, block: Dict[str, Any], voter_filter: VoterFilter) -> ChainSnapshot:
+        """Add a sealed block to `head`'s indexes and `voter_filter`, and return the snapshot that ends at it"""
+        voter_filter.add_block(block, head.voter_index)
+        head.voter_index.add_block(block)
+        head.tx_index.add_block(block)
+        head.state_view.add_block(block)
+        return head._replace(length=block['index'], last_block=block, segments=self.store.view())
+
+    def _apply_block(self, block: Dict[str, Any]):
+        """Fold a sealed block into the in-memory head state and indexes"""
+        # Publish last, so readers never see a head whose indexes are incomplete
+        self.snapshot = self._fold(self.snapshot, block, self.voter_filter)
+
+    def reset(self):
+        """Drop every persisted block and start again from genesis"""
+        self._publish(_empty_snapshot(), self.voter_filter.empty_like())
+        if self.checkpoints is not None:
+            self.checkpoints.clear()
+        self.store.clear()
+        with self._audit_lock:
+            self._reset_watermark()
         self.new_block(previous_hash="1", proof=100)
 
-    def new_block(self, proof: int, previous_hash: str = None) -> Dict[str, Any]:
+    @staticmethod
+    def outranks(length: int, head_hash: str, other_length: int, other_head_hash: str) -> bool:
+        """Fork choice: the longer chain wins; equal lengths go to the lower head hash"""
+        return length > other_length or (length == other_length and head_hash < other_head_hash)
+
+    def adopt(self, fork_index: int, blocks: List[Dict[str, Any]]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Replace everything after block `fork_index` with a peer's (already
+        validated) blocks if the result outranks the current chain. Returns the
+        transactions orphaned by the switch, or None if the blocks were refused.
+        Single writer only.
+        """
+        if not blocks or fork_index > self.length or blocks[0]['index'] != fork_index + 1:
+            return None
+        if fork_index and blocks[0]['previous_hash'] != self.hash(self.get_block(fork_index)):
+            return None  # Our chain moved since the peer's blocks were validated
+        if not self.outranks(fork_index + len(blocks), self.hash(blocks[-1]), self.length, self.hash(self.last_block)):
+            return None
+
+        orphaned = []
+        head, voter_filter = self.snapshot, self.voter_filter
+        if fork_index < self.length:
+            orphaned = [tx for block in self.iter_blocks(fork_index + 1) for tx in block['transactions']]
+            head, voter_filter = self._truncate(fork_index)
+        for block in blocks:
+            self.store.append(block)
+            head = self._fold(head, block, voter_filter)
+        # Readers keep the old head, indexes and filter until the new branch is complete, then switch
+        if voter_filter is self.voter_filter:
+            self.snapshot = head
+        else:
+            self._publish(head, voter_filter)
+        adopted = {tx.get('tx_id') for block in blocks for tx in block['transactions']}
+        return [tx for tx in orphaned if tx.get('tx_id') is None or tx['tx_id'] not in adopted]
+
+    def _truncate(self, index: int) -> Tuple[ChainSnapshot, VoterFilter]:
+        """Build (but don't publish) fresh indexes for blocks 1..index, then roll the stored chain back to it"""
+        head, voter_filter, _ = self._rebuild(index)
+        self.store.truncate(index)
+        with self._audit_lock:
+            if self.verified_index > index:
+                self._reset_watermark()
+        return head, voter_filter
+
+    def new_block(self, proof: int, previous_hash: str = None, transactions: List[Dict] = None) -> Dict[str, Any]:
         """Create a new block in the blockchain"""
+        transactions = transactions or []
         block = {
-            'index': len(self.chain) + 1,
+            'index': len(self.store) + 1,
             'timestamp': time(),
-            'transactions': self.pending_transactions,
+            'transactions': transactions,
             'proof': proof,
-            'previous_hash': previous_hash or self.hash(self.chain[-1]),
+            'previous_hash': previous_hash or self.hash(self.last_block),
         }
-        self.pending_transactions = []
-        self.chain.append(block)
+        self.consensus.prepare(block)
+        # Hash is computed exactly once here and stored with the block
+        seal_header(block, transactions)
+        self.consensus.finalize(block)
+        self.store.append(block)
+        self._apply_block(block)
         return block
 
-    def new_transaction(self, sender: str, recipient: str, data: Dict) -> int:
-        """Adds a new transaction to the list of transactions"""
-        self.pending_transactions.append({
-            'sender': sender,
-            'recipient': recipient,
-            'data': data, # Voter Data Hash, ID, Event Type
-            'timestamp': time()
-        })
-        return self.last_block['index'] + 1
+    def seal(self, transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Earn the next block under the active consensus and seal a batch of transactions"""
+        last_block = self.last_block
+        proof = self.consensus.propose(last_block)
+        return self.new_block(proof, self.hash(last_block), transactions)
 
     @staticmethod
     def hash(block: Dict[str, Any]) -> str:
-        """SHA-256 Hashing of a Block"""
-        block_string = json.dumps(block, sort_keys=True).encode()
-        return hashlib.sha256(block_string).hexdigest()
+        """SHA-256 Hashing of a Block (cached at seal time; legacy blocks are re-hashed)"""
+        return block.get('hash') or compute_hash(block)
 
     @property
     def last_block(self):
-        return self.chain[-1]
+        return self.snapshot.last_block
+
+    @property
+    def length(self) -> int:
+        return self.snapshot.length
+
+    def get_block(self, index: int, snapshot: Optional[ChainSnapshot] = None) -> Dict[str, Any]:
+        """Read a single block by its 1-based chain index (on `snapshot`'s chain, by default the current one)"""
+        snapshot = snapshot or self.snapshot
+        if index > snapshot.length:
+            raise IndexError(index)
+        return self.store.get(index - 1, snapshot.segments)
+
+    def block_hashes(self, indexes: List[int]) -> Dict[int, str]:
+        """Hashes of the given blocks on the current chain; indexes past the head are left out"""
+        snapshot = self.snapshot
+        return {index: self.hash(self.get_block(index, snapshot)) for index in set(indexes) if 1 <= index <= snapshot.length}
+
+    def iter_blocks(self, start: int = 1, stop: Optional[int] = None,
+                    snapshot: Optional[ChainSnapshot] = None) -> Iterator[Dict[str, Any]]:
+        """Stream blocks [start, stop] (1-based, inclusive) of `snapshot` (by default the current one)"""
+        snapshot = snapshot or self.snapshot
+        length = snapshot.length
+        return self.store.iter_range(start - 1, length if stop is None else min(stop, length), snapshot.segments)
+
+    def page(self, start: Optional[int] = None, stop: Optional[int] = None, limit: int = 100,
+             offset: int = 0, reverse: bool = False) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """Read one window of blocks inside [start, stop] and return it with the next cursor"""
+        snapshot = self.snapshot
+        length = snapshot.length
+        low = max(start or 1, 1)
+        high = min(stop or length, length)
+        first = high - offset if reverse else low + offset
+        if first < low or first > high:
+            return [], None
+        if reverse:
+            last = max(first - limit + 1, low)
+            blocks = list(self.iter_blocks(last, first, snapshot))[::-1]
+            next_cursor = last - 1 if last - 1 >= low else None
+        else:
+            last = min(first + limit - 1, high)
+            blocks = list(self.iter_blocks(first, last, snapshot))
+            next_cursor = last + 1 if last + 1 <= high else None
+        return blocks, next_cursor
+
+    def voter_history(self, voter_id: str) -> List[Dict[str, Any]]:
+        """Return every transaction for a voter using the secondary index"""
+        history = []
+        block = None
+        # Index and blocks from one snapshot: a reorg must not pair old positions with new blocks
+        snapshot = self.snapshot
+        for block_index, offset in snapshot.voter_index.lookup(voter_id):
+            if block_index > snapshot.length:
+                break
+            if block is None or block['index'] != block_index:
+                block = self.get_block(block_index, snapshot)
+            history.append(block['transactions'][offset])
+        return history
 
-    def proof_of_work(self, last_proof: int) -> int:
-        """Simple PoW Algorithm"""
-        proof = 0
-        while self.valid_proof(last_proof, proof) is False:
-            proof += 1
-        return proof
+    def block_of(self, tx_id: str) -> Optional[Dict[str, Any]]:
+        """The block a sealed transaction is in, read through the same snapshot as the tx index"""
+        snapshot = self.snapshot
+        location = snapshot.tx_index.lookup(tx_id)
+        return self.get_block(location[0], snapshot) if location is not None else None
+
+    def inclusion_proof(self, tx_id: str) -> Optional[Dict[str, Any]]:
+        """Merkle authentication path proving a transaction is committed to by its block header"""
+        snapshot = self.snapshot
+        location = snapshot.tx_index.lookup(tx_id)
+        if location is None:
+            return None
+        return self._proofs(snapshot, location[0], [(tx_id, location[1])])[0]
+
+    def inclusion_proofs(self, tx_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Proofs for many transactions, reading and hashing each block once; unknown or pre-Merkle ones are left out"""
+        snapshot = self.snapshot
+        by_block: Dict[int, List[Tuple[str, int]]] = {}
+        for tx_id in tx_ids:
+            location = snapshot.tx_index.lookup(tx_id)
+            if location is not None:
+                by_block.setdefault(location[0], []).append((tx_id, location[1]))
+        proofs = {}
+        for block_index, wanted in by_block.items():
+            try:
+                proofs.update((proof['tx_id'], proof) for proof in self._proofs(snapshot, block_index, wanted))
+            except ValueError:
+                continue
+        return proofs
+
+    def _proofs(self, snapshot: ChainSnapshot, block_index: int, wanted: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+        block = self.get_block(block_index, snapshot)
+        if block.get('version', 1) < 3:
+            raise ValueError(f"Block #{block_index} predates Merkle roots")
+        tx_hashes = [tx_hash(tx) for tx in block['transactions']]
+        levels = merkle_levels(tx_hashes)
+        header = header_fields(block)
+        return [{
+            "tx_id": tx_id,
+            "tx": block['transactions'][offset],
+            "tx_hash": tx_hashes[offset],
+            "block_index": block_index,
+            "block_hash": block['hash'],
+            "header": header,
+            "path": path_from_levels(levels, offset),
+        } for tx_id, offset in wanted]
 
     @staticmethod
-    def valid_proof(last_proof: int, proof: int) -> bool:
-        """Validates the proof: Does hash(last_proof, proof) contain 4 leading zeroes?"""
-        guess = f'{last_proof}{proof}'.encode()
-        guess_hash = hashlib.sha256(guess).hexdigest()
-        return guess_hash[:4] == "0000"
-
-    def check_integrity(self) -> bool:
-        """Check if the chain is valid"""
-        for i in range(1, len(self.chain)):
-            previous_block = self.chain[i-1]
-            current_block = self.chain[i]
-            
-            # Check 1: Hash Link
-            if current_block['previous_hash'] != self.hash(previous_block):
-                return False
-            
-            # Check 2: PoW
-            if not self.valid_proof(previous_block['proof'], current_block['proof']):
-                return False
-        return True
\ No newline at end of file
+    def valid_proof(last_proof: int, proof: int, target: str = None, max_target: int = LEGACY_TARGET) -> bool:
+        """Validates the proof: is hash(last_proof, proof) below the block's target, and is that target no easier than max_target?"""
+        target = int(target, 16) if target else LEGACY_TARGET
+        return target <= max_target and meets_target(last_proof, proof, target)
+
+    def check_integrity(self, full: bool = False) -> bool:
+        """Check if the chain is valid, resuming from the verified-prefix watermark unless full=True"""
+        with self._audit_lock:
+            if full:
+                self._reset_watermark()
+
+            previous_block, previous_hash = None, None
+            if self.verified_index:
+                previous_block = self.get_block(self.verified_index)
+                previous_hash = verify_block(previous_block)
+                # The watermark block must still hash to what we verified last time
+                if previous_hash != self._verified_hash:
+                    self._reset_watermark()
+                    previous_block, previous_hash = None, None
+
+            for current_block in self.iter_blocks(self.verified_index + 1):
+                # Check 0: Contents still match the sealed hash (legacy blocks: JSON hash)
+                current_hash = verify_block(current_block)
+                if current_hash is None:
+                    return False
+
+                if previous_block is not None:
+                    # Check 1: Hash Link
+                    if current_block['previous_hash'] != previous_hash:
+                        return False
+
+                # Check 2: Consensus (PoW target, or a PoA authority signature)
+                if not self.consensus.verify(current_block, previous_block):
+                    return False
+                previous_block = current_block
+                previous_hash = current_hash
+                self.verified_index = current_block['index']
+                self._verified_hash = previous_hash
+            return True
+
+    def mark_verified(self, index: int, block_hash: str):
+        """Advance the watermark after an out-of-band audit (see audit.py) verified blocks 1..index"""
+        with self._audit_lock:
+            if index > self.verified_index:
+                self.verified_index = index
+                self._verified_hash = block_hash
+
+    def _reset_watermark(self):
+        self.verified_index = 0
+        self._verified_hash = None
@@ -0,0 +1,101 @@
+"""
+Fast bootstrap of a new (or lagging) node from a running peer.
+
+Copies the peer's block log segments and its latest checkpoint into this
+node's CHAIN_DATA_DIR / CHECKPOINT_DIR. Run it while the node is stopped:
+    python -m bootstrap http://peer-node:5000
+Nothing from the peer is trusted: every copied block is checked for its
+contents, hash link and consensus before it is written, and the checkpoint is
+only taken if it is signed by a configured authority (POA_AUTHORITIES). On its
+next start the node restores the checkpoint and verifies only the blocks
+after it, instead of replaying the whole chain.
+"""
+import argparse
+import sys
+from typing import Optional
+import requests
+from block_store import BlockStore, iter_records
+from blockchain import Blockchain
+from checkpoint import CheckpointError, CheckpointStore
+from config import settings
+from consensus import Consensus, verifying_consensus
+from encoding import verify_block
+from signing import load_keys
+
+def peer_block_hash(peer: str, index: int) -> Optional[str]:
+    response = requests.get(f"{peer}/chain", params={"from": index, "to": index, "limit": 1}, timeout=30)
+    response.raise_for_status()
+    chain = response.json()["chain"]
+    return Blockchain.hash(chain[0]) if chain else None
+
+def copy_segments(peer: str, store: BlockStore, consensus: Consensus) -> int:
+    """Append the peer's blocks after our head, fully verifying each one before it is written"""
+    local = len(store)
+    previous = store.last() if local else None
+    previous_hash = Blockchain.hash(previous) if local else None
+    if local and peer_block_hash(peer, local) != previous_hash:
+        raise SystemExit(f"Local chain diverges from the peer at block #{local}; remove {settings.CHAIN_DATA_DIR} and retry")
+
+    copied = 0
+    for segment in requests.get(f"{peer}/segments", timeout=30).json()["segments"]:
+        if segment["base"] + segment["count"] <= len(store):
+            continue
+        response = requests.get(f"{peer}/segments/{segment['base']}", timeout=300)
+        response.raise_for_status()
+        data = response.content
+        for position, block in enumerate(iter_records(data), start=segment["base"]):
+            if position < len(store):
+                continue
+            block_hash = verify_block(block)
+            if block_hash is None or block["index"] != position + 1:
+                raise SystemExit(f"Block #{position + 1} does not match its hash")
+            if previous_hash is not None and block["previous_hash"] != previous_hash:
+                raise SystemExit(f"Broken hash link at block #{block['index']}")
+            if not consensus.verify(block, previous):
+                raise SystemExit(f"Block #{block['index']} fails consensus")
+            previous, previous_hash = block, block_hash
+        copied += store.import_records(segment["base"], data)
+        print(f"Segment {segment['base']}: {len(store)} blocks")
+    return copied
+
+def copy_checkpoint(peer: str, store: BlockStore, checkpoints: CheckpointStore) -> Optional[int]:
+    if checkpoints.verifier is None:
+        # An unsigned checkpoint would let the peer dictate the restored indexes
+        print("No POA_AUTHORITIES configured, so peer checkpoints cannot be authenticated; skipping it")
+        return None
+    response = requests.get(f"{peer}/checkpoints/latest", timeout=300)
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    try:
+        checkpoint = checkpoints.decode(response.content)
+    except CheckpointError as e:
+        raise SystemExit(f"Rejected peer checkpoint: {e}")
+    index = checkpoint.meta["index"]
+    if index > len(store) or verify_block(store.get(index - 1)) != checkpoint.meta["head_hash"]:
+        raise SystemExit(f"Peer checkpoint #{index} does not match the copied chain")
+    with open(checkpoints.path_for(index), "wb") as f:
+        f.write(response.content)
+    return index
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("peer", help="base URL of a running blockchain-service node")
+    args = parser.parse_args()
+    peer = args.peer.rstrip("/")
+
+    signer, verifier = load_keys(settings.POA_SIGNER_ID, settings.POA_PRIVATE_KEY, settings.POA_AUTHORITIES)
+    # Checkpoints are fetched from another node, so only authority-signed ones are accepted
+    checkpoints = CheckpointStore(settings.CHECKPOINT_DIR, signer=signer, verifier=verifier)
+    store = BlockStore(settings.CHAIN_DATA_DIR, settings.SEGMENT_MAX_BYTES, fsync=settings.FSYNC_ON_APPEND)
+    try:
+        copied = copy_segments(peer, store, verifying_consensus(verifier))
+        index = copy_checkpoint(peer, store, checkpoints)
+    finally:
+        store.close()
+    print(f"Copied {copied} block(s); chain length {len(store)}")
+    print(f"Checkpoint at block #{index}" if index else "Peer has no checkpoint; the node will replay the full log")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
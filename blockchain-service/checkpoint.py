@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+from time import time
+from typing import Any, Dict, List, NamedTuple, Optional
+from encoding import canonical_json, verify_block
+from signing import Signer, Verifier
+
+# File layout: MAGIC, <4-byte length><JSON meta>, <zlib-compressed canonical JSON body>.
+# The meta commits to the body by SHA-256 and is what gets signed.
+MAGIC = b"VMSCKPT1"
+META_LENGTH = struct.Struct(">I")
+
+class CheckpointError(Exception):
+    pass
+
+class Checkpoint(NamedTuple):
+    meta: Dict[str, Any]   # index, head_hash, body_sha256, created_at, [signer, signature]
+    state: Dict[str, Any]  # voter_index, tx_index, state_view
+
+class CheckpointStore:
+    """
+    Periodic snapshots of the materialized indexes plus the chain head they
+    were taken at. On startup the node restores the newest checkpoint that
+    still matches its block log and replays only the blocks after it.
+    """
+
+    def __init__(self, directory: str, every_blocks: int = 1000, keep: int = 3,
+                 signer: Optional[Signer] = None, verifier: Optional[Verifier] = None):
+        self.directory = directory
+        self.every_blocks = every_blocks
+        self.keep = keep
+        self.signer = signer
+        self.verifier = verifier
+        self.last_index = 0
+        self._writer: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+
+    # --- Writing (capture on the sequencer thread, serialise in the background) ---
+
+    def maybe_write(self, blockchain) -> bool:
+        """Called by the single writer after each mutation; starts a checkpoint every `every_blocks`"""
+        length = blockchain.length
+        if length < self.last_index:
+            self.last_index = 0  # Chain was reset
+        if self.every_blocks <= 0 or length - self.last_index < self.every_blocks:
+            return False
+        if self._writer is not None and self._writer.is_alive():
+            return False
+        meta, state = blockchain.capture_state()
+        self.last_index = length
+        self._writer = threading.Thread(target=self.write, args=(meta, state), name="checkpoint-writer", daemon=True)
+        self._writer.start()
+        return True
+
+    def write(self, meta: Dict[str, Any], state: Dict[str, Any]) -> str:
+        # Slotted records (records.py) serialise through their to_dict()
+        payload = json.dumps(state, sort_keys=True, separators=(",", ":"), default=lambda record: record.to_dict())
+        body = zlib.compress(payload.encode(), 6)
+        meta = {**meta, "body_sha256": hashlib.sha256(body).hexdigest(), "created_at": time()}
+        if self.signer is not None:
+            meta["signer"] = self.signer.key_id
+            meta["signature"] = self.signer.sign(canonical_json(meta))
+        encoded_meta = canonical_json(meta)
+        path = self.path_for(meta["index"])
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + META_LENGTH.pack(len(encoded_meta)) + encoded_meta + body)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+        print(f"[CHECKPOINT] Wrote checkpoint at block #{meta['index']} ({len(body):,} bytes)")
+        self._prune()
+        return path
+
+    def _prune(self):
+        for meta in self.list()[self.keep:]:
+            os.remove(self.path_for(meta["index"]))
+
+    def clear(self):
+        """Delete every checkpoint (used by /reset)"""
+        if self._writer is not None:
+            self._writer.join()
+        for meta in self.list():
+            os.remove(self.path_for(meta["index"]))
+        self.last_index = 0
+
+    # --- Reading ---
+
+    def path_for(self, index: int) -> str:
+        return os.path.join(self.directory, f"{index:012d}.ckpt")
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Meta of every checkpoint on disk, newest first"""
+        metas = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if name.endswith(".ckpt"):
+                try:
+                    metas.append(self.read_meta(os.path.join(self.directory, name)))
+                except CheckpointError:
+                    continue
+        return metas
+
+    @staticmethod
+    def read_meta(path: str) -> Dict[str, Any]:
+        with open(path, "rb") as f:
+            header = f.read(len(MAGIC) + META_LENGTH.size)
+            if len(header) < len(MAGIC) + META_LENGTH.size or not header.startswith(MAGIC):
+                raise CheckpointError(f"{path} is not a checkpoint")
+            (length,) = META_LENGTH.unpack_from(header, len(MAGIC))
+            return json.loads(f.read(length))
+
+    def read(self, path: str) -> Checkpoint:
+        """Load and authenticate a checkpoint file"""
+        with open(path, "rb") as f:
+            data = f.read()
+        return self.decode(data)
+
+    def decode(self, data: bytes) -> Checkpoint:
+        if not data.startswith(MAGIC):
+            raise CheckpointError("Bad checkpoint magic")
+        (length,) = META_LENGTH.unpack_from(data, len(MAGIC))
+        start = len(MAGIC) + META_LENGTH.size
+        meta = json.loads(data[start:start + length])
+        body = data[start + length:]
+        if hashlib.sha256(body).hexdigest() != meta.get("body_sha256"):
+            raise CheckpointError("Checkpoint body does not match its digest")
+        if self.verifier is not None:
+            # With authorities configured only signed checkpoints are trusted
+            unsigned = {key: value for key, value in meta.items() if key != "signature"}
+            if "signature" not in meta or not self.verifier.verify(meta.get("signer"), canonical_json(unsigned), meta["signature"]):
+                raise CheckpointError("Checkpoint signature is missing or invalid")
+        return Checkpoint(meta, json.loads(zlib.decompress(body)))
+
+    def load_latest(self, store, max_index: Optional[int] = None) -> Optional[Checkpoint]:
+        """Newest checkpoint (at or below `max_index`) whose head block is still in `store` with the same hash"""
+        limit = len(store) if max_index is None else min(max_index, len(store))
+        for meta in self.list():
+            index = meta["index"]
+            if index > limit:
+                continue
+            if verify_block(store.get(index - 1)) != meta["head_hash"]:
+                continue
+            try:
+                return self.read(self.path_for(index))
+            except (CheckpointError, ValueError, zlib.error) as e:
+                print(f"[CHECKPOINT] Skipping checkpoint #{index}: {e}")
+        return None
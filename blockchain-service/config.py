@@ -0,0 +1,82 @@
+from typing import Dict, List
+from pydantic_settings import BaseSettings
+
+class Settings(BaseSettings):
+    # Block Store (append-only segment log)
+    CHAIN_DATA_DIR: str = "./data/chain"
+    SEGMENT_MAX_BYTES: int = 64 * 1024 * 1024
+    FSYNC_ON_APPEND: bool = True
+
+    # Cold storage: sealed segments more than this many blocks behind the head are compressed
+    # (0 disables). Codec: "auto" (zstd if `zstandard` is installed, else zlib), "zstd", "lzma", "zlib".
+    ARCHIVE_AFTER_BLOCKS: int = 10000
+    ARCHIVE_CODEC: str = "auto"
+    ARCHIVE_CACHE_SEGMENTS: int = 2
+
+    # Checkpoints: signed snapshots of the materialized indexes, restored at startup (0 disables)
+    CHECKPOINT_DIR: str = "./data/checkpoints"
+    CHECKPOINT_EVERY_BLOCKS: int = 1000
+    CHECKPOINT_KEEP: int = 3
+
+    # Replication: base URLs of peer nodes to follow, as JSON, e.g. ["http://127.0.0.1:5001"]
+    PEERS: List[str] = []
+    REPLICATION_POLL_SECONDS: float = 5.0
+    REPLICATION_PAGE_SIZE: int = 500
+
+    # Bloom filter over known voter_ids: expected voters and target false-positive rate
+    BLOOM_CAPACITY: int = 1000000
+    BLOOM_ERROR_RATE: float = 0.001
+
+    # Write-ahead log of admitted transactions: submissions are acknowledged only once fsynced,
+    # and concurrent ones share an fsync, the group being held open for up to WAL_GROUP_WINDOW_MS
+    WAL_ENABLED: bool = True
+    WAL_DIR: str = "./data/wal"
+    WAL_GROUP_WINDOW_MS: float = 1.0
+
+    # Mempool / Miner
+    MEMPOOL_MAX_BLOCK_TXS: int = 500
+    MEMPOOL_MAX_LATENCY_MS: int = 200
+    RECEIPT_CACHE_SIZE: int = 100000
+    CONFIRMATION_MAX_WAIT_SECONDS: float = 30.0
+    TX_BATCH_MAX: int = 10000
+
+    # Consensus: "pow" (proof-of-work) or "poa" (proof-of-authority, needs `cryptography`)
+    CONSENSUS: str = "pow"
+
+    # Proof-of-Authority: this node's signer id and hex Ed25519 private key (see `python -m signing`),
+    # plus every authorised signer's public key as JSON, e.g. {"STATE_A": "<hex>", "STATE_B": "<hex>"}
+    POA_SIGNER_ID: str = ""
+    POA_PRIVATE_KEY: str = ""
+    POA_AUTHORITIES: Dict[str, str] = {}
+    # Last block index that may still be unsigned PoW (a chain switched from PoW); every later block must be signed
+    POA_SWITCH_HEIGHT: int = 0
+
+    # Proof-of-Work (POW_WORKERS=0 uses every core; POW_TARGET is a hex target overriding leading zeros)
+    POW_WORKERS: int = 1
+    POW_LEADING_ZEROS: int = 4
+    POW_TARGET: str = ""
+    # Easiest hex target accepted from peers and the store (default: the legacy four-zero target), so raising
+    # the mining difficulty never invalidates blocks mined before; a node always accepts its own target
+    POW_MIN_TARGET: str = ""
+    POW_CHUNK_SIZE: int = 50000
+
+    # Chain API pagination
+    CHAIN_PAGE_DEFAULT: int = 100
+    CHAIN_PAGE_MAX: int = 1000
+
+    # Parallel full audit (GET /chain/audit, `python -m audit`): worker processes (0 = every core)
+    # and the size of the raw block ranges handed to each
+    AUDIT_WORKERS: int = 0
+    AUDIT_RANGE_BYTES: int = 8 * 1024 * 1024
+
+    # Block feed (SSE)
+    FEED_KEEPALIVE_SECONDS: float = 15.0
+
+    # Materialized state API
+    STATE_BULK_MAX: int = 10000
+
+    class Config:
+        env_file = ["../.env", ".env"]
+        extra = "ignore"
+
+settings = Settings()
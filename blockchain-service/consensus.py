@@ -0,0 +1,135 @@
+from typing import Any, Dict, Optional
+from config import settings
+from mining import MiningEngine, LEGACY_TARGET, meets_target, target_for
+from signing import Signer, Verifier
+
+class Consensus:
+    """
+    How the sequencer earns the right to append a block, and how auditors check it.
+
+    propose() picks the header's `proof`, prepare() adds any other header
+    fields before the hash is taken, and finalize() runs once the hash is
+    cached (e.g. to sign it). verify() accepts both PoW and PoA blocks, judging
+    each by what it carries, so a chain can switch modes without a rewrite.
+    Unsigned blocks must also meet the node's minimum work (`max_target`), so
+    neither peers nor a tampered data directory get by with trivial targets.
+    That floor is separate from the mining target: raising the difficulty
+    leaves blocks mined at the old one valid.
+    """
+    name = "base"
+
+    def __init__(self, verifier: Optional[Verifier] = None, max_target: int = LEGACY_TARGET):
+        self.verifier = verifier
+        self._max_target = max_target
+
+    def propose(self, last_block: Dict[str, Any]) -> int:
+        raise NotImplementedError
+
+    def prepare(self, block: Dict[str, Any]):
+        pass
+
+    def finalize(self, block: Dict[str, Any]):
+        pass
+
+    def verify(self, block: Dict[str, Any], previous_block: Optional[Dict[str, Any]]) -> bool:
+        if 'signature' in block:
+            # Authority-signed block: the signature covers the (already verified) header hash
+            if self.verifier is None:
+                return False
+            return self.verifier.verify(block.get('signer'), bytes.fromhex(block['hash']), block['signature'])
+        if previous_block is None:
+            return True  # Unsigned genesis
+        target = block.get('target')
+        target = int(target, 16) if target else LEGACY_TARGET
+        if target > self.max_target:
+            return False  # Easier than the configured difficulty
+        return meets_target(previous_block['proof'], block['proof'], target)
+
+    @property
+    def max_target(self) -> int:
+        """Easiest PoW target this node accepts"""
+        return self._max_target
+
+    def spec(self) -> Dict[str, Any]:
+        """Picklable description of the verification rules, for audit worker processes"""
+        return {"kind": self.name, "max_target": self.max_target,
+                "authorities": self.verifier.authorities if self.verifier is not None else {}}
+
+    def shutdown(self):
+        pass
+
+def configured_target() -> int:
+    """PoW mining target from the settings: POW_TARGET (hex) if set, else POW_LEADING_ZEROS"""
+    return int(settings.POW_TARGET, 16) if settings.POW_TARGET else target_for(settings.POW_LEADING_ZEROS)
+
+def accepted_target() -> int:
+    """Easiest PoW target to accept: POW_MIN_TARGET (default legacy), or the mining target if that is easier"""
+    floor = int(settings.POW_MIN_TARGET, 16) if settings.POW_MIN_TARGET else LEGACY_TARGET
+    return max(floor, configured_target())
+
+class ProofOfWork(Consensus):
+    name = "pow"
+
+    def __init__(self, engine: MiningEngine = None, verifier: Optional[Verifier] = None,
+                 max_target: Optional[int] = None):
+        self.engine = engine or MiningEngine()
+        # By default: the legacy target, or the engine's own if easier (it must accept what it mines)
+        super().__init__(verifier, max_target if max_target is not None else max(LEGACY_TARGET, self.engine.target))
+
+    def propose(self, last_block: Dict[str, Any]) -> int:
+        return self.engine.proof_of_work(last_block['proof'])
+
+    def prepare(self, block: Dict[str, Any]):
+        if self.engine.target != LEGACY_TARGET:
+            # Non-default difficulty is recorded so verifiers know which target applied
+            block['target'] = format(self.engine.target, 'x')
+
+    def shutdown(self):
+        self.engine.shutdown()
+
+class ProofOfAuthority(Consensus):
+    """
+    Blocks are sealed immediately and signed by this node's authority key.
+    Every block after `switch_height` must carry a valid signature from a
+    configured authority; unsigned PoW blocks are only accepted up to it.
+    Without a signer the instance can verify but not seal (audits).
+    """
+    name = "poa"
+
+    def __init__(self, signer: Optional[Signer], verifier: Optional[Verifier],
+                 switch_height: int = 0, max_target: int = LEGACY_TARGET):
+        super().__init__(verifier, max_target)
+        self.signer = signer
+        self.switch_height = switch_height
+        if signer is not None and signer.key_id not in verifier:
+            verifier.add(signer.key_id, signer.public_key_hex)
+
+    def propose(self, last_block: Dict[str, Any]) -> int:
+        return 0
+
+    def finalize(self, block: Dict[str, Any]):
+        if self.signer is None:
+            raise RuntimeError("This ProofOfAuthority instance has no signer and can only verify")
+        block['signer'] = self.signer.key_id
+        block['signature'] = self.signer.sign(bytes.fromhex(block['hash']))
+
+    def verify(self, block: Dict[str, Any], previous_block: Optional[Dict[str, Any]]) -> bool:
+        if block['index'] > self.switch_height and 'signature' not in block:
+            return False
+        return super().verify(block, previous_block)
+
+    def spec(self) -> Dict[str, Any]:
+        return {**super().spec(), "switch_height": self.switch_height}
+
+def from_spec(spec: Dict[str, Any]) -> Consensus:
+    """Verify-only consensus with the rules described by Consensus.spec()"""
+    verifier = Verifier(spec["authorities"]) if spec["authorities"] else None
+    if spec["kind"] == "poa":
+        return ProofOfAuthority(None, verifier, spec["switch_height"], spec["max_target"])
+    return Consensus(verifier, spec["max_target"])
+
+def verifying_consensus(verifier: Optional[Verifier]) -> Consensus:
+    """Verify-only consensus for the configured mode, for tools that don't seal blocks"""
+    if settings.CONSENSUS == "poa":
+        return ProofOfAuthority(None, verifier, settings.POA_SWITCH_HEIGHT, accepted_target())
+    return Consensus(verifier, accepted_target())
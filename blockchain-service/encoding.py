@@ -0,0 +1,78 @@
+import hashlib
+import json
+import struct
+from typing import Any, Dict, Iterable, List, Optional
+from merkle import merkle_root
+
+# Version 1 blocks (no 'version' key) were hashed as sorted JSON of the whole block.
+# Version 2 blocks hash a length-prefixed header that commits to the transactions
+# through `tx_root`, so the hash never re-serialises the transaction list.
+# Version 3 keeps the same header but `tx_root` is a Merkle root (see merkle.py).
+HEADER_VERSION = 3
+FIELD_LENGTH = struct.Struct(">I")
+
+def canonical_json(obj: Any) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode()
+
+def tx_hash(tx: Dict[str, Any]) -> str:
+    """SHA-256 of a single transaction's canonical JSON"""
+    return hashlib.sha256(canonical_json(tx)).hexdigest()
+
+def flat_root(tx_hashes: Iterable[str]) -> str:
+    """Version 2 digest committing to an ordered list of transaction hashes"""
+    digest = hashlib.sha256()
+    for h in tx_hashes:
+        digest.update(bytes.fromhex(h))
+    return digest.hexdigest()
+
+def header_fields(block: Dict[str, Any]) -> Dict[str, Any]:
+    """The hashed header of a version 2+ block (everything except transactions and hash)"""
+    return {key: block[key] for key in ('version', 'index', 'timestamp', 'proof', 'previous_hash', 'tx_root', 'target') if key in block}
+
+def encode_header(block: Dict[str, Any]) -> bytes:
+    """Deterministic length-prefixed encoding of the block header fields"""
+    fields = [
+        str(block['version']),
+        str(block['index']),
+        repr(float(block['timestamp'])),
+        str(block['proof']),
+        block['previous_hash'],
+        block['tx_root'],
+        block.get('target', ''),
+    ]
+    out = bytearray()
+    for field in fields:
+        data = field.encode()
+        out += FIELD_LENGTH.pack(len(data))
+        out += data
+    return bytes(out)
+
+def legacy_hash(block: Dict[str, Any]) -> str:
+    """Version 1 hash: sorted JSON of the full block"""
+    return hashlib.sha256(json.dumps(block, sort_keys=True).encode()).hexdigest()
+
+def compute_hash(block: Dict[str, Any]) -> str:
+    """Recompute a block's hash from its contents, whatever its version"""
+    if block.get('version', 1) >= 2:
+        return hashlib.sha256(encode_header(block)).hexdigest()
+    return legacy_hash(block)
+
+def transactions_root(version: int, tx_hashes: List[str]) -> str:
+    return merkle_root(tx_hashes) if version >= 3 else flat_root(tx_hashes)
+
+def seal_header(block: Dict[str, Any], transactions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Fill in version, tx_root and the cached hash of a freshly built block"""
+    block['version'] = HEADER_VERSION
+    block['tx_root'] = transactions_root(HEADER_VERSION, [tx_hash(tx) for tx in transactions])
+    block['hash'] = compute_hash(block)
+    return block
+
+def verify_block(block: Dict[str, Any]) -> Optional[str]:
+    """Return the block's hash if its contents match what was sealed, otherwise None"""
+    if block.get('version', 1) < 2:
+        return legacy_hash(block)
+    tx_hashes = [tx_hash(tx) for tx in block['transactions']]
+    if transactions_root(block['version'], tx_hashes) != block['tx_root']:
+        return None
+    block_hash = compute_hash(block)
+    return block_hash if block_hash == block.get('hash') else None
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from starlette.concurrency import run_in_threadpool
+from blockchain import Blockchain
+
+class BlockFeed:
+    """
+    Push feed of sealed blocks for Server-Sent Events subscribers.
+    The sequencer calls notify() after every mutation; each subscriber then
+    reads whatever is new from the block store, so a slow client never
+    holds up the writer and a reconnecting client resumes from any index.
+
+    When the chain under a subscriber changes (a reorg or a reset), a
+    `reset` event carries the fork point: the last block the subscriber was
+    sent that is still on the chain (0 if none of the last `history` are).
+    The stream then resumes right after it instead of replaying from genesis.
+    """
+
+    def __init__(self, blockchain: Blockchain, keepalive: float = 15.0, catch_up_batch: int = 100,
+                 history: int = 1024):
+        self.blockchain = blockchain
+        self.keepalive = keepalive
+        self.catch_up_batch = catch_up_batch
+        self.history = history
+        self._lock = threading.Lock()
+        self._subscribers: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def notify(self):
+        """Wake every subscriber; safe to call from the sequencer thread"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, event in subscribers:
+            loop.call_soon_threadsafe(event.set)
+
+    async def stream(self, from_index: int, is_disconnected: Callable[[], Awaitable[bool]],
+                     last_hash: Optional[str] = None) -> AsyncIterator[str]:
+        """
+        Yield SSE frames for every block from `from_index` on, then follow the chain head.
+        `last_hash` is the subscriber's hash of block `from_index - 1`; if the chain no longer
+        has it there, the stream opens with a `reset` instead of building on a stale branch.
+        """
+        subscriber = (asyncio.get_running_loop(), asyncio.Event())
+        wakeup = subscriber[1]
+        with self._lock:
+            self._subscribers.append(subscriber)
+        cursor = max(from_index, 1)
+        sent: Deque[Tuple[int, str]] = deque(maxlen=self.history)  # (index, hash) of the latest blocks sent
+        caught_up = False
+        try:
+            if last_hash and cursor > 1:
+                # Reconnecting: a reorg to an equal or greater length while away leaves no gap to notice
+                sent.append((cursor - 1, last_hash))
+                if await run_in_threadpool(self._fork_point, sent) != cursor - 1:
+                    sent.clear()
+                    cursor = 1
+                    yield _frame("reset", 0, {"fork": 0, "hash": None})
+            while not await is_disconnected():
+                wakeup.clear()
+                length = self.blockchain.length
+                blocks = []
+                if cursor <= length:
+                    stop = min(length, cursor + self.catch_up_batch - 1)
+                    blocks = await run_in_threadpool(self._read, cursor, stop)
+                diverged = blocks and sent and blocks[0]['previous_hash'] != sent[-1][1]
+                if cursor > length + 1 or diverged:
+                    # The chain was reorganised (or reset) underneath this subscriber
+                    fork = await run_in_threadpool(self._fork_point, sent)
+                    while sent and sent[-1][0] > fork:
+                        sent.pop()
+                    cursor, caught_up = fork + 1, False
+                    yield _frame("reset", fork, {"fork": fork, "hash": sent[-1][1] if sent else None})
+                    continue
+                if blocks:
+                    for block in blocks:
+                        yield _frame("block", block['index'], block)
+                        sent.append((block['index'], self.blockchain.hash(block)))
+                    cursor = blocks[-1]['index'] + 1
+                    caught_up = False
+                    continue
+                if not caught_up:
+                    # Tell the subscriber it now holds everything up to the head
+                    caught_up = True
+                    yield _frame("head", length, {"length": length})
+                try:
+                    await asyncio.wait_for(wakeup.wait(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            with self._lock:
+                self._subscribers.remove(subscriber)
+
+    def _read(self, start: int, stop: int) -> List[Dict[str, Any]]:
+        return list(self.blockchain.iter_blocks(start, stop))
+
+    def _fork_point(self, sent: Deque[Tuple[int, str]]) -> int:
+        """Highest block the subscriber was sent that is still on the chain (0 if none of those)"""
+        snapshot = self.blockchain.snapshot
+        for index, block_hash in reversed(sent):
+            if index <= snapshot.length and self.blockchain.hash(self.blockchain.get_block(index, snapshot)) == block_hash:
+                return index
+        return 0
+
+def _frame(event: str, event_id: int, data: Dict[str, Any]) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
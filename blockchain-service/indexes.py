@@ -0,0 +1,212 @@
+import hashlib
+import math
+from typing import Dict, Iterable, List, Tuple, Any, Optional
+from records import VoterState, pack_location, unpack_location
+
+class VoterIndex:
+    """Secondary index: voter_id -> [(block index, tx offset), ...] in chain order (stored packed)"""
+
+    def __init__(self):
+        self._locations: Dict[str, List[int]] = {}
+
+    def add_block(self, block: Dict[str, Any]):
+        for offset, tx in enumerate(block['transactions']):
+            voter_id = tx.get('data', {}).get('voter_id')
+            if voter_id is not None:
+                self._locations.setdefault(voter_id, []).append(pack_location(block['index'], offset))
+
+    def lookup(self, voter_id: str) -> List[Tuple[int, int]]:
+        return [unpack_location(location) for location in self._locations.get(voter_id, ())]
+
+    def export(self) -> Dict[str, List[int]]:
+        """Point-in-time copy for checkpoints (lists keep growing after this returns)"""
+        return {voter_id: list(locations) for voter_id, locations in self._locations.items()}
+
+    def load(self, data: Dict[str, List[Any]]):
+        self._locations = {voter_id: [_packed(loc) for loc in locations] for voter_id, locations in data.items()}
+
+    def voter_ids(self) -> List[str]:
+        return list(self._locations)
+
+    def __contains__(self, voter_id: str) -> bool:
+        return voter_id in self._locations
+
+    def clear(self):
+        self._locations.clear()
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+class TxIndex:
+    """tx_id -> (block index, tx offset) for transactions that carry a tx_id"""
+
+    def __init__(self):
+        self._locations: Dict[str, int] = {}
+
+    def add_block(self, block: Dict[str, Any]):
+        for offset, tx in enumerate(block['transactions']):
+            tx_id = tx.get('tx_id')
+            if tx_id is not None:
+                self._locations[tx_id] = pack_location(block['index'], offset)
+
+    def lookup(self, tx_id: str) -> Optional[Tuple[int, int]]:
+        location = self._locations.get(tx_id)
+        return None if location is None else unpack_location(location)
+
+    def export(self) -> Dict[str, int]:
+        return dict(self._locations)
+
+    def load(self, data: Dict[str, Any]):
+        self._locations = {tx_id: _packed(loc) for tx_id, loc in data.items()}
+
+    def clear(self):
+        self._locations.clear()
+
+    def __len__(self) -> int:
+        return len(self._locations)
+
+def _packed(location: Any) -> int:
+    # Checkpoints written before locations were packed hold [block index, offset] pairs
+    return location if isinstance(location, int) else pack_location(*location)
+
+def owner_state(data: Dict[str, Any]):
+    return data.get('state') or data.get('owner_state') or data.get('to_state')
+
+class LatestStateView:
+    """Materialized voter_id -> latest transaction state, updated as blocks are sealed"""
+
+    def __init__(self):
+        self._states: Dict[str, VoterState] = {}
+
+    def add_block(self, block: Dict[str, Any]):
+        for offset, tx in enumerate(block['transactions']):
+            data = tx.get('data', {})
+            voter_id = data.get('voter_id')
+            if voter_id is None:
+                continue
+            self._states[voter_id] = VoterState(
+                voter_id,
+                data.get('event_type') or data.get('event'),
+                owner_state(data),
+                data.get('data_hash'),
+                tx.get('tx_id'),
+                block['index'],
+                offset,
+                tx.get('timestamp'),
+            )
+
+    def get(self, voter_id: str) -> Optional[Dict[str, Any]]:
+        state = self._states.get(voter_id)
+        return None if state is None else state.to_dict()
+
+    def export(self) -> Dict[str, VoterState]:
+        # Entries are replaced, never mutated, so a shallow copy is a consistent snapshot
+        return dict(self._states)
+
+    def load(self, data: Dict[str, Dict[str, Any]]):
+        self._states = {voter_id: VoterState.from_dict(state) for voter_id, state in data.items()}
+
+    def clear(self):
+        self._states.clear()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+class VoterFilter:
+    """
+    Bloom filter over every voter_id on the chain, so lookups for IDs that were
+    never registered (typos, probing) are answered without touching the indexes.
+    A negative is certain; a positive may be false at roughly `error_rate`.
+    Doubles its capacity (rebuilding from the voter index) when it fills up.
+    """
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.001):
+        self.error_rate = error_rate
+        self.count = 0
+        self.queries = 0
+        self.negatives = 0
+        self.false_positives = 0
+        # (capacity, bit count, hash count, bit array) swapped as one reference
+        self._table = self._new_table(capacity)
+
+    def _new_table(self, capacity: int) -> Tuple[int, int, int, bytearray]:
+        capacity = max(capacity, 1)
+        # Optimal size and hash count for the target false-positive rate
+        bits = math.ceil(-capacity * math.log(self.error_rate) / math.log(2) ** 2)
+        hashes = max(1, round(bits / capacity * math.log(2)))
+        return capacity, bits, hashes, bytearray((bits + 7) // 8)
+
+    @staticmethod
+    def _positions(voter_id: str, bits: int, hashes: int) -> Iterable[int]:
+        # Double hashing: k positions from the two 64-bit halves of one digest
+        digest = hashlib.blake2b(voter_id.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % bits for i in range(hashes))
+
+    @classmethod
+    def _set(cls, table: Tuple[int, int, int, bytearray], voter_id: str):
+        _, bits, hashes, array = table
+        for position in cls._positions(voter_id, bits, hashes):
+            array[position >> 3] |= 1 << (position & 7)
+
+    def add_block(self, block: Dict[str, Any], voter_index: "VoterIndex"):
+        """Call before the voter index sees the block, so only first sightings are counted"""
+        new_ids = {tx.get('data', {}).get('voter_id') for tx in block['transactions']}
+        new_ids = [voter_id for voter_id in new_ids if voter_id is not None and voter_id not in voter_index]
+        capacity = self._table[0]
+        if self.count + len(new_ids) > capacity:
+            self.rebuild(voter_index.voter_ids() + new_ids, max(capacity * 2, self.count + len(new_ids)))
+            return
+        for voter_id in new_ids:
+            self._set(self._table, voter_id)
+        self.count += len(new_ids)
+
+    def might_contain(self, voter_id: str) -> bool:
+        _, bits, hashes, array = self._table
+        self.queries += 1
+        for position in self._positions(voter_id, bits, hashes):
+            if not array[position >> 3] & (1 << (position & 7)):
+                self.negatives += 1
+                return False
+        return True
+
+    def record_false_positive(self):
+        """The filter said maybe, the index said no"""
+        self.false_positives += 1
+
+    def rebuild(self, voter_ids: List[str], capacity: Optional[int] = None):
+        """Repopulate from scratch (after a checkpoint restore, or to grow)"""
+        table = self._new_table(max(capacity or self._table[0], len(voter_ids)))
+        for voter_id in voter_ids:
+            self._set(table, voter_id)
+        # Readers never see a half-built filter
+        self._table, self.count = table, len(voter_ids)
+
+    def clear(self):
+        self._table, self.count = self._new_table(self._table[0]), 0
+
+    def empty_like(self) -> "VoterFilter":
+        """New empty filter with this one's size, to rebuild into while this one keeps serving"""
+        return VoterFilter(self._table[0], self.error_rate)
+
+    def replace(self, other: "VoterFilter"):
+        """Take over a rebuilt filter's bits in one swap (lookup counters are kept)"""
+        self._table, self.count = other._table, other.count
+
+    def stats(self) -> Dict[str, Any]:
+        capacity, bits, hashes, array = self._table
+        absent = self.negatives + self.false_positives
+        return {
+            "voters": self.count,
+            "capacity": capacity,
+            "bits": bits,
+            "hashes": hashes,
+            "memory_bytes": len(array),
+            "target_false_positive_rate": self.error_rate,
+            # (1 - e^(-kn/m))^k at the current fill
+            "expected_false_positive_rate": (1 - math.exp(-hashes * self.count / bits)) ** hashes,
+            "queries": self.queries,
+            "fast_negatives": self.negatives,
+            "false_positives": self.false_positives,
+            "observed_false_positive_rate": self.false_positives / absent if absent else 0.0,
+        }
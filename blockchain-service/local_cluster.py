@@ -0,0 +1,60 @@
+"""
+Run several replicating blockchain nodes on this machine, each in its own
+process with its own data directory, every node peering with every other.
+
+Run from blockchain-service/:
+    python -m local_cluster --nodes 3 --base-port 5000
+Extra environment (e.g. CONSENSUS, POW_LEADING_ZEROS) is passed through.
+Ctrl+C stops every node.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Dict, List, Optional
+
+def start_node(n: int, urls: List[str], data_dir: str, poll: float = 2.0,
+               env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+    """Start node `n` of the cluster `urls` (one port each) in its own process, peering with the others"""
+    url = urls[n]
+    node_dir = os.path.join(data_dir, f"node{n}")
+    env = {
+        **os.environ,
+        **(env or {}),
+        "CHAIN_DATA_DIR": os.path.join(node_dir, "chain"),
+        "CHECKPOINT_DIR": os.path.join(node_dir, "checkpoints"),
+        "WAL_DIR": os.path.join(node_dir, "wal"),
+        "PEERS": json.dumps([peer for peer in urls if peer != url]),
+        "REPLICATION_POLL_SECONDS": str(poll),
+    }
+    port = url.rsplit(":", 1)[1]
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--port", port]
+    return subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--base-port", type=int, default=5000)
+    parser.add_argument("--data-dir", default="./data/cluster")
+    parser.add_argument("--poll", type=float, default=2.0, help="REPLICATION_POLL_SECONDS")
+    args = parser.parse_args()
+
+    urls = [f"http://127.0.0.1:{args.base_port + n}" for n in range(args.nodes)]
+    processes = []
+    for n, url in enumerate(urls):
+        processes.append(start_node(n, urls, os.path.abspath(args.data_dir), args.poll))
+        print(f"node{n}: {url}")
+    try:
+        for process in processes:
+            process.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,25 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import asyncio
+import json
+import threading
+from typing import Any, Callable, List, Optional
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
 from blockchain import Blockchain
+from archive import SegmentArchiver, SegmentCache
+from audit import run_audit
+from block_store import BlockStore
+from checkpoint import CheckpointStore
+from indexes import VoterFilter
+from mempool import Mempool, idempotent_tx_id
+from wal import WriteAheadLog
+from sequencer import Sequencer
+from feed import BlockFeed
+from replication import Replicator
+from mining import MiningEngine
+from consensus import Consensus, ProofOfAuthority, ProofOfWork, accepted_target, configured_target
+from signing import load_keys
+from config import settings
 from uuid import uuid4
 # CRITICAL FIX: Use the full package path for import
 # try:
@@ -10,54 +29,424 @@ from uuid import uuid4
 #     # Try importing from the root package (Render Production)
 #     from blockchain-service.blockchain import Blockchain
 app = FastAPI()
-blockchain = Blockchain()
+block_store = BlockStore(
+    settings.CHAIN_DATA_DIR,
+    segment_max_bytes=settings.SEGMENT_MAX_BYTES,
+    fsync=settings.FSYNC_ON_APPEND,
+    cache=SegmentCache(settings.ARCHIVE_CACHE_SEGMENTS),
+)
+archiver = SegmentArchiver(block_store, after_blocks=settings.ARCHIVE_AFTER_BLOCKS, codec=settings.ARCHIVE_CODEC)
+
+# Signatures can only be made/checked when keys are configured; PoW-only nodes never import `cryptography`
+signer, verifier = load_keys(settings.POA_SIGNER_ID, settings.POA_PRIVATE_KEY, settings.POA_AUTHORITIES)
+
+def build_consensus() -> Consensus:
+    if settings.CONSENSUS == "poa":
+        if signer is None:
+            raise RuntimeError("CONSENSUS=poa requires POA_SIGNER_ID and POA_PRIVATE_KEY")
+        return ProofOfAuthority(signer, verifier, settings.POA_SWITCH_HEIGHT, accepted_target())
+    if settings.CONSENSUS != "pow":
+        raise RuntimeError(f"Unknown CONSENSUS mode: {settings.CONSENSUS}")
+    mining_engine = MiningEngine(
+        workers=settings.POW_WORKERS,
+        target=configured_target(),
+        chunk_size=settings.POW_CHUNK_SIZE,
+    )
+    return ProofOfWork(mining_engine, verifier, accepted_target())
+
+consensus = build_consensus()
+checkpoints = CheckpointStore(
+    settings.CHECKPOINT_DIR,
+    every_blocks=settings.CHECKPOINT_EVERY_BLOCKS,
+    keep=settings.CHECKPOINT_KEEP,
+    signer=signer,
+    # Nodes that sign their own checkpoints only trust signed ones
+    verifier=verifier if signer is not None else None,
+)
+voter_filter = VoterFilter(capacity=settings.BLOOM_CAPACITY, error_rate=settings.BLOOM_ERROR_RATE)
+blockchain = Blockchain(block_store, consensus, checkpoints, voter_filter)
+wal = WriteAheadLog(
+    settings.WAL_DIR,
+    group_window=settings.WAL_GROUP_WINDOW_MS / 1000,
+    fsync=settings.FSYNC_ON_APPEND,
+) if settings.WAL_ENABLED else None
+mempool = Mempool(
+    max_block_txs=settings.MEMPOOL_MAX_BLOCK_TXS,
+    max_latency=settings.MEMPOOL_MAX_LATENCY_MS / 1000,
+    receipt_cache_size=settings.RECEIPT_CACHE_SIZE,
+    wal=wal,
+)
+if wal is not None:
+    # Acknowledged before a crash but never sealed: queue them again
+    recovered = wal.recover(lambda tx_id: blockchain.tx_index.lookup(tx_id) is not None)
+    if recovered:
+        mempool.admit(recovered)
+        print(f"[WAL] Re-queued {len(recovered)} unsealed transaction(s)")
+block_feed = BlockFeed(blockchain, keepalive=settings.FEED_KEEPALIVE_SECONDS)
+
+def on_chain_change():
+    # Runs on the sequencer thread after every block or command
+    block_feed.notify()
+    checkpoints.maybe_write(blockchain)
+    archiver.maybe_archive()
+
+sequencer = Sequencer(blockchain, mempool, on_change=on_chain_change)
+replicator = Replicator(
+    settings.PEERS, blockchain, sequencer, mempool,
+    poll_interval=settings.REPLICATION_POLL_SECONDS,
+    page_size=settings.REPLICATION_PAGE_SIZE,
+    read_timeout=settings.FEED_KEEPALIVE_SECONDS * 4,
+)
+audit_running = threading.Lock()
 node_identifier = str(uuid4()).replace('-', '')
 
 class Transaction(BaseModel):
     sender: str
     recipient: str
     data: dict
+    idempotency_key: Optional[str] = None  # Retries with the same key get the original receipt
+
+class TransactionBatch(BaseModel):
+    transactions: List[dict]
+
+class StateQuery(BaseModel):
+    voter_ids: List[str]
+
+class ProofQuery(BaseModel):
+    tx_ids: List[str]
+
+class HeaderQuery(BaseModel):
+    indexes: List[int]
+
+@app.on_event("startup")
+def start_sequencer():
+    sequencer.start()
+    replicator.start()
+
+@app.on_event("shutdown")
+def stop_sequencer():
+    replicator.stop()
+    sequencer.stop()
+    if wal is not None:
+        wal.close()
+    consensus.shutdown()
+
+def receipt_response(receipt: dict) -> JSONResponse:
+    # 200 once sealed, 202 while the transaction is still waiting in the mempool,
+    # 410 if a /reset dropped it before it was sealed
+    status_code = {"CONFIRMED": 200, "DROPPED": 410}.get(receipt["status"], 202)
+    return JSONResponse(status_code=status_code, content=receipt)
 
 @app.get("/chain")
-def full_chain():
+def full_chain(
+    from_index: Optional[int] = Query(None, alias="from", ge=1),
+    to_index: Optional[int] = Query(None, alias="to", ge=1),
+    limit: int = Query(settings.CHAIN_PAGE_DEFAULT, ge=1),
+    offset: int = Query(0, ge=0),
+    reverse: bool = False,
+    cursor: Optional[int] = Query(None, ge=1),
+    audit: str = "incremental",
+):
+    """
+    Return one page of the chain.
+    `from`/`to` bound the range, `reverse=true` walks newest first and `cursor` resumes
+    from a previous page's `next_cursor`. `audit=full` re-verifies from genesis.
+    """
+    is_valid = blockchain.check_integrity(full=(audit == "full"))
+    limit = min(limit, settings.CHAIN_PAGE_MAX)
+    if cursor is not None:
+        # A cursor is simply the next block index to read in the walk direction
+        if reverse:
+            to_index, offset = min(cursor, to_index or cursor), 0
+        else:
+            from_index, offset = max(cursor, from_index or cursor), 0
+    blocks, next_cursor = blockchain.page(from_index, to_index, limit, offset, reverse)
     return {
-        "chain": blockchain.chain,
-        "length": len(blockchain.chain),
-        "is_valid": blockchain.check_integrity()
+        "chain": blocks,
+        "length": blockchain.length,
+        "is_valid": is_valid,
+        "verified_through": blockchain.verified_index,
+        "next_cursor": next_cursor
     }
 
+@app.get("/chain/stream")
+def stream_chain(
+    from_index: int = Query(1, alias="from", ge=1),
+    to_index: Optional[int] = Query(None, alias="to", ge=1),
+):
+    """Stream blocks as NDJSON, one block per line, for bulk consumers"""
+    def generate():
+        for block in blockchain.iter_blocks(from_index, to_index):
+            yield json.dumps(block) + "\n"
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.get("/chain/audit")
+def audit_chain():
+    """
+    Full re-verification from genesis on a process pool, streamed as NDJSON
+    progress events ending in a `done` event. A clean audit advances the
+    incremental-audit watermark used by GET /chain.
+    """
+    if audit_running.locked():
+        raise HTTPException(status_code=409, detail="An audit is already running")
+    def generate():
+        # Taken only once streaming starts: a client that disconnects before then never holds the lock
+        if not audit_running.acquire(blocking=False):
+            yield json.dumps({"event": "error", "message": "An audit is already running"}) + "\n"
+            return
+        try:
+            for event in run_audit(block_store, consensus, settings.AUDIT_WORKERS, settings.AUDIT_RANGE_BYTES):
+                if event["event"] == "done" and event["is_valid"] and event["length"]:
+                    blockchain.mark_verified(event["length"], event["head_hash"])
+                yield json.dumps(event) + "\n"
+        finally:
+            audit_running.release()
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@app.get("/chain/since/{index}")
+def chain_since(index: int, limit: int = Query(settings.CHAIN_PAGE_DEFAULT, ge=0)):
+    """Blocks after `index` plus the head they lead to, for replicas tailing this node"""
+    snapshot = blockchain.snapshot
+    limit = min(limit, settings.CHAIN_PAGE_MAX)
+    blocks = list(blockchain.iter_blocks(index + 1, min(snapshot.length, index + limit), snapshot)) if limit else []
+    return {"length": snapshot.length, "head_hash": blockchain.hash(snapshot.last_block), "blocks": blocks}
+
+@app.get("/peers")
+def peer_status():
+    """Replication state for each configured peer"""
+    return {"length": blockchain.length, "peers": replicator.status()}
+
+@app.get("/blocks/feed")
+async def block_feed_stream(
+    request: Request,
+    from_index: int = Query(1, ge=1),
+    last_hash: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None),
+):
+    """
+    Server-Sent Events feed of sealed blocks, starting at `from_index`.
+    Each event's id is the block index, so a reconnecting client (or its
+    Last-Event-ID header) resumes exactly where it left off. A `head`
+    event marks the subscriber as caught up; a `reset` event means the
+    chain was reorganised or reset: blocks after its `fork` index are gone
+    (all of them for fork 0) and the stream carries on from `fork + 1`.
+    A reconnecting client passes `last_hash`, its hash of block
+    `from_index - 1`, so a reorg while it was away is reported too.
+    """
+    if last_event_id and last_event_id.isdigit():
+        from_index = int(last_event_id) + 1
+    return StreamingResponse(
+        block_feed.stream(from_index, request.is_disconnected, last_hash),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/checkpoints")
+def list_checkpoints():
+    """Checkpoints held by this node, newest first"""
+    return {"checkpoints": checkpoints.list()}
+
+@app.get("/checkpoints/latest")
+def latest_checkpoint():
+    """Download the newest checkpoint file (used by `python -m bootstrap`)"""
+    available = checkpoints.list()
+    if not available:
+        raise HTTPException(status_code=404, detail="No checkpoint available")
+    return FileResponse(checkpoints.path_for(available[0]["index"]), media_type="application/octet-stream")
+
+@app.get("/segments")
+def list_segments():
+    """Block log segments available for export; `base` is the 0-based position of their first block"""
+    return {"length": len(block_store), "segments": block_store.segment_info()}
+
+@app.get("/segments/{base}")
+def export_segment(base: int):
+    """Raw length-prefixed block records of one segment, the compact export format"""
+    try:
+        chunks = block_store.export_segment(base)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Segment not found")
+    return StreamingResponse(chunks, media_type="application/octet-stream")
+
+def _reset(chain: Blockchain):
+    mempool.clear()
+    chain.reset()
+
 @app.post("/reset")
-def reset_chain():
-    global blockchain
-    blockchain = Blockchain()
+async def reset_chain():
+    # Runs on the sequencer so it is ordered with respect to in-flight blocks
+    await asyncio.wrap_future(sequencer.submit(_reset))
     return {"message": "Blockchain reset to genesis block"}
 
 @app.post("/transactions/new")
-def new_transaction(tx: Transaction):
-    index = blockchain.new_transaction(tx.sender, tx.recipient, tx.data)
-    # In a real system, you wait for mining. For this VMS, we auto-mine for speed.
-    last_block = blockchain.last_block
-    last_proof = last_block['proof']
-    proof = blockchain.proof_of_work(last_proof)
-    previous_hash = blockchain.hash(last_block)
-    block = blockchain.new_block(proof, previous_hash)
-    
+async def new_transaction(tx: Transaction, wait: float = 0):
+    """Accept a transaction into the mempool; optionally wait up to `wait` seconds for its block"""
+    receipt = sealed_receipt(idempotent_tx_id(tx.sender, tx.idempotency_key)) if tx.idempotency_key else None
+    if receipt is not None:
+        return receipt_response(receipt)
+    try:
+        receipt = await mempool.add(tx.sender, tx.recipient, tx.data, tx.idempotency_key)
+    except OSError as e:
+        raise HTTPException(status_code=503, detail=f"Could not persist transaction: {e}")
+
     event_type = tx.data.get('event_type', 'UNKNOWN')
     voter_id = tx.data.get('voter_id', 'UNKNOWN')
-    print(f"\n[{event_type}] Mined Block #{block['index']} for Voter {voter_id}")
-    print(f"Transaction Hash: {blockchain.hash(block)}")
-    print(f"Sender: {tx.sender} -> Recipient: {tx.recipient}\n")
-    
-    return {"message": "Transaction added and Block Mined", "block_index": block['index'], "transaction_hash": blockchain.hash(block)}
+    print(f"[{event_type}] Queued tx {receipt['tx_id']} for Voter {voter_id} ({tx.sender} -> {tx.recipient})")
+
+    if wait > 0:
+        receipt = await mempool.wait_for(receipt["tx_id"], min(wait, settings.CONFIRMATION_MAX_WAIT_SECONDS)) or receipt
+    return receipt_response(receipt)
+
+@app.post("/transactions/batch")
+async def new_transactions_batch(batch: TransactionBatch, wait: float = 0):
+    """
+    Validate many transactions in one pass and queue the valid ones together.
+    The miner packs them into as few blocks as MEMPOOL_MAX_BLOCK_TXS allows.
+    Returns one receipt per item, in request order.
+    """
+    if len(batch.transactions) > settings.TX_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {settings.TX_BATCH_MAX} transactions per batch")
+
+    receipts: List[Optional[dict]] = [None] * len(batch.transactions)
+    valid_positions, valid_items = [], []
+    for position, item in enumerate(batch.transactions):
+        try:
+            tx = Transaction.model_validate(item)
+        except ValidationError as e:
+            receipts[position] = {"status": "REJECTED", "error": json.loads(e.json(include_url=False))}
+            continue
+        if tx.idempotency_key:
+            receipts[position] = sealed_receipt(idempotent_tx_id(tx.sender, tx.idempotency_key))
+            if receipts[position] is not None:
+                continue
+        valid_positions.append(position)
+        valid_items.append((tx.sender, tx.recipient, tx.data, tx.idempotency_key))
+
+    try:
+        queued = await mempool.add_many(valid_items)
+    except OSError as e:
+        raise HTTPException(status_code=503, detail=f"Could not persist transactions: {e}")
+    for position, receipt in zip(valid_positions, queued):
+        receipts[position] = receipt
+    rejected = sum(1 for r in receipts if r["status"] == "REJECTED")
+    print(f"[BATCH] Queued {len(valid_items)} tx(s), rejected {rejected}")
+
+    if wait > 0 and valid_positions:
+        timeout = min(wait, settings.CONFIRMATION_MAX_WAIT_SECONDS)
+        confirmed = await asyncio.gather(*(mempool.wait_for(receipts[p]["tx_id"], timeout) for p in valid_positions))
+        for position, receipt in zip(valid_positions, confirmed):
+            receipts[position] = receipt or receipts[position]
+
+    all_confirmed = all(r["status"] == "CONFIRMED" for r in receipts if r["status"] != "REJECTED")
+    return JSONResponse(status_code=200 if all_confirmed else 202, content={
+        "accepted": len(receipts) - rejected,
+        "rejected": rejected,
+        "receipts": receipts,
+    })
+
+@app.get("/transactions/{tx_id}")
+async def transaction_receipt(tx_id: str, wait: float = 0):
+    """Long-poll for a transaction's confirmation receipt"""
+    if wait > 0:
+        receipt = await mempool.wait_for(tx_id, min(wait, settings.CONFIRMATION_MAX_WAIT_SECONDS))
+    else:
+        receipt = mempool.receipt(tx_id)
+    if receipt is None:
+        # Receipt cache is bounded; fall back to the tx index for older transactions
+        receipt = sealed_receipt(tx_id)
+        if receipt is None:
+            raise HTTPException(status_code=404, detail="Transaction not found")
+    return receipt_response(receipt)
+
+def sealed_receipt(tx_id: str) -> Optional[dict]:
+    """Receipt for a transaction already on chain, rebuilt from the tx index"""
+    block = blockchain.block_of(tx_id)
+    if block is None:
+        return None
+    return {
+        "message": "Transaction added and Block Mined",
+        "tx_id": tx_id,
+        "status": "CONFIRMED",
+        "block_index": block['index'],
+        "transaction_hash": blockchain.hash(block),
+    }
+
+def probe_voter(lookup: Callable[[str], Any], voter_id: str) -> Any:
+    """Ask the Bloom filter first, so unknown voter_ids never reach the indexes"""
+    if not voter_filter.might_contain(voter_id):
+        return None
+    found = lookup(voter_id)
+    if not found:
+        voter_filter.record_false_positive()
+    return found
 
 @app.get("/verify/{voter_id}")
 def verify_voter_on_chain(voter_id: str):
-    """Scan chain to find latest state of a voter"""
-    history = []
-    for block in blockchain.chain:
-        for tx in block['transactions']:
-            if tx['data'].get('voter_id') == voter_id:
-                history.append(tx)
+    """Look up a voter's history through the voter_id index"""
+    history = probe_voter(blockchain.voter_history, voter_id)
     if not history:
         raise HTTPException(status_code=404, detail="Voter not found on chain")
-    return {"history": history, "latest": history[-1]}
\ No newline at end of file
+    return {"history": history, "latest": history[-1]}
+
+@app.get("/state/{voter_id}")
+def voter_state(voter_id: str):
+    """Latest owner state and event for a voter, served from the materialized view"""
+    state = probe_voter(blockchain.state_view.get, voter_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Voter not found on chain")
+    return state
+
+@app.post("/state/bulk")
+def voter_states_bulk(query: StateQuery):
+    """Latest state for many voters in one round-trip"""
+    if len(query.voter_ids) > settings.STATE_BULK_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {settings.STATE_BULK_MAX} voter_ids per request")
+    states, missing = {}, []
+    for voter_id in query.voter_ids:
+        state = probe_voter(blockchain.state_view.get, voter_id)
+        if state is None:
+            missing.append(voter_id)
+        else:
+            states[voter_id] = state
+    return {"states": states, "missing": missing}
+
+@app.get("/stats")
+def node_stats():
+    """Sizes of the in-memory indexes and the voter Bloom filter's hit rates"""
+    return {
+        "length": blockchain.length,
+        "voters": len(blockchain.voter_index),
+        "transactions": len(blockchain.tx_index),
+        "pending_transactions": len(mempool),
+        "feed_subscribers": len(block_feed),
+        "archive_cache": block_store.cache.stats(),
+        "wal": wal.status() if wal is not None else None,
+        "voter_filter": voter_filter.stats(),
+    }
+
+@app.get("/proof/{tx_id}")
+def transaction_proof(tx_id: str):
+    """O(log n) Merkle inclusion proof for a sealed transaction"""
+    try:
+        proof = blockchain.inclusion_proof(tx_id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if proof is None:
+        raise HTTPException(status_code=404, detail="Transaction not found on chain")
+    return proof
+
+@app.post("/proof/bulk")
+def transaction_proofs_bulk(query: ProofQuery):
+    """Inclusion proofs for many transactions in one round-trip; unknown or pre-Merkle ones are `missing`"""
+    if len(query.tx_ids) > settings.STATE_BULK_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {settings.STATE_BULK_MAX} tx_ids per request")
+    proofs = blockchain.inclusion_proofs(query.tx_ids)
+    missing = [tx_id for tx_id in query.tx_ids if tx_id not in proofs]
+    return {"proofs": proofs, "missing": missing}
+
+@app.post("/headers/bulk")
+def block_hashes_bulk(query: HeaderQuery):
+    """Hashes of blocks on this node's chain, for clients anchoring proofs that another node served"""
+    if len(query.indexes) > settings.STATE_BULK_MAX:
+        raise HTTPException(status_code=413, detail=f"At most {settings.STATE_BULK_MAX} indexes per request")
+    return {"length": blockchain.length, "hashes": blockchain.block_hashes(query.indexes)}
@@ -0,0 +1,214 @@
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict, deque
+from time import monotonic, time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+from records import Receipt
+from wal import WriteAheadLog
+
+def idempotent_tx_id(sender: str, key: str) -> str:
+    """Deterministic tx_id for a client's idempotency key, so a retried submission maps onto the original"""
+    return hashlib.sha256(f"{sender}\x00{key}".encode()).hexdigest()[:32]
+
+class Mempool:
+    """Transactions accepted by the node but not yet sealed into a block"""
+
+    def __init__(self, max_block_txs: int = 500, max_latency: float = 0.2, receipt_cache_size: int = 100000,
+                 wal: Optional[WriteAheadLog] = None):
+        self.max_block_txs = max_block_txs
+        self.max_latency = max_latency
+        self.receipt_cache_size = receipt_cache_size
+        self.wal = wal
+        self._cond = threading.Condition()
+        self._pending = deque()  # (accepted_at, tx)
+        self._pending_ids = set()
+        self._receipts: "OrderedDict[str, Receipt]" = OrderedDict()
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+
+    async def add(self, sender: str, recipient: str, data: Dict, idempotency_key: Optional[str] = None) -> Dict[str, Any]:
+        """Queue a transaction and return its pending receipt"""
+        return (await self.add_many([(sender, recipient, data, idempotency_key)]))[0]
+
+    async def add_many(self, items: List[Tuple[str, str, Dict, Optional[str]]]) -> List[Dict[str, Any]]:
+        """
+        Queue a batch of (sender, recipient, data, idempotency_key) under a single lock acquisition.
+        A key that is already pending or recently sealed gets the existing receipt instead of a
+        duplicate transaction. With a write-ahead log the receipts are returned only once the batch is durable.
+        """
+        now = time()
+        receipts: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        txs, claimed = [], []
+        with self._cond:
+            for position, (sender, recipient, data, key) in enumerate(items):
+                tx_id = idempotent_tx_id(sender, key) if key else uuid4().hex
+                if key:
+                    existing = self._receipt_locked(tx_id)
+                    if existing is not None and existing["status"] != "DROPPED":
+                        receipts[position] = existing
+                        continue
+                    # Claim the id now, so a concurrent retry sees it as pending while we write the log
+                    self._pending_ids.add(tx_id)
+                    claimed.append(tx_id)
+                txs.append((position, {
+                    'tx_id': tx_id,
+                    'sender': sender,
+                    'recipient': recipient,
+                    'data': data, # Voter Data Hash, ID, Event Type
+                    'timestamp': now
+                }))
+        if self.wal is not None and txs:
+            try:
+                await asyncio.wrap_future(self.wal.append([tx for _, tx in txs]))
+            except BaseException:
+                with self._cond:
+                    self._pending_ids.difference_update(claimed)
+                raise
+        for (position, _), receipt in zip(txs, self.admit([tx for _, tx in txs])):
+            receipts[position] = receipt
+        return receipts
+
+    def admit(self, txs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Queue already-built transactions (new, or recovered from the write-ahead log)"""
+        accepted_at = monotonic()
+        with self._cond:
+            for tx in txs:
+                self._pending.append((accepted_at, tx))
+                self._pending_ids.add(tx['tx_id'])
+                self._receipts.pop(tx['tx_id'], None)  # Re-sent after a reset dropped it
+            self._cond.notify_all()
+        return [self._pending_receipt(tx['tx_id']) for tx in txs]
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def take_batch(self, stop: threading.Event, interrupt: Callable[[], bool] = None) -> List[Dict[str, Any]]:
+        """Block until max-transactions or max-latency is reached, then drain a batch"""
+        with self._cond:
+            while not stop.is_set():
+                if interrupt is not None and interrupt():
+                    return []
+                if len(self._pending) >= self.max_block_txs:
+                    break
+                if self._pending:
+                    remaining = self.max_latency - (monotonic() - self._pending[0][0])
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                else:
+                    self._cond.wait(0.5)
+            count = min(len(self._pending), self.max_block_txs)
+            return [self._pending.popleft()[1] for _ in range(count)]
+
+    def requeue(self, transactions: List[Dict[str, Any]]):
+        """
+        Put a batch that failed to seal (or was orphaned by a reorg) back at the head of the queue.
+        Orphaned transactions were released from the write-ahead log when first sealed, so they
+        are logged again, and made durable, before they are queued.
+        """
+        for tx in transactions:
+            tx.setdefault('tx_id', uuid4().hex)  # Blocks sealed before tx ids existed
+        if self.wal is not None:
+            unlogged = [tx for tx in transactions if not self.wal.holds(tx['tx_id'])]
+            if unlogged:
+                try:
+                    self.wal.append(unlogged).result()
+                except Exception as e:
+                    print(f"[WAL] Could not log {len(unlogged)} re-queued transaction(s): {e}")
+        with self._cond:
+            now = monotonic()
+            for tx in reversed(transactions):
+                self._pending.appendleft((now, tx))
+                self._pending_ids.add(tx['tx_id'])
+                self._receipts.pop(tx['tx_id'], None)
+            self._cond.notify_all()
+
+    def wake(self):
+        with self._cond:
+            self._cond.notify_all()
+
+    def confirm(self, transactions: List[Dict[str, Any]], block: Dict[str, Any], block_hash: str):
+        """Record receipts for a sealed batch and wake anyone waiting on them"""
+        with self._cond:
+            for tx in transactions:
+                self._pending_ids.discard(tx['tx_id'])
+                receipt = Receipt(tx['tx_id'], "CONFIRMED", "Transaction added and Block Mined", block['index'], block_hash)
+                self._receipts[tx['tx_id']] = receipt
+                waiters = self._waiters.pop(tx['tx_id'], None)
+                if waiters:
+                    response = receipt.to_dict()
+                    for future in waiters:
+                        future.get_loop().call_soon_threadsafe(_resolve, future, response)
+            while len(self._receipts) > self.receipt_cache_size:
+                self._receipts.popitem(last=False)
+        if self.wal is not None:
+            self.wal.release([tx['tx_id'] for tx in transactions])
+
+    def clear(self):
+        """
+        Drop everything (used by /reset). Transactions that were not sealed keep a DROPPED
+        receipt, so waiters and later polls are told instead of seeing PENDING or nothing;
+        re-sending one with its idempotency key queues it again.
+        """
+        with self._cond:
+            dropped = self._pending_ids | self._waiters.keys()
+            self._receipts.clear()
+            for tx_id in dropped:
+                self._receipts[tx_id] = Receipt(tx_id, "DROPPED", "Chain was reset before this transaction was sealed")
+            for tx_id, futures in self._waiters.items():
+                receipt = self._receipts[tx_id].to_dict()
+                for future in futures:
+                    future.get_loop().call_soon_threadsafe(_resolve, future, receipt)
+            self._waiters.clear()
+            self._pending.clear()
+            self._pending_ids.clear()
+            while len(self._receipts) > self.receipt_cache_size:
+                self._receipts.popitem(last=False)
+        if self.wal is not None:
+            self.wal.clear()
+
+    def receipt(self, tx_id: str) -> Optional[Dict[str, Any]]:
+        with self._cond:
+            return self._receipt_locked(tx_id)
+
+    def _receipt_locked(self, tx_id: str) -> Optional[Dict[str, Any]]:
+        if tx_id in self._receipts:
+            return self._receipts[tx_id].to_dict()
+        if tx_id in self._pending_ids:
+            return self._pending_receipt(tx_id)
+        return None
+
+    async def wait_for(self, tx_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """Long-poll until the transaction is sealed or the timeout expires"""
+        future = asyncio.get_running_loop().create_future()
+        with self._cond:
+            if tx_id in self._receipts:
+                return self._receipts[tx_id].to_dict()
+            if tx_id not in self._pending_ids:
+                return None
+            self._waiters.setdefault(tx_id, []).append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            with self._cond:
+                waiters = self._waiters.get(tx_id, [])
+                if future in waiters:
+                    waiters.remove(future)
+                if not waiters:
+                    self._waiters.pop(tx_id, None)
+            return self.receipt(tx_id)
+
+    @staticmethod
+    def _pending_receipt(tx_id: str) -> Dict[str, Any]:
+        return {
+            "message": "Transaction accepted into mempool",
+            "tx_id": tx_id,
+            "status": "PENDING",
+            "block_index": None,
+            "transaction_hash": None,
+        }
+
+def _resolve(future: asyncio.Future, receipt: Dict[str, Any]):
+    if not future.done():
+        future.set_result(receipt)
@@ -0,0 +1,59 @@
+import hashlib
+from typing import Dict, List
+
+# Domain-separated nodes: leaves and interior nodes can never be confused.
+# An odd node at the end of a level is promoted unchanged (no duplication).
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+EMPTY_ROOT = hashlib.sha256(b"").hexdigest()
+
+def leaf_node(tx_hash: str) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(tx_hash)).digest()
+
+def parent_node(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+def _next_level(level: List[bytes]) -> List[bytes]:
+    parents = [parent_node(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        parents.append(level[-1])
+    return parents
+
+def merkle_root(tx_hashes: List[str]) -> str:
+    """Merkle root over an ordered list of transaction hashes"""
+    if not tx_hashes:
+        return EMPTY_ROOT
+    level = [leaf_node(h) for h in tx_hashes]
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0].hex()
+
+def merkle_levels(tx_hashes: List[str]) -> List[List[bytes]]:
+    """Every level of the tree, leaves first; build once to cut many paths from one block"""
+    levels = [[leaf_node(h) for h in tx_hashes]]
+    while len(levels[-1]) > 1:
+        levels.append(_next_level(levels[-1]))
+    return levels
+
+def path_from_levels(levels: List[List[bytes]], position: int) -> List[Dict[str, str]]:
+    path = []
+    for level in levels[:-1]:
+        sibling = position ^ 1
+        if sibling < len(level):
+            path.append({
+                "hash": level[sibling].hex(),
+                "position": "left" if sibling < position else "right",
+            })
+        position //= 2
+    return path
+
+def merkle_path(tx_hashes: List[str], position: int) -> List[Dict[str, str]]:
+    """Authentication path (sibling hashes, leaf to root) for the leaf at `position`"""
+    return path_from_levels(merkle_levels(tx_hashes), position)
+
+def verify_path(tx_hash: str, path: List[Dict[str, str]], root: str) -> bool:
+    node = leaf_node(tx_hash)
+    for step in path:
+        sibling = bytes.fromhex(step["hash"])
+        node = parent_node(sibling, node) if step["position"] == "left" else parent_node(node, sibling)
+    return node.hex() == root
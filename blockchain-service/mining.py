@@ -0,0 +1,113 @@
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Optional, Tuple
+
+# hash < LEGACY_TARGET  <=>  hex digest starts with "0000" (the original rule)
+LEGACY_LEADING_ZEROS = 4
+
+def target_for(leading_zeros: int) -> int:
+    """Target equivalent to `leading_zeros` leading hex zeroes in the SHA-256 digest"""
+    return 1 << (256 - 4 * leading_zeros)
+
+LEGACY_TARGET = target_for(LEGACY_LEADING_ZEROS)
+
+def proof_hash(last_proof: int, proof: int) -> int:
+    guess = f'{last_proof}{proof}'.encode()
+    return int.from_bytes(hashlib.sha256(guess).digest(), "big")
+
+def meets_target(last_proof: int, proof: int, target: int = LEGACY_TARGET) -> bool:
+    return proof_hash(last_proof, proof) < target
+
+# --- Worker side (runs inside the process pool) ---
+_cancel = None
+CANCEL_CHECK_INTERVAL = 4096
+
+def _init_worker(cancel_event):
+    global _cancel
+    _cancel = cancel_event
+
+def _search(last_proof: int, start: int, count: int, target: int) -> Tuple[Optional[int], int]:
+    """Scan nonces [start, start + count); returns (proof or None, hashes tried)"""
+    prefix = str(last_proof).encode()
+    sha256 = hashlib.sha256
+    for i, proof in enumerate(range(start, start + count)):
+        if i % CANCEL_CHECK_INTERVAL == 0 and _cancel is not None and _cancel.is_set():
+            return None, i
+        digest = sha256(prefix + str(proof).encode()).digest()
+        if int.from_bytes(digest, "big") < target:
+            return proof, i + 1
+    return None, count
+
+class MiningEngine:
+    """Proof-of-work search that splits the nonce space across a process pool"""
+
+    def __init__(self, workers: int = 1, leading_zeros: int = LEGACY_LEADING_ZEROS,
+                 target: Optional[int] = None, chunk_size: int = 50000):
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.target = target if target is not None else target_for(leading_zeros)
+        self.chunk_size = chunk_size
+        self.last_attempts = 0  # Hashes tried for the most recent proof (for benchmarks)
+        self._pool = None
+        self._cancel = None
+
+    def proof_of_work(self, last_proof: int) -> int:
+        if self.workers == 1:
+            proof, self.last_attempts = self._serial(last_proof)
+            return proof
+        return self._parallel(last_proof)
+
+    def _serial(self, last_proof: int) -> Tuple[int, int]:
+        start = 0
+        while True:
+            proof, tried = _search(last_proof, start, self.chunk_size, self.target)
+            if proof is not None:
+                return proof, start + tried
+            start += self.chunk_size
+
+    def _parallel(self, last_proof: int) -> int:
+        pool = self._ensure_pool()
+        self._cancel.clear()
+        self.last_attempts = 0
+        next_start = 0
+        in_flight = set()
+        try:
+            while True:
+                # Keep two chunks queued per worker so no core idles between chunks
+                while len(in_flight) < self.workers * 2:
+                    in_flight.add(pool.submit(_search, last_proof, next_start, self.chunk_size, self.target))
+                    next_start += self.chunk_size
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    proof, tried = future.result()
+                    self.last_attempts += tried
+                    if proof is not None:
+                        return proof
+        finally:
+            # Early cancellation: stop every other worker on the first valid proof
+            self._cancel.set()
+            for future in in_flight:
+                future.cancel()
+            for future in wait(in_flight).done:
+                if not future.cancelled():
+                    self.last_attempts += future.result()[1]
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: the node is multi-threaded, so forking workers is unsafe
+            ctx = multiprocessing.get_context("spawn")
+            self._cancel = ctx.Event()
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=ctx,
+                initializer=_init_worker,
+                initargs=(self._cancel,),
+            )
+        return self._pool
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._cancel.set()
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,85 @@
+import sys
+from typing import Any, Dict, Optional, Tuple
+
+# Compact in-memory records for the per-transaction state the node keeps in RAM.
+# Blocks themselves live in the block store; these hold what the indexes,
+# materialized view and receipt cache need, and become dicts only at the API.
+
+# (block index, tx offset) packed into one int: 24 bits of offset, the rest block index
+LOCATION_SHIFT = 24
+OFFSET_MASK = (1 << LOCATION_SHIFT) - 1
+
+def pack_location(block_index: int, offset: int) -> int:
+    return (block_index << LOCATION_SHIFT) | offset
+
+def unpack_location(location: int) -> Tuple[int, int]:
+    return location >> LOCATION_SHIFT, location & OFFSET_MASK
+
+def intern(value: Optional[str]) -> Optional[str]:
+    """Share one copy of low-cardinality strings (state ids, event types, statuses)"""
+    return sys.intern(value) if type(value) is str else value
+
+def pack_hex(value: Any) -> Any:
+    """Lowercase hex digests are kept as bytes (half the size); anything else as given"""
+    if type(value) is str and len(value) % 2 == 0 and value == value.lower():
+        try:
+            return bytes.fromhex(value)
+        except ValueError:
+            pass
+    return value
+
+def unpack_hex(value: Any) -> Any:
+    return value.hex() if type(value) is bytes else value
+
+class VoterState:
+    """Latest chain state of one voter (see LatestStateView)"""
+    __slots__ = ('voter_id', 'event_type', 'owner_state', 'data_hash', 'tx_id', 'location', 'timestamp')
+
+    def __init__(self, voter_id: str, event_type: Optional[str], owner_state: Optional[str], data_hash: Any,
+                 tx_id: Optional[str], block_index: int, tx_offset: int, timestamp: Optional[float]):
+        self.voter_id = voter_id
+        self.event_type = intern(event_type)
+        self.owner_state = intern(owner_state)
+        self.data_hash = pack_hex(data_hash)
+        self.tx_id = tx_id
+        self.location = pack_location(block_index, tx_offset)
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "VoterState":
+        return cls(data['voter_id'], data.get('event_type'), data.get('owner_state'), data.get('data_hash'),
+                   data.get('tx_id'), data['block_index'], data['tx_offset'], data.get('timestamp'))
+
+    def to_dict(self) -> Dict[str, Any]:
+        block_index, tx_offset = unpack_location(self.location)
+        return {
+            "voter_id": self.voter_id,
+            "event_type": self.event_type,
+            "owner_state": self.owner_state,
+            "data_hash": unpack_hex(self.data_hash),
+            "tx_id": self.tx_id,
+            "block_index": block_index,
+            "tx_offset": tx_offset,
+            "timestamp": self.timestamp,
+        }
+
+class Receipt:
+    """A sealed (or dropped) transaction's receipt in the mempool's bounded cache"""
+    __slots__ = ('tx_id', 'status', 'message', 'block_index', 'transaction_hash')
+
+    def __init__(self, tx_id: str, status: str, message: str,
+                 block_index: Optional[int] = None, transaction_hash: Optional[str] = None):
+        self.tx_id = tx_id
+        self.status = intern(status)
+        self.message = intern(message)
+        self.block_index = block_index
+        self.transaction_hash = transaction_hash  # One shared str per block
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "message": self.message,
+            "tx_id": self.tx_id,
+            "status": self.status,
+            "block_index": self.block_index,
+            "transaction_hash": self.transaction_hash,
+        }
@@ -0,0 +1,186 @@
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import requests
+from blockchain import Blockchain
+from encoding import verify_block
+from mempool import Mempool
+from sequencer import Sequencer
+
+class PeerReplicator(threading.Thread):
+    """
+    Keeps this node in step with one peer. New blocks arrive over the peer's
+    /blocks/feed and are appended when they extend our head; anything else
+    (a gap, a fork, a missed event) falls back to pulling /chain/since/{index}
+    and applying the fork-choice rule in Blockchain.outranks. Every chain
+    change still goes through the sequencer, so replication never races the
+    local writer.
+    """
+
+    def __init__(self, peer: str, blockchain: Blockchain, sequencer: Sequencer, mempool: Mempool,
+                 poll_interval: float = 5.0, page_size: int = 500, read_timeout: float = 60.0):
+        super().__init__(name=f"replicator-{peer}", daemon=True)
+        self.peer = peer.rstrip('/')
+        self.blockchain = blockchain
+        self.sequencer = sequencer
+        self.mempool = mempool
+        self.poll_interval = poll_interval
+        self.page_size = page_size
+        self.read_timeout = read_timeout
+        self.session = requests.Session()
+        self._stop_event = threading.Event()
+        self.status: Dict[str, Any] = {"peer": self.peer, "connected": False, "peer_length": None, "error": None}
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                self.sync()
+                self._follow_feed()
+            except requests.RequestException as e:
+                self.status.update(connected=False, error=str(e))
+            except Exception as e:
+                self.status.update(connected=False, error=str(e))
+                print(f"[REPLICATION] Sync with {self.peer} failed: {e}")
+            self._stop_event.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.session.close()
+
+    # --- Push: the peer's block feed ---
+
+    def _follow_feed(self):
+        head = self.blockchain.last_block
+        params = {"from_index": head['index'] + 1, "last_hash": self.blockchain.hash(head)}
+        with self.session.get(f"{self.peer}/blocks/feed", params=params, stream=True,
+                              timeout=(5, self.read_timeout)) as response:
+            response.raise_for_status()
+            self.status.update(connected=True, error=None)
+            event, data = None, []
+            for line in response.iter_lines(decode_unicode=True):
+                if self._stop_event.is_set():
+                    return
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:"):
+                    data.append(line[5:].strip())
+                elif not line and event:
+                    if event == "block":
+                        self._on_block(json.loads("\n".join(data)))
+                    elif event == "reset":
+                        # The peer reorganised: settle fork choice once, then resume from our own head
+                        # rather than following its replay block by block
+                        self.sync()
+                        return
+                    elif event == "head":
+                        self.status["peer_length"] = json.loads("\n".join(data))["length"]
+                    event, data = None, []
+
+    def _on_block(self, block: Dict[str, Any]):
+        head = self.blockchain.last_block
+        if block['index'] == head['index'] + 1 and block['previous_hash'] == self.blockchain.hash(head):
+            # Fast path: the block extends our head
+            if self._validate(head, [block]):
+                self._adopt(head['index'], [block])
+            return
+        # A gap or a different branch: let fork choice decide
+        self.sync()
+
+    # --- Pull: /chain/since/{index} and fork resolution ---
+
+    def sync(self):
+        """Pull the peer's head and switch to its chain if it outranks ours"""
+        peer_length, peer_head, _ = self._since(self.blockchain.length, 0)
+        self.status["peer_length"] = peer_length
+        if not Blockchain.outranks(peer_length, peer_head, self.blockchain.length, self.blockchain.hash(self.blockchain.last_block)):
+            return
+        fork = self._find_fork(min(peer_length, self.blockchain.length))
+        anchor = self.blockchain.get_block(fork) if fork else None
+        branch: List[Dict[str, Any]] = []
+        while fork + len(branch) < peer_length:
+            _, _, blocks = self._since(fork + len(branch), self.page_size)
+            if not blocks:
+                break
+            branch.extend(blocks)
+            if fork == self.blockchain.length and len(branch) >= self.page_size:
+                # Plain catch-up: apply page by page instead of buffering the whole tail
+                if not self._validate(anchor, branch) or not self._adopt(fork, branch):
+                    return
+                fork, anchor, branch = fork + len(branch), branch[-1], []
+        if branch and self._validate(anchor, branch):
+            self._adopt(fork, branch)
+
+    def _since(self, index: int, limit: int) -> Tuple[int, str, List[Dict[str, Any]]]:
+        response = self.session.get(f"{self.peer}/chain/since/{index}", params={"limit": limit}, timeout=30)
+        response.raise_for_status()
+        body = response.json()
+        return body["length"], body["head_hash"], body["blocks"]
+
+    def _peer_hash(self, index: int) -> Optional[str]:
+        _, _, blocks = self._since(index - 1, 1)
+        return self.blockchain.hash(blocks[0]) if blocks else None
+
+    def _find_fork(self, upper: int) -> int:
+        """Highest block index both chains share (0 if even the genesis blocks differ)"""
+        def agrees(index: int) -> bool:
+            return index == 0 or self._peer_hash(index) == self.blockchain.hash(self.blockchain.get_block(index))
+        # Gallop back from the top until the chains agree, then binary search the gap
+        good, bad, step = upper, upper + 1, 1
+        while good > 0 and not agrees(good):
+            good, bad, step = max(good - step, 0), good, step * 2
+        low, high = good, bad - 1
+        while low < high:
+            mid = (low + high + 1) // 2
+            if agrees(mid):
+                low = mid
+            else:
+                high = mid - 1
+        return low
+
+    def _validate(self, anchor: Optional[Dict[str, Any]], blocks: List[Dict[str, Any]]) -> bool:
+        """Full check of a peer's branch off the writer thread: contents, links and consensus"""
+        previous = anchor
+        previous_hash = self.blockchain.hash(anchor) if anchor else None
+        for block in blocks:
+            block_hash = verify_block(block)
+            if block_hash is None:
+                return self._reject(block, "contents do not match its hash")
+            if previous is not None and (block['index'] != previous['index'] + 1 or block['previous_hash'] != previous_hash):
+                return self._reject(block, "does not link to its parent")
+            if not self.blockchain.consensus.verify(block, previous):
+                return self._reject(block, "fails consensus")
+            previous, previous_hash = block, block_hash
+        return True
+
+    def _reject(self, block: Dict[str, Any], reason: str) -> bool:
+        self.status["error"] = f"Rejected block #{block.get('index')} from {self.peer}: {reason}"
+        print(f"[REPLICATION] {self.status['error']}")
+        return False
+
+    def _adopt(self, fork: int, blocks: List[Dict[str, Any]]) -> bool:
+        orphaned = self.sequencer.submit(lambda chain: chain.adopt(fork, blocks)).result()
+        if orphaned is None:
+            return False
+        if orphaned:
+            # Transactions from our abandoned branch go back to the mempool to be sealed again
+            self.mempool.requeue(orphaned)
+        print(f"[REPLICATION] Adopted {len(blocks)} block(s) from {self.peer} after #{fork}"
+              + (f", re-queued {len(orphaned)} orphaned transaction(s)" if orphaned else ""))
+        return True
+
+class Replicator:
+    """One PeerReplicator per configured peer"""
+
+    def __init__(self, peers: List[str], blockchain: Blockchain, sequencer: Sequencer, mempool: Mempool, **options):
+        self.peers = [PeerReplicator(peer, blockchain, sequencer, mempool, **options) for peer in peers]
+
+    def start(self):
+        for peer in self.peers:
+            peer.start()
+
+    def stop(self):
+        for peer in self.peers:
+            peer.stop()
+
+    def status(self) -> List[Dict[str, Any]]:
+        return [dict(peer.status) for peer in self.peers]
@@ -0,0 +1,73 @@
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+from blockchain import Blockchain
+from mempool import Mempool
+
+class Sequencer(threading.Thread):
+    """
+    The single writer. Every chain mutation (sealing mempool batches, /reset)
+    runs on this thread in queue order, so blocks can never fork on a stale
+    last_block. Readers use Blockchain.snapshot and never take a lock.
+    """
+
+    def __init__(self, blockchain: Blockchain, mempool: Mempool, on_change: Optional[Callable[[], None]] = None):
+        super().__init__(name="chain-sequencer", daemon=True)
+        self.blockchain = blockchain
+        self.mempool = mempool
+        # Called on this thread after every block or command (e.g. to wake feed subscribers)
+        self.on_change = on_change
+        self._commands: "queue.Queue[tuple]" = queue.Queue()
+        self._stop_event = threading.Event()
+
+    def submit(self, command: Callable[[Blockchain], Any]) -> Future:
+        """Queue a mutation to run on the writer thread; resolves with its result"""
+        future = Future()
+        self._commands.put((command, future))
+        self.mempool.wake()
+        return future
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self._run_commands()
+            batch = self.mempool.take_batch(self._stop_event, interrupt=self._has_commands)
+            if batch:
+                self._seal(batch)
+
+    def _has_commands(self) -> bool:
+        return not self._commands.empty()
+
+    def _run_commands(self):
+        while True:
+            try:
+                command, future = self._commands.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                future.set_result(command(self.blockchain))
+            except Exception as e:
+                future.set_exception(e)
+            self._changed()
+
+    def _seal(self, batch):
+        try:
+            block = self.blockchain.seal(batch)
+        except Exception as e:
+            print(f"[SEQUENCER] Sealing failed, re-queueing {len(batch)} transaction(s): {e}")
+            self.mempool.requeue(batch)
+            self._stop_event.wait(1)
+            return
+        block_hash = self.blockchain.hash(block)
+        self.mempool.confirm(batch, block, block_hash)
+        self._changed()
+        print(f"\n[SEQUENCER] Mined Block #{block['index']} with {len(batch)} transaction(s)")
+        print(f"Block Hash: {block_hash}\n")
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def stop(self):
+        self._stop_event.set()
+        self.mempool.wake()
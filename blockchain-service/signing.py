@@ -0,0 +1,80 @@
+"""
+Ed25519 signing for authority-signed chain artefacts (PoA blocks, checkpoints).
+`cryptography` is optional: it is only imported when a signer or verifier is built.
+
+Generate a key pair for a state node:
+    python -m signing
+"""
+from typing import Dict, Optional, Tuple
+
+def _ed25519():
+    try:
+        from cryptography.hazmat.primitives.asymmetric import ed25519
+    except ImportError as e:
+        raise RuntimeError("Ed25519 signing requires the 'cryptography' package (pip install cryptography)") from e
+    return ed25519
+
+class Signer:
+    """An authority's private key, identified by `key_id` (e.g. the state id)"""
+
+    def __init__(self, key_id: str, private_key_hex: str):
+        self.key_id = key_id
+        self._key = _ed25519().Ed25519PrivateKey.from_private_bytes(bytes.fromhex(private_key_hex))
+
+    @property
+    def public_key_hex(self) -> str:
+        from cryptography.hazmat.primitives import serialization
+        raw = self._key.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+        return raw.hex()
+
+    def sign(self, message: bytes) -> str:
+        return self._key.sign(message).hex()
+
+class Verifier:
+    """Public keys of every authorised signer: key_id -> hex-encoded Ed25519 public key"""
+
+    def __init__(self, authorities: Dict[str, str]):
+        ed25519 = _ed25519()
+        self.authorities = dict(authorities)  # Hex form, e.g. to hand to audit worker processes
+        self._keys = {key_id: ed25519.Ed25519PublicKey.from_public_bytes(bytes.fromhex(public_hex))
+                      for key_id, public_hex in authorities.items()}
+
+    def __contains__(self, key_id: str) -> bool:
+        return key_id in self._keys
+
+    def add(self, key_id: str, public_key_hex: str):
+        self.authorities[key_id] = public_key_hex
+        self._keys[key_id] = _ed25519().Ed25519PublicKey.from_public_bytes(bytes.fromhex(public_key_hex))
+
+    def verify(self, key_id: str, message: bytes, signature_hex: str) -> bool:
+        from cryptography.exceptions import InvalidSignature
+        key = self._keys.get(key_id)
+        if key is None:
+            return False
+        try:
+            key.verify(bytes.fromhex(signature_hex), message)
+        except (InvalidSignature, ValueError):
+            return False
+        return True
+
+def load_keys(signer_id: str, private_key_hex: str, authorities: Dict[str, str]) -> Tuple[Optional[Signer], Optional[Verifier]]:
+    """This node's signer (if it has a key) and a verifier for every authority, including itself"""
+    signer = Signer(signer_id, private_key_hex) if signer_id and private_key_hex else None
+    verifier = Verifier(authorities) if authorities or signer else None
+    if signer is not None and signer.key_id not in verifier:
+        verifier.add(signer.key_id, signer.public_key_hex)
+    return signer, verifier
+
+def generate_key_pair() -> Dict[str, str]:
+    from cryptography.hazmat.primitives import serialization
+    key = _ed25519().Ed25519PrivateKey.generate()
+    return {
+        "private_key": key.private_bytes(serialization.Encoding.Raw, serialization.PrivateFormat.Raw,
+                                         serialization.NoEncryption()).hex(),
+        "public_key": key.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw).hex(),
+    }
+
+if __name__ == "__main__":
+    pair = generate_key_pair()
+    print(f"POA_PRIVATE_KEY={pair['private_key']}")
+    print(f"public key (add to POA_AUTHORITIES on every node): {pair['public_key']}")
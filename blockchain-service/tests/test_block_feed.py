@@ -0,0 +1,74 @@
+"""
+The block feed across a reorg: a subscriber is told the fork point and the
+stream carries on right after it, instead of replaying the chain from genesis.
+"""
+import asyncio
+import json
+from block_store import BlockStore
+from blockchain import Blockchain
+from consensus import ProofOfWork
+from feed import BlockFeed
+from mining import MiningEngine
+
+def make_chain(path):
+    return Blockchain(BlockStore(str(path), fsync=False), ProofOfWork(MiningEngine(leading_zeros=2)))
+
+def register(voter_id):
+    return {"tx_id": voter_id.lower(), "sender": "TEST", "recipient": "CHAIN",
+            "data": {"voter_id": voter_id, "state_id": "TS", "event_type": "REGISTER"}}
+
+def parse(frame):
+    fields = dict(line.split(": ", 1) for line in frame.strip().splitlines())
+    return fields["event"], json.loads(fields["data"])
+
+async def events_until_head(stream):
+    events = []
+    while not events or events[-1][0] != "head":
+        events.append(parse(await asyncio.wait_for(stream.__anext__(), 5)))
+    return events
+
+def test_reorg_resumes_from_the_fork_point(tmp_path):
+    peer, local = make_chain(tmp_path / "peer"), make_chain(tmp_path / "local")
+    peer.seal([register("SHARED")])
+    local.adopt(0, list(peer.iter_blocks()))
+    local.seal([register("LOCAL")])
+    peer.seal([register("PEER-1")])
+    peer.seal([register("PEER-2")])
+
+    async def follow():
+        feed = BlockFeed(local, keepalive=60)
+        async def connected():
+            return False
+        stream = feed.stream(1, connected)
+        first = await events_until_head(stream)
+        local.adopt(2, list(peer.iter_blocks(3)))
+        feed.notify()
+        second = await events_until_head(stream)
+        await stream.aclose()
+        return first, second
+
+    first, second = asyncio.run(follow())
+    assert [(event, data.get("index")) for event, data in first] == [("block", 1), ("block", 2), ("block", 3), ("head", None)]
+    assert second[0] == ("reset", {"fork": 2, "hash": local.hash(local.get_block(2))})
+    assert [data["index"] for event, data in second if event == "block"] == [3, 4]
+    assert second[1][1]["transactions"][0]["tx_id"] == "peer-1"
+
+def test_reconnecting_with_a_stale_hash_gets_a_reset(tmp_path):
+    chain = make_chain(tmp_path / "chain")
+    chain.seal([register("V1")])
+    chain.seal([register("V2")])
+
+    async def reconnect(last_hash):
+        async def connected():
+            return False
+        stream = BlockFeed(chain, keepalive=60).stream(4, connected, last_hash)
+        events = await events_until_head(stream)
+        await stream.aclose()
+        return events
+
+    # Same head the subscriber saw: nothing new, straight to `head`
+    assert [event for event, _ in asyncio.run(reconnect(chain.hash(chain.last_block)))] == ["head"]
+    # Its block 3 is not ours (a reorg while it was away): reset, then the chain from genesis
+    events = asyncio.run(reconnect("0" * 64))
+    assert events[0] == ("reset", {"fork": 0, "hash": None})
+    assert [data["index"] for event, data in events if event == "block"] == [1, 2, 3]
@@ -0,0 +1,55 @@
+"""Archiving a sealed segment while it is being read, and releasing the replaced segment's files"""
+import os
+import time
+import block_store
+from block_store import BlockStore, iter_records
+
+def block(index):
+    return {"index": index, "transactions": [{"tx_id": f"tx{index}", "data": {"voter_id": f"V{index}"}}]}
+
+def open_fds(path):
+    return sum(1 for fd in os.listdir("/proc/self/fd") if os.path.realpath(f"/proc/self/fd/{fd}").startswith(path))
+
+def test_archive_closes_replaced_segment_after_readers_move_on(tmp_path, monkeypatch):
+    monkeypatch.setattr(block_store, "RETIRE_GRACE_SECONDS", 0.2)
+    store = BlockStore(str(tmp_path), segment_max_bytes=2048, fsync=False)
+    for index in range(1, 61):
+        store.append(block(index))
+    assert len(store.segments) > 2
+    first = store.segments[0]
+
+    reader = store.iter_range(0)
+    assert next(reader)["index"] == 1
+    assert store.archive(first.base, "zlib") is not None
+    assert first.replaced and store.segments[0].archived
+
+    time.sleep(0.5)
+    # The replaced segment is closed, and the stream carried on from the archived copy
+    assert first._log.closed and first._idx.closed
+    assert [b["index"] for b in reader] == list(range(2, 61))
+    assert not os.path.exists(first.log_path)
+    store.close()
+    assert open_fds(str(tmp_path)) == 0
+
+def test_raw_ranges_read_on_from_the_archive_after_retire(tmp_path, monkeypatch):
+    monkeypatch.setattr(block_store, "RETIRE_GRACE_SECONDS", 0.05)
+    store = BlockStore(str(tmp_path), segment_max_bytes=2048, fsync=False)
+    for index in range(1, 61):
+        store.append(block(index))
+    first = store.segments[0]
+
+    read_offset = first._read_offset
+    def archive_mid_scan(local):
+        # The archiver swaps the segment out, and its grace period runs out, right after this read
+        offset = read_offset(local)
+        if local == 3 and not first.replaced:
+            assert store.archive(first.base, "zlib") is not None
+            time.sleep(0.3)
+            assert first._idx.closed
+        return offset
+    monkeypatch.setattr(first, "_read_offset", archive_mid_scan)
+
+    chunks = list(store.raw_ranges(0, len(store), max_bytes=256))
+    assert first.replaced
+    assert [b["index"] for _, count, data in chunks for b in iter_records(data, count)] == list(range(1, 61))
+    store.close()
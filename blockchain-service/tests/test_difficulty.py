@@ -0,0 +1,42 @@
+"""
+Raising the PoW difficulty on an existing chain: blocks mined at the old
+target still verify (integrity, restart, a peer's history), new blocks are
+mined at the new one, and blocks easier than the acceptance floor are refused.
+"""
+from block_store import BlockStore
+from blockchain import Blockchain
+from consensus import ProofOfWork
+from mining import LEGACY_LEADING_ZEROS, MiningEngine, target_for
+
+def register(voter_id):
+    return {"tx_id": voter_id.lower(), "sender": "TEST", "recipient": "CHAIN",
+            "data": {"voter_id": voter_id, "state_id": "TS", "event_type": "REGISTER"}}
+
+def open_chain(path, leading_zeros, **options):
+    return Blockchain(BlockStore(str(path), fsync=False), ProofOfWork(MiningEngine(leading_zeros=leading_zeros), **options))
+
+def test_raising_difficulty_keeps_earlier_blocks_valid(tmp_path):
+    chain = open_chain(tmp_path / "chain", LEGACY_LEADING_ZEROS)
+    chain.seal([register("OLD-1")])
+    chain.seal([register("OLD-2")])
+    chain.store.close()
+
+    # Restart with a harder mining target
+    chain = open_chain(tmp_path / "chain", LEGACY_LEADING_ZEROS + 1)
+    assert chain.check_integrity(full=True)
+    block = chain.seal([register("NEW")])
+    assert int(block["target"], 16) == target_for(LEGACY_LEADING_ZEROS + 1)
+    assert chain.check_integrity(full=True)
+
+    # A peer at the new difficulty accepts the whole history, old blocks included
+    peer = open_chain(tmp_path / "peer", LEGACY_LEADING_ZEROS + 1)
+    assert peer.adopt(0, list(chain.iter_blocks())) == []
+    assert peer.length == chain.length and peer.check_integrity(full=True)
+
+def test_blocks_easier_than_the_floor_are_refused(tmp_path):
+    easy = open_chain(tmp_path / "easy", 2)
+    easy.seal([register("EASY")])
+    strict = open_chain(tmp_path / "strict", 3, max_target=target_for(3))
+    previous, block = list(easy.iter_blocks(1, 2))
+    assert easy.consensus.verify(block, previous)
+    assert not strict.consensus.verify(block, previous)
@@ -0,0 +1,102 @@
+"""
+Fork resolution across real nodes started through local_cluster: a node that
+sealed blocks on its own while its peer was down adopts the peer's longer
+chain when it comes back, re-seals its orphaned transactions, and its indexes
+answer for every voter on the adopted branch.
+"""
+import socket
+import subprocess
+import time
+import pytest
+
+pytest.importorskip("uvicorn")
+requests = pytest.importorskip("requests")
+from local_cluster import start_node
+
+NODE_ENV = {"POW_LEADING_ZEROS": "2", "MEMPOOL_MAX_LATENCY_MS": "20", "CHECKPOINT_EVERY_BLOCKS": "0"}
+
+def free_ports(count):
+    sockets = [socket.socket() for _ in range(count)]
+    try:
+        for sock in sockets:
+            sock.bind(("127.0.0.1", 0))
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+def wait_until(condition, timeout=60.0, interval=0.2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(interval)
+    return False
+
+def submit(url, voter_id):
+    response = requests.post(f"{url}/transactions/new", params={"wait": 10}, timeout=30, json={
+        "sender": "TEST", "recipient": "CHAIN",
+        "data": {"voter_id": voter_id, "state_id": "TS", "event_type": "REGISTER"},
+    })
+    response.raise_for_status()
+    assert response.json()["status"] == "CONFIRMED"
+    return response.json()["tx_id"]
+
+def halt(process):
+    # Open /blocks/feed streams hold up a graceful shutdown
+    process.terminate()
+    try:
+        process.wait(5)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+def head(url):
+    body = requests.get(f"{url}/chain/since/0", params={"limit": 1}, timeout=10).json()
+    return body["length"], body["head_hash"]
+
+def has_state(url, voter_id):
+    return requests.get(f"{url}/state/{voter_id}", timeout=10).status_code == 200
+
+@pytest.fixture
+def cluster(tmp_path):
+    urls = [f"http://127.0.0.1:{port}" for port in free_ports(2)]
+    processes = {}
+
+    def start(n):
+        processes[n] = start_node(n, urls, str(tmp_path), poll=0.5, env=NODE_ENV)
+        assert wait_until(lambda: requests.get(f"{urls[n]}/stats", timeout=2).ok), f"node{n} did not start"
+
+    def stop(n):
+        halt(processes.pop(n))
+
+    yield urls, start, stop
+    for process in processes.values():
+        halt(process)
+
+def test_rejoining_node_adopts_longer_fork(cluster):
+    (url_a, url_b), start, stop = cluster
+
+    # node1 seals a short branch of its own while node0 is down
+    start(1)
+    orphan = submit(url_b, "VOTER-ORPHAN")
+    stop(1)
+
+    # node0 seals a longer, unrelated branch (different genesis, so the fork is at block 0)
+    start(0)
+    for n in range(3):
+        submit(url_a, f"VOTER-A{n}")
+
+    # node1 rejoins, switches to node0's chain and re-seals its orphaned transaction on top of it
+    start(1)
+    assert wait_until(lambda: all(has_state(url_b, f"VOTER-A{n}") for n in range(3)))
+    assert wait_until(lambda: requests.get(f"{url_b}/transactions/{orphan}", timeout=10).json()["status"] == "CONFIRMED")
+    assert has_state(url_b, "VOTER-ORPHAN")
+
+    # Both nodes converge on one chain holding every voter
+    assert wait_until(lambda: head(url_a) == head(url_b))
+    assert has_state(url_a, "VOTER-ORPHAN")
+    assert head(url_a)[0] >= 5
@@ -0,0 +1,36 @@
+"""
+A /reset drops whatever was not sealed yet: waiters and later polls get a
+DROPPED receipt rather than PENDING forever, and re-sending with the same
+idempotency key queues the transaction again.
+"""
+import asyncio
+import threading
+from mempool import Mempool
+
+def register(voter_id, key=None):
+    return ("TEST", "CHAIN", {"voter_id": voter_id, "state_id": "TS", "event_type": "REGISTER"}, key)
+
+def test_reset_marks_unsealed_transactions_dropped():
+    async def scenario():
+        mempool = Mempool(max_latency=0)
+        waited, polled = await mempool.add_many([register("V1"), register("V2")])
+        waiter = asyncio.ensure_future(mempool.wait_for(waited["tx_id"], 5))
+        await asyncio.sleep(0)
+        mempool.clear()
+        return mempool, await waiter, mempool.receipt(polled["tx_id"]), await mempool.wait_for(polled["tx_id"], 5)
+
+    mempool, waited, polled, late = asyncio.run(scenario())
+    assert [receipt["status"] for receipt in (waited, polled, late)] == ["DROPPED"] * 3
+    assert len(mempool) == 0
+
+def test_resending_a_dropped_key_queues_it_again():
+    mempool = Mempool(max_latency=0)
+    first = asyncio.run(mempool.add(*register("V1", "key-1")))
+    mempool.clear()
+    again = asyncio.run(mempool.add(*register("V1", "key-1")))
+    assert again["tx_id"] == first["tx_id"] and again["status"] == "PENDING"
+
+    batch = mempool.take_batch(threading.Event())
+    assert [tx["tx_id"] for tx in batch] == [first["tx_id"]]
+    mempool.confirm(batch, {"index": 1}, "hash")
+    assert mempool.receipt(first["tx_id"])["status"] == "CONFIRMED"
@@ -0,0 +1,52 @@
+"""
+Readers during a reorg: until the adopted branch is published, lookups keep
+answering from the old head, indexes, voter filter and blocks instead of
+going empty or pairing old index positions with the new branch's blocks.
+"""
+from block_store import BlockStore
+from blockchain import Blockchain
+from consensus import ProofOfWork
+from mining import MiningEngine
+
+def make_chain(path):
+    store = BlockStore(str(path), fsync=False)
+    return Blockchain(store, ProofOfWork(MiningEngine(leading_zeros=2)))
+
+def register(voter_id):
+    return {"tx_id": voter_id.lower(), "sender": "TEST", "recipient": "CHAIN",
+            "data": {"voter_id": voter_id, "state_id": "TS", "event_type": "REGISTER"}}
+
+def test_readers_keep_old_state_until_the_new_branch_is_published(tmp_path):
+    peer, local = make_chain(tmp_path / "peer"), make_chain(tmp_path / "local")
+    peer.seal([register("SHARED")])
+    assert local.adopt(0, list(peer.iter_blocks())) == []
+
+    # Diverge: the peer's branch is longer, so the local node will switch to it
+    peer.seal([register("PEER-1")])
+    peer.seal([register("PEER-2")])
+    local.seal([register("LOCAL")])
+
+    seen, reads = [], []
+    append = local.store.append
+    def observing_append(block):
+        # Mid-reorg: the store already holds part of the new branch
+        seen.append({voter_id: (local.voter_filter.might_contain(voter_id), local.state_view.get(voter_id) is not None)
+                     for voter_id in ("SHARED", "LOCAL", "PEER-1")})
+        append(block)
+        reads.append((
+            [tx["data"]["voter_id"] for tx in local.voter_history("LOCAL")],
+            local.block_of("local")["index"],
+            local.inclusion_proof("local")["tx"]["tx_id"],
+            [tx["tx_id"] for block in local.iter_blocks(2) for tx in block["transactions"]],
+        ))
+    local.store.append = observing_append
+
+    orphaned = local.adopt(2, list(peer.iter_blocks(3)))
+
+    assert [tx["tx_id"] for tx in orphaned] == ["local"]
+    assert seen and all(view == {"SHARED": (True, True), "LOCAL": (True, True), "PEER-1": (False, False)} for view in seen)
+    # Block reads go through the old snapshot's segments, so they still return the orphaned branch
+    assert reads and all(read == (["LOCAL"], 3, "local", ["shared", "local"]) for read in reads)
+    assert local.state_view.get("PEER-2") is not None and local.voter_filter.might_contain("PEER-2")
+    assert local.state_view.get("LOCAL") is None
+    assert local.length == peer.length and local.check_integrity(full=True)
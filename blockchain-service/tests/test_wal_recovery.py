@@ -0,0 +1,48 @@
+"""
+Crash recovery through the write-ahead log: transactions acknowledged but
+not yet sealed, and sealed transactions re-queued after a reorg orphaned
+their block, come back from the log after a restart.
+"""
+import asyncio
+import threading
+from mempool import Mempool
+from wal import WriteAheadLog
+
+def register(voter_id):
+    return ("TEST", "CHAIN", {"voter_id": voter_id, "state_id": "TS", "event_type": "REGISTER"}, None)
+
+def restart(directory):
+    # Crash: the old log is simply abandoned; a new one recovers from what reached the disk
+    return WriteAheadLog(str(directory), fsync=False)
+
+def test_acknowledged_transactions_survive_a_crash_before_sealing(tmp_path):
+    mempool = Mempool(wal=WriteAheadLog(str(tmp_path), fsync=False))
+    receipts = asyncio.run(mempool.add_many([register("V1"), register("V2")]))
+    assert [receipt["status"] for receipt in receipts] == ["PENDING", "PENDING"]
+
+    recovered = restart(tmp_path).recover(lambda tx_id: False)
+    assert [tx["tx_id"] for tx in recovered] == [receipt["tx_id"] for receipt in receipts]
+    assert [tx["data"]["voter_id"] for tx in recovered] == ["V1", "V2"]
+
+def test_orphaned_transactions_are_logged_again_when_requeued(tmp_path):
+    # One record per file: a file is deleted as soon as its transactions are sealed
+    wal = WriteAheadLog(str(tmp_path), segment_bytes=1, fsync=False)
+    mempool = Mempool(max_latency=0, wal=wal)
+    asyncio.run(mempool.add_many([register("V1")]))
+    batch = mempool.take_batch(threading.Event())
+    mempool.confirm(batch, {"index": 2}, "hash")
+    assert not wal.holds(batch[0]["tx_id"]) and wal._generations() == [wal.generation]
+
+    # A reorg orphans the block; the transaction must be durable again before it is queued
+    mempool.requeue(batch)
+    assert wal.holds(batch[0]["tx_id"])
+    recovered = restart(tmp_path).recover(lambda tx_id: False)
+    assert [tx["tx_id"] for tx in recovered] == [batch[0]["tx_id"]]
+
+def test_requeue_after_a_failed_seal_does_not_log_twice(tmp_path):
+    wal = WriteAheadLog(str(tmp_path), fsync=False)
+    mempool = Mempool(max_latency=0, wal=wal)
+    asyncio.run(mempool.add_many([register("V1")]))
+    records = wal.stats["records"]
+    mempool.requeue(mempool.take_batch(threading.Event()))
+    assert wal.stats["records"] == records and len(mempool) == 1
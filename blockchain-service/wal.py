@@ -0,0 +1,216 @@
+import os
+import threading
+from concurrent.futures import Future
+from time import monotonic
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from block_store import RECORD_HEADER, decode_record, encode_record
+
+class WriteAheadLog:
+    """
+    Durable record of every transaction admitted to the mempool, so an
+    acknowledged submission survives a crash before its block is sealed.
+
+    Group commit: append() only buffers the records and returns a Future.
+    A flusher thread waits up to `group_window` seconds after the first
+    record of a group arrives, then writes and fsyncs everything buffered
+    so far in one go and resolves all of their futures. While one group is
+    being fsynced the next one fills up, so throughput scales with
+    concurrency instead of being capped at one fsync per request.
+
+    Files are `{generation:012d}.wal` in the block store's record format and
+    are rolled every `segment_bytes`. A file is deleted once every
+    transaction in it has been sealed into a (durable) block.
+    """
+
+    def __init__(self, directory: str, group_window: float = 0.001, max_group_bytes: int = 4 * 1024 * 1024,
+                 segment_bytes: int = 64 * 1024 * 1024, fsync: bool = True):
+        self.directory = directory
+        self.group_window = group_window
+        self.max_group_bytes = max_group_bytes
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self._cond = threading.Condition()
+        self._buffer: List[bytes] = []
+        self._buffered_bytes = 0
+        self._waiting: List[Tuple[Future, List[str]]] = []
+        self._first_at: Optional[float] = None
+        self._stopping = False
+        # Unsealed transactions per file, for deleting files once they are fully sealed
+        self._generation_of: Dict[str, int] = {}
+        self._unsealed: Dict[int, int] = {}
+        self._file_lock = threading.Lock()
+        self.stats = {"groups": 0, "records": 0, "bytes": 0, "fsync_seconds": 0.0}
+        os.makedirs(directory, exist_ok=True)
+        generations = self._generations()
+        self.generation = generations[-1] + 1 if generations else 1
+        self._file = open(self.path_for(self.generation), "ab")
+        self._flusher = threading.Thread(target=self._run, name="wal-flusher", daemon=True)
+        self._flusher.start()
+
+    def path_for(self, generation: int) -> str:
+        return os.path.join(self.directory, f"{generation:012d}.wal")
+
+    def _generations(self) -> List[int]:
+        return sorted(int(name[:-4]) for name in os.listdir(self.directory) if name.endswith(".wal"))
+
+    # --- Startup ---
+
+    def recover(self, is_sealed: Callable[[str], bool]) -> List[Dict[str, Any]]:
+        """
+        Transactions logged before a restart that never made it into a block,
+        in admission order. Files with nothing left to seal are deleted.
+        """
+        pending, seen = [], set()
+        for generation in self._generations():
+            if generation == self.generation:
+                continue
+            unsealed = 0
+            for tx in self._read(self.path_for(generation)):
+                if tx['tx_id'] in seen or is_sealed(tx['tx_id']):
+                    continue
+                seen.add(tx['tx_id'])
+                pending.append(tx)
+                self._generation_of[tx['tx_id']] = generation
+                unsealed += 1
+            if unsealed:
+                self._unsealed[generation] = unsealed
+            else:
+                os.remove(self.path_for(generation))
+        return pending
+
+    @staticmethod
+    def _read(path: str) -> List[Dict[str, Any]]:
+        with open(path, "rb") as f:
+            data = f.read()
+        txs, offset = [], 0
+        while offset + RECORD_HEADER.size <= len(data):
+            (length,) = RECORD_HEADER.unpack_from(data, offset)
+            if offset + RECORD_HEADER.size + length > len(data):
+                break  # Torn tail of a group that was never acknowledged
+            try:
+                txs.append(decode_record(data, offset))
+            except ValueError:
+                break
+            offset += RECORD_HEADER.size + length
+        return txs
+
+    # --- Group commit ---
+
+    def append(self, transactions: List[Dict[str, Any]]) -> Future:
+        """Queue transactions for the next group; the Future resolves once they are on disk"""
+        future = Future()
+        records = b"".join(encode_record(tx) for tx in transactions)
+        with self._cond:
+            if self._stopping:
+                raise RuntimeError("Write-ahead log is closed")
+            if not self._buffer:
+                self._first_at = monotonic()
+            self._buffer.append(records)
+            self._buffered_bytes += len(records)
+            self._waiting.append((future, [tx['tx_id'] for tx in transactions]))
+            self._cond.notify()
+        return future
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._stopping:
+                    self._cond.wait()
+                if not self._buffer:
+                    return
+                # Hold the group open for the window so concurrent submitters can join it
+                while not self._stopping and self._buffered_bytes < self.max_group_bytes:
+                    remaining = self.group_window - (monotonic() - self._first_at)
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                buffer, waiting = self._buffer, self._waiting
+                self._buffer, self._waiting, self._buffered_bytes = [], [], 0
+            self._commit(buffer, waiting)
+
+    def _commit(self, buffer: List[bytes], waiting: List[Tuple[Future, List[str]]]):
+        data = b"".join(buffer)
+        try:
+            with self._file_lock:
+                started = monotonic()
+                self._file.write(data)
+                self._file.flush()
+                if self.fsync:
+                    os.fsync(self._file.fileno())
+                generation = self.generation
+                self.stats["fsync_seconds"] += monotonic() - started
+                tx_ids = [tx_id for _, ids in waiting for tx_id in ids]
+                for tx_id in tx_ids:
+                    self._generation_of[tx_id] = generation
+                self._unsealed[generation] = self._unsealed.get(generation, 0) + len(tx_ids)
+                if self._file.tell() >= self.segment_bytes:
+                    self._roll()
+        except Exception as e:
+            for future, _ in waiting:
+                future.set_exception(e)
+            return
+        self.stats["groups"] += 1
+        self.stats["records"] += len(tx_ids)
+        self.stats["bytes"] += len(data)
+        for future, _ in waiting:
+            future.set_result(None)
+
+    def _roll(self):
+        # Caller holds _file_lock
+        self._file.close()
+        previous, self.generation = self.generation, self.generation + 1
+        self._file = open(self.path_for(self.generation), "ab")
+        if not self._unsealed.get(previous):
+            self._delete(previous)
+
+    # --- Retention ---
+
+    def holds(self, tx_id: str) -> bool:
+        """Whether the transaction is logged here and not yet released"""
+        with self._file_lock:
+            return tx_id in self._generation_of
+
+    def release(self, tx_ids: List[str]):
+        """Called once transactions are sealed into a durable block"""
+        with self._file_lock:
+            for tx_id in tx_ids:
+                generation = self._generation_of.pop(tx_id, None)
+                if generation is None:
+                    continue  # Already released, or never logged by this node
+                self._unsealed[generation] -= 1
+                if not self._unsealed[generation] and generation != self.generation:
+                    self._delete(generation)
+
+    def _delete(self, generation: int):
+        self._unsealed.pop(generation, None)
+        try:
+            os.remove(self.path_for(generation))
+        except FileNotFoundError:
+            pass
+
+    def clear(self):
+        """Forget everything logged so far (used by /reset)"""
+        with self._file_lock:
+            for generation in self._generations():
+                if generation != self.generation:
+                    self._delete(generation)
+            self._generation_of.clear()
+            self._unsealed.clear()
+            self._roll()
+
+    def close(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._flusher.join()
+        with self._file_lock:
+            self._file.close()
+
+    def status(self) -> Dict[str, Any]:
+        groups = self.stats["groups"]
+        return {
+            **self.stats,
+            "records_per_group": self.stats["records"] / groups if groups else 0.0,
+            "generation": self.generation,
+            "unsealed": len(self._generation_of),
+        }
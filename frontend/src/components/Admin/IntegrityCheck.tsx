@@ -44,6 +44,7 @@ export default function IntegrityCheck({ stateId }: { stateId: string }) {
       case 'SECURE': return 'bg-green-100 text-green-800 border-green-200';
       case 'SIMULATED_TAMPERING': return 'bg-orange-100 text-orange-800 border-orange-200';
       case 'SERVICE_FAILED': return 'bg-gray-100 text-gray-800 border-gray-300';
+      case 'UNPROVEN': return 'bg-yellow-100 text-yellow-800 border-yellow-300';
       default: return 'bg-red-100 text-red-800 border-red-200'; // Real Tampering
     }
   };